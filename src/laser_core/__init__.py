@@ -1,14 +1,22 @@
 __version__ = "0.4.12"
 
+from .calendarqueue import CalendarQueue
+from .eventlog import EventLog
 from .extension import compiled
+from .jit import warmup
 from .laserframe import LaserFrame
 from .propertyset import PropertySet
+from .sortedqueue import PartitionedSortedQueue
 from .sortedqueue import SortedQueue
 
 __all__ = [
+    "CalendarQueue",
+    "EventLog",
     "LaserFrame",
+    "PartitionedSortedQueue",
     "PropertySet",
     "SortedQueue",
     "__version__",
     "compiled",
+    "warmup",
 ]
@@ -0,0 +1,271 @@
+"""CalendarQueue implementation using NumPy and Numba."""
+
+import numba as nb
+import numpy as np
+
+from laser_core.sortedqueue import SortedQueue
+from laser_core.sortedqueue import _siftbackward
+from laser_core.sortedqueue import _siftforward
+
+
+class CalendarQueue:
+    """
+    A calendar (bucket) queue for events scheduled on integer ticks, implemented using NumPy arrays and sped-up with Numba.
+
+    Like SortedQueue, the queue holds _indices_ into an existing array of (integer) tick values, e.g., a date of death
+    property of a LaserFrame object.
+
+    Entries due within `horizon` ticks of the current tick are kept in one bucket per tick. Buckets are linked lists of
+    fixed size chunks from a preallocated pool so pushing is O(1) and popping everything due is O(k) for k due entries.
+    Entries further in the future go to an overflow SortedQueue and are moved into buckets as the horizon advances.
+
+    __init__ with an existing array of tick values
+
+    __push__ with an index into tick values
+
+    __pop_until__ returns the indices of all entries due on or before the given tick
+    """
+
+    def __init__(self, capacity: int, values: np.ndarray, horizon: int = 365, chunk_size: int = 256, start: int = 0, index_dtype=np.uint32):
+        """
+        Initializes a new instance of the class with a specified capacity and reference to existing, integer tick values.
+
+        Parameters:
+
+            capacity (int): The maximum number of elements the queue can hold.
+            values (np.ndarray): A reference to an array of integer tick values to be accessed by the queue.
+            horizon (int, optional): The number of ticks, starting at the current tick, covered by buckets. Default is 365.
+            chunk_size (int, optional): The number of entries per bucket chunk. Default is 256.
+            start (int, optional): The first tick. Default is 0.
+            index_dtype (data-type, optional): The data type of the indices, np.uint32 or np.uint64. Default is np.uint32.
+
+        Raises:
+
+            TypeError: If values is not an integer array.
+            ValueError: If capacity, horizon, or chunk_size is not a positive integer.
+        """
+
+        if not np.issubdtype(values.dtype, np.integer):
+            raise TypeError(f"Calendar queue values must be an integer array (got {values.dtype})")
+        for name, value in (("capacity", capacity), ("horizon", horizon), ("chunk_size", chunk_size)):
+            if not isinstance(value, (int, np.integer)) or value <= 0:
+                raise ValueError(f"Calendar queue {name} must be a positive integer, got {value}.")
+
+        # Each bucket has, at most, one partially consumed head chunk and one partially filled tail chunk.
+        nchunks = -(-capacity // chunk_size) + 2 * horizon
+        self.capacity = capacity
+        self.values = values
+        self.chunks = np.zeros((nchunks, chunk_size), dtype=index_dtype)
+        self.links = np.arange(1, nchunks + 1, dtype=np.int64)  # next chunk in bucket or in the free list
+        self.links[-1] = -1
+        self.heads = np.full(horizon, -1, dtype=np.int64)  # first chunk of each bucket
+        self.tails = np.full(horizon, -1, dtype=np.int64)  # last chunk of each bucket
+        self.fills = np.zeros(horizon, dtype=np.int64)  # entries in the last chunk of each bucket
+        self.starts = np.zeros(horizon, dtype=np.int64)  # entries already consumed from the first chunk of each bucket
+        self.state = np.array([start, 0, 0], dtype=np.int64)  # current tick, head of the free list, entries in buckets
+        self.overflow = SortedQueue(capacity, values, index_dtype=index_dtype)
+
+        return
+
+    @property
+    def tick(self) -> int:
+        """
+        Returns the current tick, i.e., the earliest tick which has not been popped.
+
+        Returns:
+
+            int: The current tick.
+        """
+
+        return int(self.state[0])
+
+    def push(self, index) -> None:
+        """
+        Insert an element into the calendar queue.
+
+        Elements with values before the current tick are overdue and are returned by the next `pop_until()` on or after the current tick.
+
+        Parameters:
+
+            index (int): The index of the element to be added to the calendar queue.
+
+        Raises:
+
+            IndexError: If the calendar queue is full.
+        """
+
+        self.push_many(np.array([index], dtype=self.chunks.dtype))
+
+        return
+
+    def push_many(self, indices: np.ndarray) -> None:
+        """
+        Insert multiple elements into the calendar queue with a single call into Numba.
+
+        Parameters:
+
+            indices (np.ndarray): The indices of the elements to be added to the calendar queue.
+
+        Raises:
+
+            IndexError: If the calendar queue does not have room for all the elements.
+        """
+
+        indices = np.asarray(indices, dtype=self.chunks.dtype)
+        if len(self) + len(indices) > self.capacity:
+            raise IndexError("Calendar queue is full")
+        self.overflow.size = _push(
+            self.values,
+            self.chunks,
+            self.links,
+            self.heads,
+            self.tails,
+            self.fills,
+            self.state,
+            self.overflow.indices,
+            self.overflow.positions,
+            len(self.overflow),
+            indices,
+        )
+
+        return
+
+    def pop_until(self, tick: int, out: np.ndarray = None) -> np.ndarray:
+        """
+        Removes and returns the indices of all elements due on or before `tick` and advances the current tick to `tick + 1`.
+
+        Indices are returned in tick order (arbitrary order within a tick).
+
+        Parameters:
+
+            tick (int): The (inclusive) tick.
+            out (np.ndarray, optional): An array of the index dtype to fill with the indices. If given, at most len(out) elements
+                                        are removed and the current tick only advances past fully drained ticks.
+                                        Default is None, i.e., allocate as needed.
+
+        Returns:
+
+            np.ndarray: The removed indices (a view into `out` if given).
+        """
+
+        tick = np.int64(tick)
+        if out is not None:
+            return out[: self.__drain(tick, out)]
+
+        # start small (usually only a few elements are due) and grow geometrically rather than allocate len(self)
+        out = np.empty(min(len(self), 1024), dtype=self.chunks.dtype)
+        count = 0
+        while True:
+            count += self.__drain(tick, out[count:])
+            if count < len(out) or len(self) == 0:
+                break
+            out = np.resize(out, min(2 * len(out), count + len(self)))
+
+        return out[:count]
+
+    def __drain(self, tick: np.int64, out: np.ndarray) -> int:
+        count, self.overflow.size = _drain(
+            self.values,
+            self.chunks,
+            self.links,
+            self.heads,
+            self.tails,
+            self.fills,
+            self.starts,
+            self.state,
+            self.overflow.indices,
+            self.overflow.positions,
+            len(self.overflow),
+            tick,
+            out,
+        )
+
+        return count
+
+    def __len__(self) -> int:
+        """
+        Return the number of elements in the calendar queue.
+
+        Returns:
+
+            int: The number of elements in the calendar queue.
+        """
+
+        return int(self.state[2]) + len(self.overflow)
+
+
+# Module level kernels, generic over the tick and index dtypes, so Numba can cache them on disk.
+# The overflow SortedQueue is a binary heap (shift = 1) which does not track positions.
+
+
+@nb.njit(nogil=True, cache=True)
+def _insert(values, chunks, links, heads, tails, fills, state, index):  # pragma: no cover
+    slot = max(np.int64(values[index]), state[0]) % len(heads)
+    tail = tails[slot]
+    if tail < 0 or fills[slot] == chunks.shape[1]:
+        # take a chunk from the free list and link it to the end of the bucket
+        chunk = state[1]
+        state[1] = links[chunk]
+        links[chunk] = -1
+        if tail < 0:
+            heads[slot] = chunk
+        else:
+            links[tail] = chunk
+        tails[slot] = chunk
+        fills[slot] = 0
+        tail = chunk
+    chunks[tail, fills[slot]] = index
+    fills[slot] += 1
+    state[2] += 1
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _push(values, chunks, links, heads, tails, fills, state, oindices, opositions, osize, indices):  # pragma: no cover
+    limit = state[0] + len(heads)
+    for index in indices:
+        if np.int64(values[index]) < limit:
+            _insert(values, chunks, links, heads, tails, fills, state, index)
+        else:
+            oindices[osize] = index
+            _siftforward(oindices, values, opositions, 0, osize, 1)
+            osize += 1
+    return osize
+
+
+@nb.njit(nogil=True, cache=True)
+def _drain(values, chunks, links, heads, tails, fills, starts, state, oindices, opositions, osize, tick, out):  # pragma: no cover
+    horizon = len(heads)
+    count = 0
+    while state[0] <= tick:
+        slot = state[0] % horizon
+        chunk = heads[slot]
+        while chunk >= 0:
+            end = fills[slot] if chunk == tails[slot] else chunks.shape[1]
+            start = starts[slot]
+            n = min(end - start, len(out) - count)
+            out[count : count + n] = chunks[chunk, start : start + n]
+            count += n
+            state[2] -= n
+            if start + n < end:
+                starts[slot] = start + n
+                return count, osize  # out is full
+            # return the consumed chunk to the free list
+            following = links[chunk]
+            links[chunk] = state[1]
+            state[1] = chunk
+            chunk = following
+            heads[slot] = chunk
+            starts[slot] = 0
+        tails[slot] = -1
+        fills[slot] = 0
+        state[0] += 1
+        # the bucket just emptied now holds tick state[0] + horizon - 1, move those entries out of the overflow
+        limit = state[0] + horizon - 1
+        while osize > 0 and np.int64(values[oindices[0]]) <= limit:
+            index = oindices[0]
+            osize -= 1
+            oindices[0] = oindices[osize]
+            _siftbackward(oindices, values, opositions, 0, osize, 1)
+            _insert(values, chunks, links, heads, tails, fills, state, index)
+    return count, osize
@@ -0,0 +1,357 @@
+"""
+eventlog.py
+
+This module defines the EventLog class, which is used to record per-agent events (e.g., "who infected whom at tick t")
+without appending to Python lists.
+
+Events are fixed size records (tick, agent, source, type) written into preallocated, per-thread chunks. Numba kernels
+append to the chunk for their own thread with `log_event()` so no locks or atomic operations are required. Each thread
+has a ring of chunks and moves on to the next chunk when one fills. Completed chunks are spilled to disk by `flush()`
+(e.g., once per tick) or, while kernels run, by a background thread (see `EventLog.start()`), and the complete log can be
+queried afterwards with vectorized filters.
+
+Classes:
+    EventLog: A class to record and query per-agent events.
+
+Functions:
+    log_event: Numba function to append an event to the calling thread's chunk from within an njit kernel.
+
+Usage Example:
+
+.. code-block:: python
+
+    @nb.njit(parallel=True)
+    def transmission(..., ticks, agents, sources, types, counts):
+        for i in nb.prange(count):
+            ...
+            log_event(ticks, agents, sources, types, counts, tick, i, infector, INFECTION)
+
+    log = population.add_event_log("events", chunk_size=1 << 20)
+    for tick in range(nticks):
+        transmission(..., *log.buffers)
+        log.flush()
+
+    infections = log.query(type=INFECTION, tick=range(100, 200))
+"""
+
+import tempfile
+import threading
+import weakref
+from pathlib import Path
+from typing import Union
+
+import numba as nb
+import numpy as np
+
+EVENT_DTYPE = np.dtype([("tick", np.int32), ("agent", np.uint32), ("source", np.uint32), ("type", np.uint32)])
+NO_SOURCE = np.uint32(0xFFFFFFFF)
+
+_PAD = 8  # int64s per thread in counts[] so each thread's counters are on their own cache line
+
+# counts[] columns: events in the current chunk, dropped events, chunks completed, chunks spilled
+_COUNT, _DROPPED, _COMPLETED, _SPILLED = 0, 1, 2, 3
+
+
+# Not cache=True: nb.get_thread_id() binds to the threading layer at compile time and loading a cache written under
+# another layer aborts the process ("Symbol not found: get_thread_id").
+@nb.njit(nogil=True)
+def log_event(ticks, agents, sources, types, counts, tick, agent, source, type):  # pragma: no cover
+    """
+    Append an event to the calling thread's chunk. For use in Numba kernels.
+
+    Parameters:
+
+        ticks, agents, sources, types, counts: The arrays returned by `EventLog.buffers`.
+        tick (int): The tick at which the event occurred.
+        agent (int): The index of the agent experiencing the event.
+        source (int): The index of the source agent (e.g., the infector) or NO_SOURCE.
+        type (int): A user defined event type.
+
+    Returns:
+
+        bool: True if the event was recorded, False if all the thread's chunks are full (the event is counted as dropped).
+    """
+
+    thread = nb.get_thread_id()
+    n = counts[thread, _COUNT]
+    if n >= ticks.shape[2]:
+        # The current chunk is full, move on to the next one unless the rest of the ring is waiting to be spilled.
+        # Only kernels write the completed counters and only EventLog writes the spilled counters.
+        if counts[thread, _COMPLETED] + 1 - counts[thread, _SPILLED] >= ticks.shape[1]:
+            counts[thread, _DROPPED] += 1
+            return False
+        counts[thread, _COMPLETED] += 1
+        n = 0
+    chunk = counts[thread, _COMPLETED] % ticks.shape[1]
+    ticks[thread, chunk, n] = tick
+    agents[thread, chunk, n] = agent
+    sources[thread, chunk, n] = source
+    types[thread, chunk, n] = type
+    counts[thread, _COUNT] = n + 1
+
+    return True
+
+
+class EventLog:
+    """
+    A log of fixed size event records (tick, agent, source, type) with preallocated, per-thread chunks which spill to disk.
+
+    Each thread has a ring of `nchunks` chunks. When a thread's chunk fills, it continues with the next chunk of its ring
+    and the full chunk is spilled by the next `flush()` or by the background thread (see `start()`). An event is only
+    dropped if all of a thread's chunks are full, i.e., the thread recorded more than `nchunks * chunk_size` events
+    before they could be spilled.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1 << 16,
+        path: Union[Path, str, None] = None,
+        nthreads: Union[int, None] = None,
+        nchunks: int = 4,
+    ):
+        """
+        Initialize an EventLog object.
+
+        Parameters:
+
+            chunk_size (int): The number of events in each chunk. Default is 65,536.
+            path (Path | str, optional): The file to which events are spilled. Default is None, which uses a temporary file
+                                         that is removed when the log is garbage collected.
+            nthreads (int, optional): The number of per-thread chunk rings. Default is None, which uses NUMBA_NUM_THREADS.
+            nchunks (int, optional): The number of chunks in each thread's ring. Default is 4.
+
+        Raises:
+
+            ValueError: If chunk_size, nthreads, or nchunks is not a positive integer.
+        """
+
+        nthreads = nb.config.NUMBA_NUM_THREADS if nthreads is None else nthreads
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError(f"Chunk size must be a positive integer, got {chunk_size}.")
+        if not isinstance(nthreads, int) or nthreads <= 0:
+            raise ValueError(f"Number of threads must be a positive integer, got {nthreads}.")
+        if not isinstance(nchunks, int) or nchunks <= 0:
+            raise ValueError(f"Number of chunks must be a positive integer, got {nchunks}.")
+
+        self.chunks = np.zeros((nthreads, nchunks, chunk_size), dtype=EVENT_DTYPE)
+        # per thread: events in the current chunk, dropped events, chunks completed, chunks spilled
+        self.counts = np.zeros((nthreads, _PAD), dtype=np.int64)
+
+        if path is None:
+            with tempfile.NamedTemporaryFile(prefix="laser-", suffix=".events", delete=False) as file:
+                path = file.name
+            self._finalizer = weakref.finalize(self, Path(path).unlink, missing_ok=True)
+        self.path = Path(path)
+        self.path.write_bytes(b"")
+        self._spilled = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+        return
+
+    @property
+    def buffers(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the per-thread chunk arrays to pass to Numba kernels calling `log_event()`.
+
+        Returns:
+
+            tuple: (ticks, agents, sources, types, counts) where the first four are (nthreads, nchunks, chunk_size) views
+                   into the chunks.
+        """
+
+        return self.chunks["tick"], self.chunks["agent"], self.chunks["source"], self.chunks["type"], self.counts
+
+    def append(self, tick, agent, source=NO_SOURCE, type=0) -> None:
+        """
+        Append events from Python/NumPy code.
+
+        The arguments are broadcast against each other so, e.g., a scalar tick and type may be given with arrays of agents and sources.
+        The events are written directly to disk after any events pending in the per-thread chunks.
+
+        Parameters:
+
+            tick (int | np.ndarray): The tick(s) at which the event(s) occurred.
+            agent (int | np.ndarray): The index or indices of the agent(s) experiencing the event(s).
+            source (int | np.ndarray, optional): The index or indices of the source agent(s). Default is NO_SOURCE.
+            type (int | np.ndarray, optional): The event type(s). Default is 0.
+
+        Returns:
+
+            None
+        """
+
+        tick, agent, source, type = np.broadcast_arrays(tick, agent, source, type)
+        records = np.empty(tick.size, dtype=EVENT_DTYPE)
+        records["tick"] = tick.ravel()
+        records["agent"] = agent.ravel()
+        records["source"] = source.ravel()
+        records["type"] = type.ravel()
+        with self._lock:
+            dropped = self._spill_pending()
+            self._spill([records])
+        self._check_dropped(dropped)
+
+        return
+
+    def flush(self) -> None:
+        """
+        Spill the events recorded in the per-thread chunks to disk and reset the chunks.
+
+        Must not be called while kernels are recording events (the background thread, see `start()`, may be running).
+
+        Raises:
+
+            ValueError: If any events were dropped because all of a thread's chunks were full (the recorded events are still spilled).
+        """
+
+        with self._lock:
+            dropped = self._spill_pending()
+        self._check_dropped(dropped)
+
+        return
+
+    def start(self, interval: float = 0.001) -> None:
+        """
+        Start the background thread which spills completed chunks while kernels (and other code) run.
+
+        Kernels must release the GIL (e.g., `nb.njit(nogil=True, parallel=True)`) for the background thread to run.
+
+        Parameters:
+
+            interval (float, optional): The time, in seconds, to sleep when there is nothing to spill. Default is 0.001.
+        """
+
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+            self._thread.start()
+
+        return
+
+    def stop(self) -> None:
+        """
+        Stop the background thread.
+        """
+
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+        return
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                spilled = self._spill_completed()
+            if spilled == 0:
+                self._stop.wait(interval)
+
+        return
+
+    def _spill_completed(self) -> int:
+        # Spill the chunks kernels have moved on from, the counter is published after the records are written.
+        nchunks = self.chunks.shape[1]
+        records = []
+        for thread in range(len(self.counts)):
+            completed = self.counts[thread, _COMPLETED]
+            for chunk in range(self.counts[thread, _SPILLED], completed):
+                records.append(self.chunks[thread, chunk % nchunks])
+            self.counts[thread, _SPILLED] = completed
+        self._spill(records)
+
+        return len(records)
+
+    def _spill_pending(self) -> int:
+        # Spill the completed chunks and the current chunk of each thread, return the number of dropped events.
+        self._spill_completed()
+        nchunks = self.chunks.shape[1]
+        records = []
+        for thread in range(len(self.counts)):
+            count = self.counts[thread, _COUNT]
+            if count > 0:
+                records.append(self.chunks[thread, self.counts[thread, _COMPLETED] % nchunks, :count])
+        self._spill(records)
+        dropped = int(self.counts[:, _DROPPED].sum())
+        self.counts[:, _COUNT] = 0
+        self.counts[:, _DROPPED] = 0
+
+        return dropped
+
+    def _check_dropped(self, dropped: int) -> None:
+        if dropped > 0:
+            raise ValueError(
+                f"EventLog dropped {dropped:,} events (nchunks={self.chunks.shape[1]:,} x chunk_size={self.chunks.shape[2]:,} "
+                "per thread is too small, flush() more often or start() the background thread)."
+            )
+
+        return
+
+    def _spill(self, records: list) -> None:
+        if len(records) > 0:
+            with self.path.open("ab") as file:
+                for chunk in records:
+                    file.write(chunk.tobytes())
+                    self._spilled += len(chunk)
+
+        return
+
+    def __len__(self) -> int:
+        """
+        Return the number of events recorded (spilled to disk and pending in the per-thread chunks).
+
+        Returns:
+
+            int: The number of events recorded.
+        """
+
+        pending = (self.counts[:, _COMPLETED] - self.counts[:, _SPILLED]) * self.chunks.shape[2] + self.counts[:, _COUNT]
+
+        return self._spilled + int(pending.sum())
+
+    def events(self) -> np.ndarray:
+        """
+        Flush and return all recorded events as a read-only, memory mapped record array.
+
+        Returns:
+
+            np.ndarray: A 1-D array of EVENT_DTYPE records in the order they were spilled.
+        """
+
+        self.flush()
+        if self._spilled == 0:
+            return np.zeros(0, dtype=EVENT_DTYPE)
+
+        return np.memmap(self.path, dtype=EVENT_DTYPE, mode="r", shape=(self._spilled,))
+
+    def query(self, tick=None, agent=None, source=None, type=None) -> np.ndarray:
+        """
+        Return the recorded events matching all of the given filters.
+
+        Each filter may be a scalar (match equal values) or an array-like, e.g., a list or range (match any of the given values).
+
+        Parameters:
+
+            tick (int | array-like, optional): The tick(s) to match. Default is None (any tick).
+            agent (int | array-like, optional): The agent(s) to match. Default is None (any agent).
+            source (int | array-like, optional): The source agent(s) to match. Default is None (any source).
+            type (int | array-like, optional): The event type(s) to match. Default is None (any type).
+
+        Returns:
+
+            np.ndarray: A 1-D array (copy) of the matching EVENT_DTYPE records.
+        """
+
+        events = self.events()
+        mask = np.ones(len(events), dtype=np.bool_)
+        for field, values in (("tick", tick), ("agent", agent), ("source", source), ("type", type)):
+            if values is None:
+                continue
+            if np.isscalar(values):
+                mask &= events[field] == values
+            else:
+                mask &= np.isin(events[field], np.asarray(values))
+
+        return np.array(events[mask])
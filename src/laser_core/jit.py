@@ -0,0 +1,110 @@
+"""
+jit.py
+
+This module provides `warmup()` which compiles the LASER Numba kernels in one place, e.g., once at the start of each
+worker process in an ensemble of simulations.
+
+The kernels are compiled with `cache=True` so Numba writes the compiled code to disk (in `__pycache__` next to the
+source or, if that is not writable, in the directory given by NUMBA_CACHE_DIR) and later processes load it rather
+than compiling again. Calling `warmup()` in a single process, e.g., when building a container image, populates the
+cache for all the supported dtypes.
+
+Kernels which call `numba.get_thread_id()`, e.g., `eventlog.log_event()` and `random.pool_uniform()`, are _not_ cached
+on disk: the compiled code is bound to the threading layer (tbb, omp, or workqueue) active when it was compiled and
+loading it under another layer aborts the process. `warmup()` compiles `log_event()` in the calling process only.
+
+Usage Example:
+
+.. code-block:: python
+
+    import laser_core
+
+    laser_core.warmup()  # compile (or load from the on disk cache) all SortedQueue/CalendarQueue kernels
+"""
+
+import time
+from typing import Iterable
+from typing import Union
+
+import click
+import numpy as np
+
+from laser_core.calendarqueue import CalendarQueue
+from laser_core.eventlog import EventLog
+from laser_core.eventlog import log_event
+from laser_core.sortedqueue import _INDEX_DTYPES
+from laser_core.sortedqueue import _VALUE_DTYPES
+from laser_core.sortedqueue import PartitionedSortedQueue
+from laser_core.sortedqueue import SortedQueue
+
+
+def warmup(
+    value_dtypes: Union[Iterable, None] = None,
+    index_dtypes: Union[Iterable, None] = None,
+    arities: Iterable = (2,),
+    verbose: bool = False,
+) -> float:
+    """
+    Compile, or load from the on disk cache, the Numba kernels used by SortedQueue, PartitionedSortedQueue, and CalendarQueue
+    and compile (in this process only, it is not cached on disk) `log_event()` used with EventLog.
+
+    The SortedQueue kernels are generic over the heap arity so `arities` only affects the functions returned by
+    `SortedQueue.njit_functions`.
+
+    Parameters:
+
+        value_dtypes (Iterable, optional): The value dtypes to compile for. Default is None, i.e., all 10 supported dtypes
+                                           (signed and unsigned 8, 16, 32, and 64 bit integers and 32 and 64 bit floats).
+        index_dtypes (Iterable, optional): The index dtypes to compile for. Default is None, i.e., np.uint32 and np.uint64.
+        arities (Iterable, optional): The heap arities to compile `njit_functions` for. Default is (2,).
+        verbose (bool, optional): If True, print the elapsed time. Default is False.
+
+    Returns:
+
+        float: The elapsed time in seconds.
+    """
+
+    start = time.perf_counter()
+    value_dtypes = _VALUE_DTYPES if value_dtypes is None else [np.dtype(dtype) for dtype in value_dtypes]
+    index_dtypes = _INDEX_DTYPES if index_dtypes is None else [np.dtype(dtype) for dtype in index_dtypes]
+
+    for value_dtype in value_dtypes:
+        values = np.arange(8, 0, -1).astype(value_dtype)
+        for index_dtype in index_dtypes:
+            # heapify, push, remove, update, and pop_until with and without tracking positions
+            for track_positions in (False, True):
+                queue = SortedQueue.from_indices(values, np.arange(4), capacity=8, track_positions=track_positions, index_dtype=index_dtype)
+                queue.push_many(np.arange(4, 6))
+                queue.push(6)
+                if track_positions:
+                    queue.update(5)
+                    queue.remove(4)
+                queue.popi()
+                queue.pop_until(values[0])
+            queue.pop_until(values[0], out=np.empty(8, dtype=index_dtype))
+
+            for arity in arities:
+                queue = SortedQueue(8, values, index_dtype=index_dtype, arity=arity)
+                push, popi, peeki = queue.njit_functions
+                push(*queue.state, index_dtype.type(0))
+                peeki(*queue.state)
+                popi(*queue.state)
+
+            queue = PartitionedSortedQueue(np.array([4, 4]), values, index_dtype=index_dtype)
+            queue.push_many(np.array([0, 1]), np.array([0, 1]))
+            queue.pop_until(values[0])
+
+            if np.issubdtype(value_dtype, np.integer):
+                calendar = CalendarQueue(8, values, horizon=4, chunk_size=2, index_dtype=index_dtype)
+                calendar.push_many(np.arange(8))
+                calendar.pop_until(8)
+
+    # not cached on disk, see the module docstring
+    log = EventLog(chunk_size=1, nthreads=1)
+    log_event(*log.buffers, 0, 0, 0, 0)
+
+    elapsed = time.perf_counter() - start
+    if verbose:
+        click.echo(f"Compiled/loaded LASER Numba kernels in {elapsed:0.2f} seconds.")
+
+    return elapsed
@@ -14,6 +14,7 @@ Usage Example:
     laser_frame = LaserFrame(capacity=100)
     laser_frame.add_scalar_property('age', dtype=np.int32, default=0)
     laser_frame.add_vector_property('position', length=3, dtype=np.float32, default=0.0)
+    laser_frame.add_group_property('contact', {'node': np.uint16, 'state': np.uint8, 'itimer': np.uint16})
     start, end = laser_frame.add(10)
     laser_frame.sort(np.arange(10)[::-1])
     laser_frame.squash(np.array([True, False, True, False, True, False, True, False, True, False]))
@@ -25,6 +26,8 @@ Attributes:
 
 import numpy as np
 
+from laser_core.eventlog import EventLog
+
 
 class LaserFrame:
     """
@@ -64,6 +67,8 @@ class LaserFrame:
 
         self._count = initial_count
         self._capacity = capacity
+        self._groups = {}
+        self._preborn_offsets = None
         for key, value in kwargs.items():
             setattr(self, key, value)
 
@@ -88,8 +93,13 @@ class LaserFrame:
         Returns:
 
             None
+
+        Raises:
+
+            ValueError: If the name is already in use.
         """
 
+        self._check_name(name)
         # initialize the property to a NumPy array with of size self._capacity, dtype, and default value
         setattr(self, name, np.full(self._capacity, default, dtype=dtype))
         return
@@ -114,8 +124,13 @@ class LaserFrame:
         Returns:
 
             None
+
+        Raises:
+
+            ValueError: If the name is already in use.
         """
 
+        self._check_name(name)
         # initialize the property to a NumPy array with of size (length, self._capacity), dtype, and default value
         setattr(self, name, np.full((length, self._capacity), default, dtype=dtype))
         return
@@ -140,12 +155,112 @@ class LaserFrame:
 
             None
 
+        Raises:
+
+            ValueError: If the name is already in use.
         """
 
+        self._check_name(name)
         # initialize the property to a NumPy array with given shape, dtype, and default value
         setattr(self, name, np.full(shape, default, dtype=dtype))
         return
 
+    def add_group_property(self, name: str, fields, default=0) -> None:
+        """
+        Adds an interleaved group of scalar properties to the object.
+
+        The fields of the group are stored together in a single packed NumPy structured (record) array
+        of size self._capacity so that reading several fields of one entry touches a single cache line
+        rather than one cache line per property. The record array is available as `name` and each field
+        is exposed as a regular 1-D property (a view into the record array).
+
+        `sort()` and `squash()` treat the group as one unit, i.e., the records are moved together.
+
+        Parameters:
+
+            name (str): The name of the group (record array) property to be added.
+            fields (dict | list[tuple[str, data-type]]): The names and data types of the fields in the group.
+            default (scalar | dict, optional): The default value for all fields or a dictionary of per-field default values
+                                               (fields not in the dictionary default to 0). Default is 0.
+
+        Returns:
+
+            None
+
+        Raises:
+
+            ValueError: If the group has no fields, the group name or a field name is already in use, or default has
+                        values for fields not in the group.
+        """
+
+        fields = list(fields.items()) if isinstance(fields, dict) else list(fields)
+        if len(fields) == 0:
+            raise ValueError(f"Group property {name} must have at least one field.")
+        self._check_name(name)
+        for field, _ in fields:
+            if hasattr(self, field) or field == name:
+                raise ValueError(f"Group property field {field} conflicts with an existing attribute.")
+        if isinstance(default, dict) and not set(default).issubset(field for field, _ in fields):
+            unknown = sorted(set(default).difference(field for field, _ in fields))
+            raise ValueError(f"Group property {name} has no field(s) {unknown} for the default values.")
+
+        # initialize the property to a packed structured array of size self._capacity and default value(s)
+        records = np.zeros(self._capacity, dtype=np.dtype(fields, align=False))
+        for field, _ in fields:
+            records[field] = default.get(field, 0) if isinstance(default, dict) else default
+        setattr(self, name, records)
+        self._groups[name] = [field for field, _ in fields]
+        self._bind_group(name)
+
+        return
+
+    def add_event_log(self, name: str = "events", chunk_size: int = 1 << 16, path=None, nchunks: int = 4) -> EventLog:
+        """
+        Adds an event log (see `laser_core.eventlog.EventLog`) to the object.
+
+        Parameters:
+
+            name (str, optional): The name of the event log property. Default is "events".
+            chunk_size (int, optional): The number of events in each chunk. Default is 65,536.
+            path (Path | str, optional): The file to which events are spilled. Default is None (a temporary file).
+            nchunks (int, optional): The number of chunks in each thread's ring. Default is 4.
+
+        Returns:
+
+            EventLog: The new event log.
+
+        Note:
+
+            Agent indices recorded in the log refer to the frame order at the time of recording, i.e., they are not updated by `sort()` or `squash()`.
+        """
+
+        log = EventLog(chunk_size=chunk_size, path=path, nchunks=nchunks)
+        setattr(self, name, log)
+
+        return log
+
+    def _check_name(self, name: str) -> None:
+        # replacing an existing property (or method) would, e.g., detach a group field from its record array
+        if hasattr(self, name):
+            raise ValueError(f"Property {name} conflicts with an existing attribute.")
+
+        return
+
+    def _bind_group(self, name: str) -> None:
+        # (re)expose the fields of a group as views into its current record array
+        records = self.__dict__[name]
+        for field in self._groups[name]:
+            self.__dict__[field] = records[field]
+
+        return
+
+    def _columns(self):
+        # 1-D, capacity-length properties (including group record arrays but not their field views)
+        views = {field for fields in self._groups.values() for field in fields}
+        for key, value in self.__dict__.items():
+            if key not in views and isinstance(value, np.ndarray) and len(value.shape) == 1 and value.shape[0] == self._capacity:
+                yield key, value
+
     @property
     def count(self) -> int:
         """
@@ -197,6 +312,77 @@ class LaserFrame:
         j = self._count
         return i, j
 
+    def schedule_preborns(self, activation_ticks) -> None:
+        """
+        Schedules the inactive ("preborn") entries [count, capacity) for activation at the given ticks.
+
+        The preborn entries of all scalar, group, and vector (length, capacity) properties are sorted by activation tick
+        (stable) and an offset table is built so that `activate(tick)`
+        only has to advance the active count past the entries born on or before `tick` - an O(births) slice rather than
+        a scan of the whole population for `dob == tick`.
+
+        Parameters:
+
+            activation_ticks (np.ndarray): The (non-negative) activation tick of each inactive entry. Must be of integer type and have length capacity - count.
+
+        Raises:
+
+            TypeError: If `activation_ticks` is not an integer array or if its length does not match the number of inactive entries.
+            ValueError: If `activation_ticks` contains negative values.
+
+        Returns:
+
+            None
+        """
+
+        npreborn = self._capacity - self._count
+        _is_instance(activation_ticks, np.ndarray, f"Activation ticks must be a numpy array (got {type(activation_ticks)})")
+        _has_shape(activation_ticks, (npreborn,), f"Activation ticks must have the same length as the inactive element count ({npreborn})")
+        _is_dtype(activation_ticks, np.integer, f"Activation ticks must be an integer array (got {activation_ticks.dtype})")
+        if np.any(activation_ticks < 0):
+            raise ValueError("Activation ticks must be non-negative.")
+
+        order = np.argsort(activation_ticks, kind="stable")
+        start = self._count
+        for _, value in self._columns():
+            value[start:] = value[start:][order]
+        for value in self.__dict__.values():
+            if isinstance(value, np.ndarray) and len(value.shape) == 2 and value.shape[1] == self._capacity:
+                value[:, start:] = value[:, start:][:, order]
+
+        # offsets[t] is the index of the first preborn with activation tick >= t
+        ticks = activation_ticks[order]
+        nticks = int(ticks[-1]) + 1 if npreborn > 0 else 0
+        self._preborn_offsets = start + np.searchsorted(ticks, np.arange(nticks + 1), side="left").astype(np.int64)
+
+        return
+
+    def activate(self, tick: int) -> tuple[int, int]:
+        """
+        Activates the scheduled preborn entries with activation tick <= `tick` (see `schedule_preborns()`).
+
+        Activation is equivalent to `add()` with the number of entries due, i.e., the active count is advanced past them.
+
+        Parameters:
+
+            tick (int): The current tick.
+
+        Returns:
+
+            tuple[int, int]: A tuple containing the [start index, end index) of the activated entries.
+
+        Raises:
+
+            ValueError: If no preborns have been scheduled.
+        """
+
+        if self._preborn_offsets is None:
+            raise ValueError("frame.activate() requires scheduled preborns (see schedule_preborns()).")
+
+        end = self._preborn_offsets[min(max(tick + 1, 0), len(self._preborn_offsets) - 1)]
+
+        return self.add(max(int(end) - self._count, 0))
+
     def __len__(self) -> int:
         return self._count
 
@@ -219,13 +405,16 @@ class LaserFrame:
         _has_shape(indices, (self._count,), f"Indices must have the same length as the frame active element count ({self._count})")
         _is_dtype(indices, np.integer, f"Indices must be an integer array (got {indices.dtype})")
 
-        for key, value in self.__dict__.items():
-            if isinstance(value, np.ndarray) and len(value.shape) == 1 and value.shape[0] == self._capacity:
-                if verbose:
-                    print(f"Sorting {self._count:,} elements of {key}")
-                sort = np.zeros_like(value)
-                sort[: self._count] = value[indices]
-                self.__dict__[key] = sort
+        for key, value in list(self._columns()):
+            if verbose:
+                print(f"Sorting {self._count:,} elements of {key}")
+            sort = np.zeros_like(value)
+            sort[: self._count] = value[indices]
+            sort[self._count :] = value[self._count :]  # keep inactive (e.g., preborn) entries
+            self.__dict__[key] = sort
+
+        for name in self._groups:
+            self._bind_group(name)
 
         return
 
@@ -253,12 +442,17 @@ class LaserFrame:
 
         current_count = self._count
         selected_count = indices.sum()
-        for key, value in self.__dict__.items():
-            if isinstance(value, np.ndarray) and len(value.shape) == 1 and value.shape[0] == self._capacity:
-                if verbose:
-                    print(f"Squashing {key} from {current_count:,} to {selected_count:,}")
-                value[:selected_count] = value[:current_count][indices]
+        shift = current_count - selected_count
+        for key, value in self._columns():
+            if verbose:
+                print(f"Squashing {key} from {current_count:,} to {selected_count:,}")
+            value[:selected_count] = value[:current_count][indices]
+            if self._preborn_offsets is not None:
+                # move the scheduled preborns down to follow the remaining active entries
+                value[selected_count : self._capacity - shift] = value[current_count:]
         self._count = selected_count
+        if self._preborn_offsets is not None:
+            self._preborn_offsets -= shift
 
         return
 
@@ -7,7 +7,7 @@ on the Earth's surface using the Haversine formula.
 
 Functions:
 
-    gravity(pops: np.ndarray, distances: np.ndarray, k: float, a: float, b: float, c: float, max_frac: Union[float, None]=None, kwargs) -> np.ndarray:
+    gravity(pops: np.ndarray, distances: np.ndarray, k: float, a: float, b: float, c: float, out: Union[np.ndarray, None]=None, kwargs) -> np.ndarray:
 
     row_normalizer(network: np.ndarray, max_rowsum: float) -> np.ndarray:
 
@@ -24,14 +24,39 @@ Functions:
     distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
 
         Calculate the great-circle distance between two points on the Earth's surface using the Haversine formula.
+
+    distance_matrix(lat1: np.ndarray, lon1: np.ndarray, lat2: Union[np.ndarray, None]=None, lon2: Union[np.ndarray, None]=None, dtype=np.float64, condensed: bool=False) -> np.ndarray:
+
+        Calculate all pairwise great-circle distances between two sets of points, or within one set of points, in parallel.
+
+    sparse_gravity(pops: np.ndarray, latitudes: np.ndarray, longitudes: np.ndarray, k: float, a: float, b: float, c: float, max_distance: Union[float, None]=None, top_k: Union[int, None]=None) -> tuple:
+
+        Calculate a gravity model network, restricted to nearby destinations, in compressed sparse row (CSR) format.
+
+    sparse_row_normalizer(indptr: np.ndarray, data: np.ndarray, max_rowsum: float) -> np.ndarray:
+
+        Normalize the rows of a CSR network such that no row sum exceeds a specified maximum value.
+
+    sparse_matvec(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, x: np.ndarray, out: Union[np.ndarray, None]=None) -> np.ndarray:
+
+        Multiply a CSR network by a vector.
+
+Classes:
+
+    SpatialIndex(latitudes: np.ndarray, longitudes: np.ndarray, leaf_size: int=16):
+
+        A k-d tree over node locations for batched radius and k-nearest neighbor queries returning CSR neighbor lists.
 """
 
+import math
 from numbers import Number
+from typing import Union
 
+import numba as nb
 import numpy as np
 
 
-def gravity(pops: np.ndarray, distances: np.ndarray, k: float, a: float, b: float, c: float, **kwargs):
+def gravity(pops: np.ndarray, distances: np.ndarray, k: float, a: float, b: float, c: float, out: Union[np.ndarray, None] = None, **kwargs):
     r"""
     Calculate a gravity model network.
 
@@ -44,7 +69,8 @@ def gravity(pops: np.ndarray, distances: np.ndarray, k: float, a: float, b: floa
     .. math::
         network_{i,j} = k \cdot \frac{p_i^a \cdot p_j^b}{distance_{i,j}^c}
 
-    As implemented in NumPy:
+    As implemented, with ``pops ** a`` and ``pops ** b`` calculated once, in a parallel Numba kernel which computes
+    each row in a single pass directly into the output, equivalent to the NumPy:
 
     .. code-block:: python
 
@@ -63,6 +89,9 @@ def gravity(pops: np.ndarray, distances: np.ndarray, k: float, a: float, b: floa
             Exponent for the population size of the destination node.
         c (float):
             Exponent for the distance between nodes, controlling how distance impacts flows.
+        out (numpy.ndarray, optional):
+            A float32 or float64 N x N array for the network, which may be `distances` itself.
+            Default is None, i.e., allocate a float64 network (pass a float32 `out` for a float32 network).
         \*\*kwargs:
             Additional keyword arguments (not used in the current implementation).
 
@@ -71,6 +100,10 @@ def gravity(pops: np.ndarray, distances: np.ndarray, k: float, a: float, b: floa
             A 2D matrix representing the interaction network, where each element `network[i, j]` corresponds
             to the flow from node `i` to node `j`.
 
+    **Raises**:
+        TypeError:
+            If `out` is not a float32 or float64 array with the same shape as `distances`.
+
     **Example Usage**:
 
     .. code-block:: python
@@ -99,24 +132,20 @@ def gravity(pops: np.ndarray, distances: np.ndarray, k: float, a: float, b: floa
         print(migration_network)
 
     **Notes**:
-        - The diagonal of the `distances` array is set to `1` internally to avoid division by zero.
+        - The diagonal of the `distances` array is ignored to avoid division by zero.
         - The diagonal of the output `network` matrix is set to `0` to represent no self-loops.
         - Ensure the `distances` matrix is symmetric and non-negative.
     """
     # Ensure pops and distances are valid
     _sanity_checks(pops, distances, a=a, b=b, c=c, k=k)
+    out = _network_out(out, distances)
 
-    # Prevent division by zero by setting diagonal to 1
-    distances1 = distances.copy()
-    np.fill_diagonal(distances1, 1)
+    # Compute the gravity model network, k * p_i^a * p_j^b / d_ij^c, with zeros on the diagonal
+    pa = pops.astype(np.float64) ** a
+    pb = pops.astype(np.float64) ** b
+    _gravity(pa, pb, distances, float(k), float(c), out)
 
-    # Compute the gravity model network
-    network = k * (pops[:, np.newaxis] ** a) * (pops**b) * (distances1 ** (-1 * c))
-
-    # Set the diagonal of the network to 0
-    np.fill_diagonal(network, 0)
-
-    return network
+    return out
 
 
 def row_normalizer(network, max_rowsum):
@@ -150,7 +179,7 @@ def row_normalizer(network, max_rowsum):
     return network
 
 
-def competing_destinations(pops, distances, k, a, b, c, delta, **params):
+def competing_destinations(pops, distances, k, a, b, c, delta, out=None, **params):
     r"""
     Calculate the competing destinations model for a given set of populations and distances. (Fotheringham AS. Spatial flows and spatial patterns. Environment and planning A. 1984;16(4):529-543)
 
@@ -162,19 +191,16 @@ def competing_destinations(pops, distances, k, a, b, c, delta, **params):
 
         element-by-element: :math:`network_{i,j} = k \times p_i^a \times p_j^b / distance_{i,j}^c \times \sum_k {(p_k^b / distance_{j,k}^c \text {\small for k not in [i,j]})^{delta} }`
 
-        as-implemented numpy math:
+        as-implemented (two parallel Numba passes over the rows, no N x N temporaries):
 
-            compute all terms up to the sum_k using the gravity model
+            Sum the terms inside the sum over all k != j: ``row_sums[j] = sum(p[k]**b * distances[j][k]**(-c))``
 
-            Construct the matrix inside the sum: ``p**b * distances**(1-c)``
+            Now element-by-element, compute the inverse distance term once, use it for both the gravity term and
+            the k=i term to subtract off the sum, exponentiate, and multiply (distances are symmetric):
 
-            Sum on the second axis (k), and subtract off the diagonal (j=k terms):
+                ``t = distances[i][j]**(-c)``
 
-                ``row_sums = np.sum(competition_matrix, axis=1) - np.diag(competition_matrix)``
-
-            Now element-by-element, subtract k=i terms off the sum, exponentiate, and multiply the original network term:
-
-                ``network[i][j] = network[i][j] * (row_sums[i] - competition_matrix[i][j]) ** delta``
+                ``network[i][j] = k * p[i]**a * p[j]**b * t * (row_sums[j] - p[i]**b * t) ** delta``
 
     Parameters:
 
@@ -185,7 +211,9 @@ def competing_destinations(pops, distances, k, a, b, c, delta, **params):
         b (float): Exponent parameter for populations in the gravity model.
         c (float): Exponent parameter for distances in the gravity model.
         delta (float): Exponent parameter for the competing destinations adjustment.
-        \*\*params: Additional parameters to be passed to the gravity model.
+        out (numpy.ndarray, optional): A float32 or float64 N x N array for the network, which may be `distances` itself.
+                                       Default is None, i.e., allocate a float64 network.
+        \*\*params: Additional parameters (not used in the current implementation).
 
     Returns:
 
@@ -194,26 +222,13 @@ def competing_destinations(pops, distances, k, a, b, c, delta, **params):
 
     # Sanity checks
     _sanity_checks(pops, distances, a=a, k=k, b=b, c=c, delta=delta)
+    out = _network_out(out, distances)
 
-    network = gravity(pops, distances, k=k, a=a, b=b, c=c, **params)
-    # Construct the p_j^b / d_jk^c matrix, inside the sum
-    distances1 = distances.copy()
-    np.fill_diagonal(distances1, 1)  # Prevent division by zero in `distances ** (-1 * c)`
-    competition_matrix = pops**b * distances1 ** (-1 * c)
-
-    # Sum over all k, and remove the terms j=k
-    # Don't subtract off the diagonal - this could be a NaN if distance to self is zero
-    np.fill_diagonal(competition_matrix, 0)
-    mysums = np.sum(competition_matrix, axis=1)
-    # Rather than computing that interior sum for each element, just compute the row sums,
-    # and then subtract the k=i term.
-    for i in range(len(pops)):
-        for j in range(len(pops)):
-            if j != i:
-                network[i][j] = network[i][j] * (mysums[j] - competition_matrix[j][i]) ** delta
+    pa = pops.astype(np.float64) ** a
+    pb = pops.astype(np.float64) ** b
+    _competing_destinations(pa, pb, distances, float(k), float(c), float(delta), out)
 
-    np.fill_diagonal(network, 0)
-    return network
+    return out
 
 
 def sum_populations_as_close_or_closer(sorted_pops, sorted_distance_row):
@@ -262,9 +277,9 @@ def stouffer(pops, distances, k, a, b, include_home, **params):
 
         the parameter ``include_home`` determines whether :math:`p_i` is included or excluded from the sum
 
-        as-implemented numpy math:
+        as-implemented (in parallel over source nodes with Numba):
 
-            Sort each row of the distance matrix (we'll use \' below to indicate distance-sorted vectors)
+            Sort each row of the distance matrix once (we'll use \' below to indicate distance-sorted vectors)
 
             Loop over "source nodes" i:
 
@@ -274,7 +289,7 @@ def stouffer(pops, distances, k, a, b, include_home, **params):
 
                 Construct the row of the network matrix as :math:`k \times p_i^a \times (p_{j'} / \sum_{k'} {p_{k'}})^b`
 
-            Unsort the rows of the network
+            Scatter the row back into the network through the sort order
 
     Parameters:
 
@@ -296,21 +311,9 @@ def stouffer(pops, distances, k, a, b, include_home, **params):
 
     # We will just use the "truthiness" of include_home (could be boolean, could be 0/1)
 
-    network = np.zeros_like(distances)
-    sort_indices = np.argsort(distances, axis=1, kind="stable")
-    unsort_indices = np.argsort(sort_indices, axis=1)
-
-    for i in range(len(pops)):
-        sorted_pops = pops[sort_indices[i]]
-        cumulative_sorted_pops = sum_populations_as_close_or_closer(sorted_pops, distances[i][sort_indices[i]])
+    network = np.empty_like(distances)
+    _intervening_opportunities(pops.astype(np.float64), distances, float(k), float(a), float(b), bool(include_home), False, network)
 
-        if not include_home:
-            cumulative_sorted_pops = cumulative_sorted_pops - sorted_pops[0]
-
-        network[i, 1:] = k * pops[i] ** a * (sorted_pops[1:] / cumulative_sorted_pops[1:]) ** b
-    network = np.take_along_axis(network, unsort_indices, axis=1)
-
-    np.fill_diagonal(network, 0)
     return network
 
 
@@ -330,9 +333,9 @@ def radiation(pops, distances, k, include_home, **params):
 
         the parameter ``include_home`` determines whether :math:`p_i` is included or excluded from the sum
 
-        as-implemented numpy math:
+        as-implemented (in parallel over source nodes with Numba):
 
-            Sort each row of the distance matrix (we'll use \' below to indicate distance-sorted vectors)
+            Sort each row of the distance matrix once (we'll use \' below to indicate distance-sorted vectors)
 
             Loop over "source nodes" i:
 
@@ -344,7 +347,7 @@ def radiation(pops, distances, k, include_home, **params):
 
                     :math:`k \times p_i \times p_{j'} / (p_i + \sum_{k'} {p_{k'}}) / (p_i + p_{j'} + \sum_{k'} {p_{k'}})`
 
-            Unsort the rows of the network
+            Scatter the row back into the network through the sort order
 
     Parameters:
 
@@ -364,21 +367,9 @@ def radiation(pops, distances, k, include_home, **params):
 
     # We will just use the "truthiness" of include_home (could be boolean, could be 0/1)
 
-    network = np.zeros_like(distances)
-    sort_indices = np.argsort(distances, axis=1, kind="stable")
-    unsort_indices = np.argsort(sort_indices, axis=1)
-
-    for i in range(len(pops)):
-        sorted_pops = pops[sort_indices[i]]
-        cumulative_sorted_pops = sum_populations_as_close_or_closer(sorted_pops, distances[i][sort_indices[i]])
+    network = np.empty_like(distances)
+    _intervening_opportunities(pops.astype(np.float64), distances, float(k), 1.0, 1.0, bool(include_home), True, network)
 
-        if not include_home:
-            cumulative_sorted_pops = cumulative_sorted_pops - sorted_pops[0]
-
-        network[i] = k * pops[i] * sorted_pops / (pops[i] + cumulative_sorted_pops) / (pops[i] + sorted_pops + cumulative_sorted_pops)
-
-    network = np.take_along_axis(network, unsort_indices, axis=1)
-    np.fill_diagonal(network, 0)
     return network
 
 
@@ -424,21 +415,9 @@ def distance(lat1, lon1, lat2, lon2):
     _has_shape(lon1, lat1.shape, f"lat1 and lon1 must have the same shape ({lat1.shape=}, {lon1.shape=})")
     _has_shape(lon2, lat2.shape, f"lat2 and lon2 must have the same shape ({lat2.shape=}, {lon2.shape=})")
 
-    # convert to radians
-    lat1 = np.radians(lat1)
-    lon1 = np.radians(lon1)
-    lat2 = np.radians(lat2)
-    lon2 = np.radians(lon2)
-    d = np.zeros((lat1.size, lat2.size))
-    for index in range(lat1.size):
-        # haversine formula (https://en.wikipedia.org/wiki/Haversine_formula)
-        dlat = lat2 - lat1[index]
-        dlon = lon2 - lon1[index]
-        a = np.sin(dlat / 2) ** 2 + np.cos(lat1[index]) * np.cos(lat2) * np.sin(dlon / 2) ** 2
-        d[index, :] = a
-    d = 2 * np.arcsin(np.sqrt(d))
-    RE = 6371.0  # Earth radius in km
-    d *= RE
+    # haversine formula (https://en.wikipedia.org/wiki/Haversine_formula), in parallel over the rows
+    d = np.empty((lat1.size, lat2.size))
+    _distances(lat1.astype(np.float64), lon1.astype(np.float64), lat2.astype(np.float64), lon2.astype(np.float64), d)
 
     if d.size == 1:
         return d[0, 0]  # return a scalar
@@ -448,9 +427,808 @@ def distance(lat1, lon1, lat2, lon2):
     return d  # return NxM matrix (len(lat1/lon1) x len(lat2/lon2))
 
 
+def distance_matrix(lat1, lon1, lat2=None, lon2=None, dtype=np.float64, condensed=False):
+    """
+    Calculate the great-circle distances, in kilometers, between all pairs of points using the Haversine formula.
+
+    With only `lat1` and `lon1`, calculates the distances between all pairs of those points, computing each pair
+    once (in parallel tiles) and mirroring it into the symmetric N x N result. With `condensed=True` only the upper
+    triangle is stored, as a vector of N * (N - 1) / 2 distances in the same order as `scipy.spatial.distance.pdist`,
+    i.e., the distance between points i < j is at index ``N * i - i * (i + 1) // 2 + j - i - 1``.
+
+    With `lat2` and `lon2` as well, calculates the N x M distances from each of the first points to each of the second points.
+
+    Parameters:
+
+        lat1 (np.ndarray): Latitudes of the (first) points in decimal degrees [-90, 90].
+        lon1 (np.ndarray): Longitudes of the (first) points in decimal degrees [-180, 180].
+        lat2 (np.ndarray, optional): Latitudes of the second points in decimal degrees [-90, 90]. Default is None.
+        lon2 (np.ndarray, optional): Longitudes of the second points in decimal degrees [-180, 180]. Default is None.
+        dtype (data-type, optional): np.float32 or np.float64. Default is np.float64.
+        condensed (bool, optional): Return only the upper triangle of the symmetric distance matrix. Default is False.
+
+    Returns:
+
+        np.ndarray: The N x N or N x M distance matrix or, if condensed, the N * (N - 1) / 2 upper triangle distances.
+
+    Raises:
+
+        TypeError: If the coordinates are not arrays of matching shapes or dtype is not np.float32 or np.float64.
+        ValueError: If the coordinates are out of range or `condensed` is requested with `lat2` and `lon2`.
+    """
+
+    # Sanity checks
+    _is_instance(lat1, np.ndarray, f"lat1 must be a NumPy array ({type(lat1)=})")
+    lat1, lon1 = _coordinates(lat1, lon1, lat1.shape)
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise TypeError(f"dtype must be np.float32 or np.float64 ({dtype=})")
+    lat1, lon1 = lat1.reshape(-1), lon1.reshape(-1)
+
+    if lat2 is None and lon2 is None:
+        n = len(lat1)
+        if condensed:
+            out = np.empty(n * (n - 1) // 2, dtype=dtype)
+            _condensed_distances(lat1, lon1, out)
+        else:
+            out = np.empty((n, n), dtype=dtype)
+            _symmetric_distances(lat1, lon1, out)
+        return out
+
+    if condensed:
+        raise ValueError("condensed distances require a single set of points (no lat2/lon2)")
+    _is_instance(lat2, np.ndarray, f"lat2 must be a NumPy array ({type(lat2)=})")
+    lat2, lon2 = _coordinates(lat2, lon2, lat2.shape)
+    lat2, lon2 = lat2.reshape(-1), lon2.reshape(-1)
+    out = np.empty((len(lat1), len(lat2)), dtype=dtype)
+    _distances(lat1, lon1, lat2, lon2, out)
+
+    return out
+
+
+def sparse_gravity(pops, latitudes, longitudes, k, a, b, c, max_distance=None, top_k=None):
+    r"""
+    Calculate a gravity model network, keeping only destinations within a distance cutoff and/or the `top_k` nearest
+    destinations of each origin, in compressed sparse row (CSR) format.
+
+    Candidate destinations are found with a `SpatialIndex` so neither the N x N distance matrix nor the N x N network
+    is ever allocated, nor are all N x N distances calculated. Entries are the same as those of `gravity()`:
+
+    .. math::
+        network_{i,j} = k \cdot \frac{p_i^a \cdot p_j^b}{distance_{i,j}^c}
+
+    The network is returned as the usual CSR arrays: the destinations of origin `i` are ``indices[indptr[i]:indptr[i+1]]``,
+    in ascending order, with rates ``data[indptr[i]:indptr[i+1]]``, e.g., ``scipy.sparse.csr_array((data, indices, indptr))``.
+    Self-loops are not included.
+
+    Parameters:
+
+        pops (numpy.ndarray): 1D array of population sizes for each node.
+        latitudes (numpy.ndarray): Latitudes of the nodes in decimal degrees [-90, 90].
+        longitudes (numpy.ndarray): Longitudes of the nodes in decimal degrees [-180, 180].
+        k (float): Scaling constant.
+        a (float): Exponent for the population size of the origin node.
+        b (float): Exponent for the population size of the destination node.
+        c (float): Exponent for the distance between nodes.
+        max_distance (float, optional): Keep only destinations at most this far (km) from the origin. Default is None.
+        top_k (int, optional): Keep only the `top_k` nearest destinations (ties go to the lower index). Default is None.
+
+    Returns:
+
+        tuple: (indptr, indices, data) - np.int64 row offsets (length N+1), np.int64 destinations, and np.float64 rates.
+
+    Raises:
+
+        TypeError: If an argument is not of the expected type or shape.
+        ValueError: If an argument is out of range or neither max_distance nor top_k is given.
+    """
+
+    # Sanity checks
+    _is_instance(pops, np.ndarray, f"pops must be a NumPy array ({type(pops)=})")
+    _has_dimensions(pops, 1, f"pops must be a 1D array ({pops.shape=})")
+    _is_dtype(pops, np.number, f"pops must be a numeric array ({pops.dtype=})")
+    _has_values(pops >= 0, "pops must contain only non-negative values")
+    latitudes, longitudes = _coordinates(latitudes, longitudes, pops.shape)
+    for name, value in (("k", k), ("a", a), ("b", b), ("c", c)):
+        _is_instance(value, Number, f"{name} must be a numeric value ({type(value)=})")
+        _has_values(value >= 0, f"{name} must be a non-negative value ({value=})")
+    if max_distance is None and top_k is None:
+        raise ValueError("one of max_distance or top_k is required")
+    if max_distance is not None:
+        _is_instance(max_distance, Number, f"max_distance must be a numeric value ({type(max_distance)=})")
+        _has_values(max_distance >= 0, f"max_distance must be a non-negative value ({max_distance=})")
+    if top_k is not None:
+        _is_instance(top_k, (int, np.integer), f"top_k must be an integer ({type(top_k)=})")
+        _has_values(top_k > 0, f"top_k must be a positive integer ({top_k=})")
+
+    pa = pops.astype(np.float64) ** a
+    pb = pops.astype(np.float64) ** b
+    index = SpatialIndex(latitudes, longitudes)
+    exclude = np.arange(len(pops))  # no self-loops
+    if top_k is None:
+        indptr, indices, distances = index.query_radius(latitudes, longitudes, max_distance, exclude=exclude)
+    else:
+        indptr, indices, distances = index.query_nearest(latitudes, longitudes, top_k, exclude=exclude)
+        if max_distance is not None:
+            keep = distances <= max_distance
+            indptr = np.concatenate(([0], np.cumsum(keep)))[indptr]
+            indices, distances = indices[keep], distances[keep]
+    data = _gravity_csr(pa, pb, indptr, indices, distances, float(k), float(c))
+
+    return indptr, indices, data
+
+
+def sparse_row_normalizer(indptr, data, max_rowsum):
+    """
+    Normalizes the rows of a CSR network, e.g., from `sparse_gravity()`, such that no row sum exceeds a specified maximum value.
+
+    Like `row_normalizer()`, the network is updated in place.
+
+    Parameters:
+
+        indptr (numpy.ndarray): The CSR row offsets.
+        data (numpy.ndarray): The CSR values (floating point, they are scaled in place).
+        max_rowsum (float): The maximum allowable sum for any row in the network.
+
+    Returns:
+
+        numpy.ndarray: `data`, normalized so that no row sum exceeds the specified maximum value.
+    """
+
+    # Sanity checks
+    _check_csr(indptr, None, data)
+    _is_dtype(data, np.floating, f"data must be a floating point array ({data.dtype=})")
+    _has_values(data >= 0, "data must contain only non-negative values")
+    _is_instance(max_rowsum, Number, f"max_rowsum must be a numeric value ({type(max_rowsum)=})")
+    _has_values(0 <= max_rowsum <= 1, "max_rowsum must be in [0, 1]")
+
+    _sparse_row_normalize(indptr, data, float(max_rowsum))
+
+    return data
+
+
+def sparse_matvec(indptr, indices, data, x, out=None):
+    """
+    Multiply a CSR network by a vector, i.e., ``out[i] = sum(network[i, j] * x[j])``, in parallel over rows.
+
+    Parameters:
+
+        indptr (numpy.ndarray): The CSR row offsets.
+        indices (numpy.ndarray): The CSR column indices.
+        data (numpy.ndarray): The CSR values.
+        x (numpy.ndarray): The vector, one value per column.
+        out (numpy.ndarray, optional): The output array, one value per row. Default is None, i.e., allocate a np.float64 array.
+
+    Returns:
+
+        numpy.ndarray: The product, one value per row.
+    """
+
+    # Sanity checks
+    _check_csr(indptr, indices, data)
+    _is_instance(x, np.ndarray, f"x must be a NumPy array ({type(x)=})")
+    _has_dimensions(x, 1, f"x must be a 1D array ({x.shape=})")
+    _has_values((indices >= 0) & (indices < len(x)), f"indices must be valid indices into x ({len(x)=})")
+    if out is None:
+        out = np.empty(len(indptr) - 1, dtype=np.float64)
+    _is_instance(out, np.ndarray, f"out must be a NumPy array ({type(out)=})")
+    _has_shape(out, (len(indptr) - 1,), f"out must have one element per row ({out.shape=}, {indptr.shape=})")
+
+    _sparse_matvec(indptr, indices, data, x, out)
+
+    return out
+
+
+class SpatialIndex:
+    """
+    A spatial index over node locations for "all nodes within R km" and "k nearest nodes" queries without calculating
+    all N x M great-circle distances.
+
+    The index is a k-d tree over the points' 3D unit vectors. Straight line (chord) distance between points on the
+    sphere increases with great-circle distance, so the bounding boxes of the tree give lower bounds on the great-circle
+    distance to every point in a subtree. Distances reported, and compared to the radius, are the same haversine
+    distances as `distance()`.
+
+    __init__ builds the tree in O(N log N) from latitudes and longitudes
+
+    __query_radius__ returns the indices of, and distances to, all points within a radius of each query point
+
+    __query_nearest__ returns the indices of, and distances to, the k nearest points to each query point
+
+    Queries are batched and run in parallel over the query points. Results are CSR neighbor lists: the neighbors of
+    query point q are ``indices[indptr[q]:indptr[q+1]]`` with distances ``distances[indptr[q]:indptr[q+1]]``.
+    """
+
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray, leaf_size: int = 16):
+        """
+        Initializes a new instance of the class from point latitudes and longitudes.
+
+        Parameters:
+
+            latitudes (np.ndarray): Latitudes of the points in decimal degrees [-90, 90].
+            longitudes (np.ndarray): Longitudes of the points in decimal degrees [-180, 180].
+            leaf_size (int, optional): The maximum number of points in each leaf of the tree. Default is 16.
+
+        Raises:
+
+            TypeError: If the latitudes and longitudes are not 1D arrays of the same shape.
+            ValueError: If the coordinates are out of range, there are no points, or leaf_size is not a positive integer.
+        """
+
+        _is_instance(latitudes, np.ndarray, f"latitudes must be a NumPy array ({type(latitudes)=})")
+        _has_dimensions(latitudes, 1, f"latitudes must be a 1D array ({latitudes.shape=})")
+        latitudes, longitudes = _coordinates(latitudes, longitudes, latitudes.shape)
+        _has_values(len(latitudes) > 0, "latitudes and longitudes must not be empty")
+        _is_instance(leaf_size, (int, np.integer), f"leaf_size must be an integer ({type(leaf_size)=})")
+        _has_values(leaf_size > 0, f"leaf_size must be a positive integer ({leaf_size=})")
+
+        xyz = _unit_vectors(latitudes, longitudes)
+        # order maps tree position to point index, points are stored in tree order for locality
+        self.order, self.starts, self.ends, self.lower, self.upper = _build_tree(xyz, int(leaf_size))
+        self.xyz = xyz[self.order]
+        self.points = _points(latitudes[self.order], longitudes[self.order])
+
+        return
+
+    def __len__(self) -> int:
+        """
+        Return the number of points in the index.
+
+        Returns:
+
+            int: The number of points in the index.
+        """
+
+        return len(self.order)
+
+    def query_radius(self, latitudes: np.ndarray, longitudes: np.ndarray, radius: float, exclude: Union[np.ndarray, None] = None):
+        """
+        Find all points within `radius` km (inclusive) of each query point.
+
+        Parameters:
+
+            latitudes (np.ndarray): Latitudes of the query points in decimal degrees [-90, 90].
+            longitudes (np.ndarray): Longitudes of the query points in decimal degrees [-180, 180].
+            radius (float): The search radius in km.
+            exclude (np.ndarray, optional): The index of a point to leave out of the results of each query point (or -1),
+                                            e.g., ``np.arange(N)`` to query the indexed points without themselves. Default is None.
+
+        Returns:
+
+            tuple: (indptr, indices, distances) - np.int64 CSR offsets (one more than the query points), np.int64 point
+                   indices, in ascending order for each query point, and np.float64 distances in km.
+        """
+
+        _is_instance(radius, Number, f"radius must be a numeric value ({type(radius)=})")
+        _has_values(radius >= 0, f"radius must be a non-negative value ({radius=})")
+        xyz, points, exclude = self._queries(latitudes, longitudes, exclude)
+
+        return _query_radius(self.xyz, self.points, self.order, self.starts, self.ends, self.lower, self.upper, xyz, points, exclude, float(radius))
+
+    def query_nearest(self, latitudes: np.ndarray, longitudes: np.ndarray, k: int, exclude: Union[np.ndarray, None] = None):
+        """
+        Find the `k` nearest points to each query point (ties go to the lower index).
+
+        Parameters:
+
+            latitudes (np.ndarray): Latitudes of the query points in decimal degrees [-90, 90].
+            longitudes (np.ndarray): Longitudes of the query points in decimal degrees [-180, 180].
+            k (int): The number of neighbors to find, fewer are returned if there are fewer points in the index.
+            exclude (np.ndarray, optional): The index of a point to leave out of the results of each query point (or -1),
+                                            e.g., ``np.arange(N)`` to query the indexed points without themselves. Default is None.
+
+        Returns:
+
+            tuple: (indptr, indices, distances) - np.int64 CSR offsets (one more than the query points), np.int64 point
+                   indices, nearest first for each query point, and np.float64 distances in km.
+        """
+
+        _is_instance(k, (int, np.integer), f"k must be an integer ({type(k)=})")
+        _has_values(k > 0, f"k must be a positive integer ({k=})")
+        xyz, points, exclude = self._queries(latitudes, longitudes, exclude)
+
+        return _query_nearest(
+            self.xyz, self.points, self.order, self.starts, self.ends, self.lower, self.upper, xyz, points, exclude, min(int(k), len(self))
+        )
+
+    def _queries(self, latitudes, longitudes, exclude):
+        _is_instance(latitudes, np.ndarray, f"latitudes must be a NumPy array ({type(latitudes)=})")
+        _has_dimensions(latitudes, 1, f"latitudes must be a 1D array ({latitudes.shape=})")
+        latitudes, longitudes = _coordinates(latitudes, longitudes, latitudes.shape)
+        if exclude is None:
+            exclude = np.full(len(latitudes), -1, dtype=np.int64)
+        _is_instance(exclude, np.ndarray, f"exclude must be a NumPy array ({type(exclude)=})")
+        _is_dtype(exclude, np.integer, f"exclude must be an integer array ({exclude.dtype=})")
+        _has_shape(exclude, latitudes.shape, f"exclude must have one element per query point ({exclude.shape=}, {latitudes.shape=})")
+
+        return _unit_vectors(latitudes, longitudes), _points(latitudes, longitudes), exclude.astype(np.int64)
+
+
+# Numba kernels
+
+_EARTH_RADIUS_KM = 6371.0
+
+
+@nb.njit(nogil=True, cache=True, error_model="numpy")
+def _inverse_power(d, c):  # pragma: no cover
+    # d ** -c with the common integer exponents special cased, pow() is the bulk of the cost of the gravity kernels
+    if c == 2.0:
+        return 1.0 / (d * d)
+    if c == 1.0:
+        return 1.0 / d
+    return d ** (-c)
+
+
+@nb.njit(parallel=True, nogil=True, cache=True, error_model="numpy")
+def _gravity(pa, pb, distances, k, c, out):  # pragma: no cover
+    # Reads distances[i, j] before writing out[i, j] so out may be distances.
+    n = len(pa)
+    for i in nb.prange(n):
+        ki = k * pa[i]
+        for j in range(n):
+            if j != i:
+                out[i, j] = ki * pb[j] * _inverse_power(np.float64(distances[i, j]), c)
+            else:
+                out[i, j] = 0
+
+    return
+
+
+@nb.njit(parallel=True, nogil=True, cache=True, error_model="numpy")
+def _competing_destinations(pa, pb, distances, k, c, delta, out):  # pragma: no cover
+    n = len(pa)
+    # sum of p_m^b / d_jm^c over all m != j
+    sums = np.zeros(n, dtype=np.float64)
+    for j in nb.prange(n):
+        total = 0.0
+        for m in range(n):
+            if m != j:
+                total += pb[m] * _inverse_power(np.float64(distances[j, m]), c)
+        sums[j] = total
+    # the sum for network[i, j] excludes m = i, i.e., p_i^b / d_ji^c = p_i^b / d_ij^c
+    for i in nb.prange(n):
+        ki = k * pa[i]
+        for j in range(n):
+            if j != i:
+                t = _inverse_power(np.float64(distances[i, j]), c)
+                out[i, j] = ki * pb[j] * t * (sums[j] - pb[i] * t) ** delta
+            else:
+                out[i, j] = 0
+
+    return
+
+
+@nb.njit(parallel=True, nogil=True, cache=True, error_model="numpy")
+def _intervening_opportunities(pops, distances, k, a, b, include_home, radiation, out):  # pragma: no cover
+    # Stouffer (radiation=False) and radiation models, see sum_populations_as_close_or_closer() for the tie handling
+    n = len(pops)
+    for i in nb.prange(n):
+        row = distances[i]
+        order = np.argsort(row, kind="mergesort")  # stable
+        # cumulative population of all nodes as close as, or closer than, each node (in sorted order)
+        cumulative = np.empty(n, dtype=np.float64)
+        total = 0.0
+        start = 0
+        for p in range(n):
+            total += pops[order[p]]
+            if p + 1 == n or row[order[p + 1]] != row[order[p]]:
+                for q in range(start, p + 1):
+                    cumulative[q] = total
+                start = p + 1
+        home = 0.0 if include_home else pops[order[0]]
+        if radiation:
+            for p in range(n):
+                j = order[p]
+                closer = cumulative[p] - home
+                out[i, j] = k * pops[i] * pops[j] / (pops[i] + closer) / (pops[i] + pops[j] + closer)
+        else:
+            kpa = k * pops[i] ** a
+            out[i, order[0]] = 0
+            for p in range(1, n):
+                j = order[p]
+                out[i, j] = kpa * (pops[j] / (cumulative[p] - home)) ** b
+        out[i, i] = 0
+
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _haversine(p, i, q, j):  # pragma: no cover
+    # Distance from point p[i] to point q[j], see _points(). The sines of the half differences come from the angle
+    # difference identity, sin(x - y) = sin(x)cos(y) - cos(x)sin(y), so there are no trigonometric calls per pair.
+    sin_dlat = q[j, 0] * p[i, 1] - q[j, 1] * p[i, 0]
+    sin_dlon = q[j, 2] * p[i, 3] - q[j, 3] * p[i, 2]
+    a = sin_dlat * sin_dlat + p[i, 4] * q[j, 4] * sin_dlon * sin_dlon
+    return 2 * math.asin(math.sqrt(min(a, 1.0))) * _EARTH_RADIUS_KM
+
+
+@nb.njit(nogil=True, cache=True)
+def _points(latitudes, longitudes):  # pragma: no cover
+    # sin(lat/2), cos(lat/2), sin(lon/2), cos(lon/2), cos(lat) of each point
+    half_lat = np.radians(latitudes) / 2
+    half_lon = np.radians(longitudes) / 2
+    points = np.empty((len(latitudes), 5), dtype=np.float64)
+    points[:, 0] = np.sin(half_lat)
+    points[:, 1] = np.cos(half_lat)
+    points[:, 2] = np.sin(half_lon)
+    points[:, 3] = np.cos(half_lon)
+    points[:, 4] = np.cos(2 * half_lat)
+
+    return points
+
+
+@nb.njit(parallel=True, nogil=True, cache=True)
+def _distances(lat1, lon1, lat2, lon2, out):  # pragma: no cover
+    points1 = _points(lat1, lon1)
+    points2 = _points(lat2, lon2)
+    for i in nb.prange(len(lat1)):
+        for j in range(len(lat2)):
+            out[i, j] = _haversine(points1, i, points2, j)
+
+    return
+
+
+_TILE = 64
+
+
+@nb.njit(parallel=True, nogil=True, cache=True)
+def _symmetric_distances(latitudes, longitudes, out):  # pragma: no cover
+    # Computes each tile on or above the diagonal and writes it and its transpose.
+    n = len(latitudes)
+    points = _points(latitudes, longitudes)
+    ntiles = (n + _TILE - 1) // _TILE
+    for t in nb.prange(ntiles * (ntiles + 1) // 2):
+        bi = 0
+        bj = t + 0
+        while bj >= ntiles - bi:
+            bj -= ntiles - bi
+            bi += 1
+        bj += bi
+        for i in range(bi * _TILE, min((bi + 1) * _TILE, n)):
+            if bi == bj:
+                out[i, i] = 0
+            for j in range(max(bj * _TILE, i + 1), min((bj + 1) * _TILE, n)):
+                d = _haversine(points, i, points, j)
+                out[i, j] = d
+                out[j, i] = d
+
+    return
+
+
+@nb.njit(parallel=True, nogil=True, cache=True)
+def _condensed_distances(latitudes, longitudes, out):  # pragma: no cover
+    # Upper triangle rows get shorter, so each iteration does row r and row n - 1 - r to balance the work.
+    n = len(latitudes)
+    points = _points(latitudes, longitudes)
+    for r in nb.prange((n + 1) // 2):
+        first = np.int64(r)
+        for h in range(1 if first == n - 1 - first else 2):
+            i = first if h == 0 else n - 1 - first
+            base = n * i - i * (i + 1) // 2 - i - 1
+            for j in range(i + 1, n):
+                out[base + j] = _haversine(points, i, points, j)
+
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _worse(d1, j1, d2, j2):  # pragma: no cover
+    return d1 > d2 or (d1 == d2 and j1 > j2)
+
+
+@nb.njit(nogil=True, cache=True)
+def _nearest_push(heap_d, heap_j, size, d, j):  # pragma: no cover
+    # Keep the len(heap_d) nearest (d, j) pairs in a max-heap (farthest at the root), returns the new size.
+    capacity = len(heap_d)
+    if size < capacity:
+        pos = size
+        size += 1
+    elif _worse(heap_d[0], heap_j[0], d, j):
+        # replace the farthest and sift it down
+        pos = 0
+        while True:
+            child = 2 * pos + 1
+            if child >= size:
+                break
+            if child + 1 < size and _worse(heap_d[child + 1], heap_j[child + 1], heap_d[child], heap_j[child]):
+                child += 1
+            if not _worse(heap_d[child], heap_j[child], d, j):
+                break
+            heap_d[pos] = heap_d[child]
+            heap_j[pos] = heap_j[child]
+            pos = child
+        heap_d[pos] = d
+        heap_j[pos] = j
+        return size
+    else:
+        return size
+    # sift the new entry up
+    while pos > 0:
+        parent = (pos - 1) >> 1
+        if not _worse(d, j, heap_d[parent], heap_j[parent]):
+            break
+        heap_d[pos] = heap_d[parent]
+        heap_j[pos] = heap_j[parent]
+        pos = parent
+    heap_d[pos] = d
+    heap_j[pos] = j
+
+    return size
+
+
+@nb.njit(parallel=True, nogil=True, cache=True, error_model="numpy")
+def _gravity_csr(pa, pb, indptr, indices, distances, k, c):  # pragma: no cover
+    # Sorts each row by destination index (in place) and calculates the gravity model rates.
+    data = np.empty(len(indices), dtype=np.float64)
+    for i in nb.prange(len(indptr) - 1):
+        start, end = indptr[i], indptr[i + 1]
+        order = np.argsort(indices[start:end])
+        row_indices = indices[start:end][order]
+        row_distances = distances[start:end][order]
+        for m in range(end - start):
+            j = row_indices[m]
+            indices[start + m] = j
+            data[start + m] = k * pa[i] * pb[j] * _inverse_power(row_distances[m], c)
+
+    return data
+
+
+@nb.njit(nogil=True, cache=True)
+def _unit_vectors(latitudes, longitudes):  # pragma: no cover
+    lat = np.radians(latitudes)
+    lon = np.radians(longitudes)
+    xyz = np.empty((len(latitudes), 3), dtype=np.float64)
+    xyz[:, 0] = np.cos(lat) * np.cos(lon)
+    xyz[:, 1] = np.cos(lat) * np.sin(lon)
+    xyz[:, 2] = np.sin(lat)
+
+    return xyz
+
+
+@nb.njit(nogil=True, cache=True)
+def _select(order, xyz, lo, hi, kth, axis):  # pragma: no cover
+    # Quickselect: reorder order[lo:hi] so that order[kth] is in sorted position by xyz[:, axis], smaller before, larger after.
+    hi -= 1
+    while lo < hi:
+        a, b, c = xyz[order[lo], axis], xyz[order[(lo + hi) // 2], axis], xyz[order[hi], axis]
+        pivot = max(min(a, b), min(max(a, b), c))  # median of three
+        i, j = lo, hi
+        while i <= j:
+            while xyz[order[i], axis] < pivot:
+                i += 1
+            while xyz[order[j], axis] > pivot:
+                j -= 1
+            if i <= j:
+                order[i], order[j] = order[j], order[i]
+                i += 1
+                j -= 1
+        if kth <= j:
+            hi = j
+        elif kth >= i:
+            lo = i
+        else:
+            break
+
+    return
+
+
+@nb.njit(parallel=True, nogil=True, cache=True)
+def _build_tree(xyz, leaf_size):  # pragma: no cover
+    # Implicit, complete binary tree: node m has children 2m + 1 and 2m + 2 and all leaves are on the last level.
+    # Each node's points are split at the median of the axis with the largest extent, O(N) per level.
+    n = len(xyz)
+    levels = 0
+    while (n + (1 << levels) - 1) >> levels > leaf_size:
+        levels += 1
+    nnodes = (2 << levels) - 1
+    order = np.arange(n)
+    starts = np.zeros(nnodes, dtype=np.int64)
+    ends = np.zeros(nnodes, dtype=np.int64)
+    lower = np.full((nnodes, 3), np.inf)
+    upper = np.full((nnodes, 3), -np.inf)
+    ends[0] = n
+    for level in range(levels + 1):
+        first = (1 << level) - 1
+        for m in nb.prange(1 << level):
+            node = first + m
+            lo, hi = starts[node], ends[node]
+            for t in range(lo, hi):
+                for axis in range(3):
+                    lower[node, axis] = min(lower[node, axis], xyz[order[t], axis])
+                    upper[node, axis] = max(upper[node, axis], xyz[order[t], axis])
+            if level < levels:
+                axis = np.argmax(upper[node] - lower[node]) if hi > lo else 0
+                mid = (lo + hi) // 2
+                if hi - lo > 1:
+                    _select(order, xyz, lo, hi, mid, axis)
+                starts[2 * node + 1], ends[2 * node + 1] = lo, mid
+                starts[2 * node + 2], ends[2 * node + 2] = mid, hi
+
+    return order, starts, ends, lower, upper
+
+
+# Slack, in km, on the bounding box lower bounds so rounding never prunes a point at exactly the search distance.
+_BOUND_SLACK_KM = 1e-6
+
+
+@nb.njit(nogil=True, cache=True)
+def _lower_bound(lower, upper, node, xyz, q):  # pragma: no cover
+    # great-circle distance lower bound from query point xyz[q] to any point in the node's bounding box
+    chord = 0.0
+    for axis in range(3):
+        x = xyz[q, axis]
+        if x < lower[node, axis]:
+            chord += (lower[node, axis] - x) ** 2
+        elif x > upper[node, axis]:
+            chord += (x - upper[node, axis]) ** 2
+    return 2 * math.asin(min(math.sqrt(chord) / 2, 1.0)) * _EARTH_RADIUS_KM - _BOUND_SLACK_KM
+
+
+@nb.njit(nogil=True, cache=True)
+def _radius_search(txyz, tpoints, order, starts, ends, lower, upper, xyz, points, q, exclude, radius, indices, distances, offset):  # pragma: no cover
+    # Depth first search for points within radius of query point q, writes them at offset (if indices is not empty), returns the count.
+    leaves = (len(starts) + 1) // 2 - 1
+    stack = np.empty(128, dtype=np.int64)
+    stack[0] = 0
+    top = 1
+    count = 0
+    while top > 0:
+        top -= 1
+        node = stack[top]
+        if starts[node] == ends[node] or _lower_bound(lower, upper, node, xyz, q) > radius:
+            continue
+        if node >= leaves:
+            for t in range(starts[node], ends[node]):
+                if order[t] != exclude:
+                    d = _haversine(points, q, tpoints, t)
+                    if d <= radius:
+                        if len(indices) > 0:
+                            indices[offset + count] = order[t]
+                            distances[offset + count] = d
+                        count += 1
+        else:
+            stack[top] = 2 * node + 1
+            stack[top + 1] = 2 * node + 2
+            top += 2
+
+    return count
+
+
+@nb.njit(parallel=True, nogil=True, cache=True)
+def _query_radius(txyz, tpoints, order, starts, ends, lower, upper, xyz, points, exclude, radius):  # pragma: no cover
+    # count the neighbors of each query point, then fill them in and sort them by index
+    nqueries = len(xyz)
+    counts = np.zeros(nqueries + 1, dtype=np.int64)
+    empty_i = np.empty(0, dtype=np.int64)
+    empty_d = np.empty(0, dtype=np.float64)
+    for q in nb.prange(nqueries):
+        counts[q + 1] = _radius_search(txyz, tpoints, order, starts, ends, lower, upper, xyz, points, q, exclude[q], radius, empty_i, empty_d, 0)
+    indptr = np.cumsum(counts)
+    indices = np.empty(indptr[nqueries], dtype=np.int64)
+    distances = np.empty(indptr[nqueries], dtype=np.float64)
+    for q in nb.prange(nqueries):
+        start, end = indptr[q], indptr[q + 1]
+        _radius_search(txyz, tpoints, order, starts, ends, lower, upper, xyz, points, q, exclude[q], radius, indices, distances, start)
+        by_index = np.argsort(indices[start:end])
+        distances[start:end] = distances[start:end][by_index]
+        indices[start:end] = indices[start:end][by_index]
+
+    return indptr, indices, distances
+
+
+@nb.njit(parallel=True, nogil=True, cache=True)
+def _query_nearest(txyz, tpoints, order, starts, ends, lower, upper, xyz, points, exclude, k):  # pragma: no cover
+    nqueries = len(xyz)
+    leaves = (len(starts) + 1) // 2 - 1
+    nearest_d = np.empty((nqueries, k), dtype=np.float64)
+    nearest_j = np.empty((nqueries, k), dtype=np.int64)
+    counts = np.zeros(nqueries + 1, dtype=np.int64)
+    for q in nb.prange(nqueries):
+        heap_d = nearest_d[q]
+        heap_j = nearest_j[q]
+        size = 0
+        # depth first, nearer child first, skipping subtrees which cannot beat the current k-th nearest
+        stack = np.empty(128, dtype=np.int64)
+        stack[0] = 0
+        top = 1
+        while top > 0:
+            top -= 1
+            node = stack[top]
+            if starts[node] == ends[node] or (size == k and _lower_bound(lower, upper, node, xyz, q) > heap_d[0]):
+                continue
+            if node >= leaves:
+                for t in range(starts[node], ends[node]):
+                    if order[t] != exclude[q]:
+                        size = _nearest_push(heap_d, heap_j, size, _haversine(points, q, tpoints, t), order[t])
+            else:
+                left, right = 2 * node + 1, 2 * node + 2
+                if _lower_bound(lower, upper, left, xyz, q) <= _lower_bound(lower, upper, right, xyz, q):
+                    left, right = right, left
+                stack[top] = left  # farther
+                stack[top + 1] = right  # nearer, searched first
+                top += 2
+        counts[q + 1] = size
+    indptr = np.cumsum(counts)
+    indices = np.empty(indptr[nqueries], dtype=np.int64)
+    distances = np.empty(indptr[nqueries], dtype=np.float64)
+    for q in nb.prange(nqueries):
+        size = counts[q + 1]
+        # nearest first, ties by index
+        by_index = np.argsort(nearest_j[q, :size])
+        by_distance = by_index[np.argsort(nearest_d[q, :size][by_index], kind="mergesort")]
+        for m in range(size):
+            indices[indptr[q] + m] = nearest_j[q, by_distance[m]]
+            distances[indptr[q] + m] = nearest_d[q, by_distance[m]]
+
+    return indptr, indices, distances
+
+
+@nb.njit(parallel=True, nogil=True, cache=True)
+def _sparse_row_normalize(indptr, data, max_rowsum):  # pragma: no cover
+    for i in nb.prange(len(indptr) - 1):
+        rowsum = 0.0
+        for p in range(indptr[i], indptr[i + 1]):
+            rowsum += data[p]
+        if rowsum > max_rowsum:
+            scale = max_rowsum / rowsum
+            for p in range(indptr[i], indptr[i + 1]):
+                data[p] *= scale
+
+    return
+
+
+@nb.njit(parallel=True, nogil=True, cache=True)
+def _sparse_matvec(indptr, indices, data, x, out):  # pragma: no cover
+    for i in nb.prange(len(indptr) - 1):
+        total = 0.0
+        for p in range(indptr[i], indptr[i + 1]):
+            total += data[p] * x[indices[p]]
+        out[i] = total
+
+    return
+
+
 # Sanity checks
 
 
+def _network_out(out, distances):
+    if out is None:
+        out = np.empty(distances.shape, dtype=np.float64)
+    _is_instance(out, np.ndarray, f"out must be a NumPy array ({type(out)=})")
+    _has_shape(out, distances.shape, f"out must have the same shape as distances ({out.shape=}, {distances.shape=})")
+    if out.dtype not in (np.float32, np.float64):
+        raise TypeError(f"out must be a float32 or float64 array ({out.dtype=})")
+
+    return out
+
+
+def _coordinates(latitudes, longitudes, shape):
+    _is_instance(latitudes, np.ndarray, f"latitudes must be a NumPy array ({type(latitudes)=})")
+    _is_instance(longitudes, np.ndarray, f"longitudes must be a NumPy array ({type(longitudes)=})")
+    _has_shape(latitudes, shape, f"latitudes must have shape {shape} ({latitudes.shape=})")
+    _has_shape(longitudes, shape, f"longitudes must have shape {shape} ({longitudes.shape=})")
+    _has_values((-90 <= latitudes) & (latitudes <= 90), "latitudes must be in the range [-90, 90]")
+    _has_values((-180 <= longitudes) & (longitudes <= 180), "longitudes must be in the range [-180, 180]")
+
+    return np.ascontiguousarray(latitudes, dtype=np.float64), np.ascontiguousarray(longitudes, dtype=np.float64)
+
+
+def _check_csr(indptr, indices, data):
+    _is_instance(indptr, np.ndarray, f"indptr must be a NumPy array ({type(indptr)=})")
+    _is_dtype(indptr, np.integer, f"indptr must be an integer array ({indptr.dtype=})")
+    _has_dimensions(indptr, 1, f"indptr must be a 1D array ({indptr.shape=})")
+    _has_values((indptr[0] == 0) & np.all(np.diff(indptr) >= 0), "indptr must start at 0 and be non-decreasing")
+    _is_instance(data, np.ndarray, f"data must be a NumPy array ({type(data)=})")
+    _is_dtype(data, np.number, f"data must be a numeric array ({data.dtype=})")
+    _has_shape(data, (indptr[-1],), f"data must have indptr[-1] elements ({data.shape=}, {indptr[-1]=})")
+    if indices is not None:
+        _is_instance(indices, np.ndarray, f"indices must be a NumPy array ({type(indices)=})")
+        _is_dtype(indices, np.integer, f"indices must be an integer array ({indices.dtype=})")
+        _has_shape(indices, data.shape, f"indices and data must have the same shape ({indices.shape=}, {data.shape=})")
+
+    return
+
+
 def _sanity_checks(pops, distances, **params):
     _is_instance(pops, np.ndarray, f"pops must be a NumPy array ({type(pops)=})")
     _has_dimensions(pops, 1, f"pops must be a 1D array ({pops.shape=})")
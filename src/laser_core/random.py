@@ -6,17 +6,78 @@ same random number stream is generated and used during simulation runs using
 the same seed value (assuming no changes to code which add or remove PRNG calls
 or change the number of random draws requested). This is important for
 reproducibility and debugging purposes.
+
+Numba's `np.random` functions use one generator per thread so draws made inside
+`prange` loops depend on the number of threads and on scheduling. For parallel
+kernels use the counter-based Philox4x32-10 generator instead: each draw is a
+pure function of a key, e.g., `key(stream)` = (seed, stream), and a counter,
+e.g., (agent index, tick, draw number), so the results are the same regardless
+of the number of threads or how iterations are assigned to threads.
+
+The bulk fill functions `uniform()`, `integers()`, and `normal()` use the same
+generator to fill preallocated (float32 or float64, or integer) arrays in
+parallel. Each call on a stream uses the next block of counters so the results
+are deterministic for a given seed and sequence of calls. The samplers
+`bernoulli()`, `binomial()`, `poisson()`, and `multinomial()` work the same way
+with per-agent (or per-node) probabilities, counts, and rates.
+
+For kernels making many cheap per-agent draws, a `RandomPool` holds per-thread
+buffers of pre-generated uniforms which kernels consume with `pool_uniform()`
+while a background thread refills the exhausted half of each buffer.
+
+Named streams, `stream(name)` for NumPy code and `key(name)` for Numba kernels,
+are derived from the seed and the name (with `np.random.SeedSequence`) rather
+than from the draws made so far, so adding or removing draws in one component
+does not change the random numbers seen by other components, e.g., for common
+random numbers in scenario comparisons.
+
+.. code-block:: python
+
+    key0, key1 = key(stream="transmission")
+
+    @nb.njit(parallel=True)
+    def transmission(key0, key1, tick, susceptibility, force, itimer):
+        for i in nb.prange(len(susceptibility)):
+            if philox_uniform(key0, key1, i, tick, 0) < force * susceptibility[i]:
+                itimer[i] = 7
 """
 
+import hashlib
+import math
+import threading
 from datetime import datetime
+from typing import Union
 
 import numba as nb
 import numpy as np
+from numba.core import types
+from numba.extending import intrinsic
 
-__all__ = ["get_seed", "prng", "seed"]
+__all__ = [
+    "RandomPool",
+    "bernoulli",
+    "binomial",
+    "get_seed",
+    "get_state",
+    "integers",
+    "key",
+    "multinomial",
+    "normal",
+    "philox4x32",
+    "philox_uniform",
+    "poisson",
+    "pool_uniform",
+    "prng",
+    "seed",
+    "set_state",
+    "stream",
+    "uniform",
+]
 
 _seed: np.uint32 = None
 _prng: np.random.Generator = None
+_streams: dict = {}  # name -> np.random.Generator, see stream()
+_fills: dict = {}  # stream -> number of bulk fills so far, see uniform()/integers()/normal()
 
 
 @nb.jit((nb.uint32,), nopython=True, nogil=True, parallel=True)
@@ -64,6 +125,8 @@ def seed(seed) -> np.random.Generator:
     np.random.seed(_seed)
     _prng = np.random.default_rng(_seed)
     _nbseed(np.uint32(_seed))
+    _streams.clear()
+    _fills.clear()
 
     return _prng
 
@@ -83,3 +146,1054 @@ def get_seed() -> np.uint32:
 def prng() -> np.random.Generator:
     """Return the global (to LASER) pseudo-random number generator."""
     return _prng if _prng is not None else seed(np.uint32(datetime.now(tz=None).microsecond))  # noqa: DTZ005
+
+
+def get_state() -> dict:
+    """
+    Return the complete state of the laser-core random number generators, e.g., to save with a checkpoint.
+
+    The state includes the seed, the `prng()` bit generator state, the NumPy legacy global state, the state of
+    every named `stream()`, and the internal state of Numba's `np.random` generator for the calling thread and
+    each Numba worker thread. Restoring it with `set_state()` continues all the random streams bit-for-bit.
+
+    Returns:
+
+        dict: The random number generator state (NumPy arrays and dictionaries which can be pickled).
+
+    Raises:
+
+        RuntimeError: If the state of a Numba worker thread could not be captured (the Numba scheduler did not run
+                      the capture on every thread) or this version of Numba's random state layout is not supported.
+    """
+
+    _check_nbstate()
+    _ = prng()  # make sure the generators have been initialized
+    main = np.zeros(_NB_STATE_SIZE, dtype=np.uint8)
+    _nbgetmain(main)
+    threads = np.zeros((nb.get_num_threads(), _NB_STATE_SIZE), dtype=np.uint8)
+    captured = np.zeros(len(threads), dtype=np.bool_)
+    _all_threads(_nbgetthreads, threads, captured)
+    if not np.all(captured):
+        raise RuntimeError(f"Could not capture the Numba random state of thread(s) {np.nonzero(~captured)[0].tolist()}.")
+
+    return {
+        "seed": _seed,
+        "prng": _prng.bit_generator.state,
+        "numpy": np.random.get_state(),
+        "streams": {name: generator.bit_generator.state for name, generator in _streams.items()},
+        "fills": dict(_fills),
+        "numba": {"main": main, "threads": threads, "captured": captured},
+    }
+
+
+def set_state(state: dict) -> None:
+    """
+    Restore the state of the laser-core random number generators saved with `get_state()`.
+
+    Parameters:
+
+        state (dict): The random number generator state returned by `get_state()`.
+
+    Raises:
+
+        ValueError: If the number of Numba threads differs from the number when the state was saved.
+        RuntimeError: If the state of a Numba worker thread was not captured or could not be restored (the Numba
+                      scheduler did not run the restore on every thread) or this version of Numba's random state layout
+                      is not supported.
+    """
+
+    _check_nbstate()
+    threads = state["numba"]["threads"]
+    if len(threads) != nb.get_num_threads():
+        raise ValueError(f"Random state has {len(threads)} Numba thread states but Numba is using {nb.get_num_threads()} threads.")
+    captured = state["numba"]["captured"]
+    if not np.all(captured):
+        raise RuntimeError(f"Random state is missing the Numba state of thread(s) {np.nonzero(~captured)[0].tolist()}.")
+
+    global _seed
+    global _prng
+    _seed = state["seed"]
+    _prng = np.random.default_rng()
+    _prng.bit_generator.state = state["prng"]
+    np.random.set_state(state["numpy"])
+    _streams.clear()
+    for name, generator_state in state["streams"].items():
+        _streams[name] = np.random.default_rng()
+        _streams[name].bit_generator.state = generator_state
+    _fills.clear()
+    _fills.update(state["fills"])
+    _nbsetmain(state["numba"]["main"])
+    restored = np.zeros(len(threads), dtype=np.bool_)
+    _all_threads(_nbsetthreads, threads, restored)
+    if not np.all(restored):
+        raise RuntimeError(f"Could not restore the Numba random state of thread(s) {np.nonzero(~restored)[0].tolist()}.")
+
+    return
+
+
+# Size of Numba's per-thread random state, rnd_state_t in numba/_random.c (and numba.cpython.randomimpl):
+# int index, unsigned int mt[624], int has_gauss, double gauss, int is_initialized (with padding).
+_NB_STATE_SIZE = 2520
+_NB_STATE_LAYOUT = ["i32", "[624 x i32]", "i32", "double", "i32"]
+
+
+
+def _check_nbstate() -> None:
+    # get_state()/set_state() copy the state as raw bytes, fail rather than corrupt memory if Numba changes it.
+    # Checked when used (not on import) so the rest of this module works with any version of Numba.
+    try:
+        from numba.core.registry import cpu_target
+        from numba.cpython.randomimpl import rnd_state_t
+
+        layout = [str(element) for element in rnd_state_t.elements]
+        size = rnd_state_t.get_abi_size(cpu_target.target_context.target_data)
+    except (ImportError, AttributeError) as error:
+        raise RuntimeError(f"Saving the Numba random state is not supported with Numba {nb.__version__} ({error}).") from error
+    if layout != _NB_STATE_LAYOUT or size != _NB_STATE_SIZE:
+        raise RuntimeError(
+            f"Saving the Numba random state is not supported with Numba {nb.__version__}: "
+            f"unexpected np.random state layout {layout}, {size} bytes (expected {_NB_STATE_LAYOUT}, {_NB_STATE_SIZE} bytes)."
+        )
+
+    return
+
+
+@intrinsic
+def _nbstate(typingctx):
+    # pointer to the calling thread's Numba np.random state
+    def codegen(context, builder, signature, args):
+        from numba.cpython.randomimpl import get_state_ptr
+
+        return builder.bitcast(get_state_ptr(context, builder, "np"), context.get_value_type(signature.return_type))
+
+    return types.CPointer(types.uint8)(), codegen
+
+
+# Note: explicit loops below, slice assignment in a parallel function may itself be run on other threads.
+
+# Numba's scheduler doesn't promise every worker thread an iteration of a prange, so the per-thread functions run many
+# iterations, each thread copies its state once (done[thread]), and the caller checks which threads were reached.
+_ITERATIONS_PER_THREAD = 64
+_ATTEMPTS = 8
+
+
+def _all_threads(function, states, done):
+    for _ in range(_ATTEMPTS):
+        function(states, done, len(states) * _ITERATIONS_PER_THREAD)
+        if np.all(done):
+            break
+
+    return
+
+
+@nb.njit(nogil=True)
+def _nbgetmain(state):  # pragma: no cover
+    current = nb.carray(_nbstate(), _NB_STATE_SIZE)
+    for i in range(_NB_STATE_SIZE):
+        state[i] = current[i]
+
+    return
+
+
+@nb.njit(nogil=True)
+def _nbsetmain(state):  # pragma: no cover
+    current = nb.carray(_nbstate(), _NB_STATE_SIZE)
+    for i in range(_NB_STATE_SIZE):
+        current[i] = state[i]
+
+    return
+
+
+@nb.njit(nogil=True, parallel=True)
+def _nbgetthreads(states, captured, iterations):  # pragma: no cover
+    for _ in nb.prange(iterations):
+        thread = nb.get_thread_id()
+        if not captured[thread]:
+            current = nb.carray(_nbstate(), _NB_STATE_SIZE)
+            for i in range(_NB_STATE_SIZE):
+                states[thread, i] = current[i]
+            captured[thread] = True
+
+    return
+
+
+@nb.njit(nogil=True, parallel=True)
+def _nbsetthreads(states, restored, iterations):  # pragma: no cover
+    for _ in nb.prange(iterations):
+        thread = nb.get_thread_id()
+        if not restored[thread]:
+            current = nb.carray(_nbstate(), _NB_STATE_SIZE)
+            for i in range(_NB_STATE_SIZE):
+                current[i] = states[thread, i]
+            restored[thread] = True
+
+    return
+
+
+def stream(name: str) -> np.random.Generator:
+    """
+    Return the pseudo-random number generator for the named stream, e.g., one per model component.
+
+    The generator is spawned from the seed and the name with `np.random.SeedSequence` so its draws do not depend
+    on draws made from `prng()` or from other streams. Repeated calls with the same name return the same generator
+    until the next call to `seed()`.
+
+    Parameters:
+
+        name (str): The name of the stream.
+
+    Returns:
+
+        numpy.random.Generator: The generator for the named stream.
+    """
+
+    if name not in _streams:
+        _streams[name] = np.random.default_rng(_seed_sequence(name, 0))
+
+    return _streams[name]
+
+
+def key(stream: Union[int, str] = 0) -> tuple[np.uint32, np.uint32]:
+    """
+    Return the Philox key for the given stream for use with `philox_uniform()` in Numba kernels.
+
+    Use a different stream, e.g., one per model component, for each independent set of draws. For a stream number
+    the key is (seed, stream). For a stream name the key is spawned from the seed and the name with
+    `np.random.SeedSequence`, i.e., it is the Numba counterpart of `stream(name)`.
+
+    Parameters:
+
+        stream (int | str, optional): The stream number, 0 <= stream < 2**32, or name. Default is 0.
+
+    Returns:
+
+        tuple: (key0, key1) as np.uint32 values.
+    """
+
+    _ = prng()  # make sure the seed has been initialized
+    if isinstance(stream, str):
+        key0, key1 = _seed_sequence(stream, 1).generate_state(2, np.uint32)
+        return key0, key1
+
+    return np.uint32(_seed), np.uint32(stream)
+
+
+def _seed_sequence(name: str, purpose: int) -> np.random.SeedSequence:
+    # purpose distinguishes the NumPy generator (0) and the Numba key (1) for the same name
+    _ = prng()
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()  # stable across processes, unlike hash()
+
+    return np.random.SeedSequence(int(_seed), spawn_key=(int.from_bytes(digest, "little"), purpose))
+
+
+# Philox4x32-10 constants (Salmon et al., "Parallel Random Numbers: As Easy as 1, 2, 3", SC11)
+_PHILOX_M0 = np.uint64(0xD2511F53)
+_PHILOX_M1 = np.uint64(0xCD9E8D57)
+_PHILOX_W0 = np.uint64(0x9E3779B9)
+_PHILOX_W1 = np.uint64(0xBB67AE85)
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+
+
+@nb.njit(nogil=True, cache=True)
+def philox4x32(counter0, counter1, counter2, counter3, key0, key1):  # pragma: no cover
+    """
+    The Philox4x32-10 counter-based bijection. For use in Numba kernels.
+
+    Parameters:
+
+        counter0, counter1, counter2, counter3 (uint32): The 128-bit counter.
+        key0, key1 (uint32): The 64-bit key.
+
+    Returns:
+
+        tuple: Four uint32 random values.
+    """
+
+    c0 = np.uint64(counter0) & _MASK32
+    c1 = np.uint64(counter1) & _MASK32
+    c2 = np.uint64(counter2) & _MASK32
+    c3 = np.uint64(counter3) & _MASK32
+    k0 = np.uint64(key0) & _MASK32
+    k1 = np.uint64(key1) & _MASK32
+    for _ in range(10):
+        p0 = _PHILOX_M0 * c0
+        p1 = _PHILOX_M1 * c2
+        c0, c1, c2, c3 = (p1 >> _SHIFT32) ^ c1 ^ k0, p1 & _MASK32, (p0 >> _SHIFT32) ^ c3 ^ k1, p0 & _MASK32
+        k0 = (k0 + _PHILOX_W0) & _MASK32
+        k1 = (k1 + _PHILOX_W1) & _MASK32
+
+    return np.uint32(c0), np.uint32(c1), np.uint32(c2), np.uint32(c3)
+
+
+@nb.njit(nogil=True, cache=True)
+def philox_uniform(key0, key1, index, tick, draw):  # pragma: no cover
+    """
+    Return a uniform random float64 in [0, 1) for the given key and (index, tick, draw) counter. For use in Numba kernels.
+
+    The value depends only on the arguments, not on the calling thread or on previous calls, so parallel kernels give
+    identical results for any number of threads.
+
+    Parameters:
+
+        key0, key1 (uint32): The key, e.g., from `key()`.
+        index (int): The agent (or node) index, 0 <= index < 2**64.
+        tick (int): The tick, 0 <= tick < 2**32.
+        draw (int): The draw number for this agent and tick, 0 <= draw < 2**32.
+
+    Returns:
+
+        float64: A uniform random value in [0, 1).
+    """
+
+    index = np.uint64(index)
+    r0, r1, _, _ = philox4x32(index & _MASK32, index >> _SHIFT32, tick, draw, key0, key1)
+
+    return _uniform53(r0, r1)
+
+
+@nb.njit(nogil=True, cache=True)
+def _uniform53(r0, r1):  # pragma: no cover
+    # 53 random bits (27 + 26) to a float64 in [0, 1), as NumPy does
+    return ((np.uint64(r0) >> np.uint64(5)) * 67108864.0 + (np.uint64(r1) >> np.uint64(6))) / 9007199254740992.0
+
+
+# Bulk fills use counter (block lo, block hi, fill number, _FILL) and the samplers use counter
+# (element lo, element hi, fill number, _DRAW | draw) so neither overlaps draws made with philox_uniform()
+# as long as kernels use draw numbers < 2**31. Each Philox block gives 4 x 32 random bits.
+_FILL = np.uint32(0xFFFFFFFF)
+_DRAW = np.uint32(0x80000000)
+_POOL = np.uint32(0xC0000000)  # RandomPool uses counter (block, generation, thread, _POOL | half)
+
+
+def _next_fill(stream) -> tuple[np.uint32, np.uint32, np.uint32]:
+    key0, key1 = key(stream)
+    fill = _fills.get(stream, 0)
+    _fills[stream] = fill + 1
+
+    return key0, key1, np.uint32(fill)
+
+
+def _flat(out: np.ndarray, kind: str, message: str) -> np.ndarray:
+    if not isinstance(out, np.ndarray) or out.dtype.kind not in kind:
+        raise TypeError(message.format(getattr(out, "dtype", type(out))))
+    if not out.flags.c_contiguous:
+        raise ValueError("Output array must be contiguous.")
+
+    return out.reshape(-1)
+
+
+def uniform(out: np.ndarray, low: float = 0.0, high: float = 1.0, stream: Union[int, str] = 0) -> np.ndarray:
+    """
+    Fill `out` with uniform random values in [low, high) in parallel.
+
+    Parameters:
+
+        out (np.ndarray): The (contiguous) float32 or float64 array to fill.
+        low (float, optional): The lower bound. Default is 0.0.
+        high (float, optional): The upper bound. Default is 1.0.
+        stream (int | str, optional): The stream, see `key()`. Default is 0.
+
+    Returns:
+
+        np.ndarray: out
+
+    Raises:
+
+        TypeError: If out is not a float32 or float64 array.
+    """
+
+    flat = _flat(out, "f", "Output array must be float32 or float64 (got {})")
+    if flat.dtype == np.float32:
+        _fill_uniform32(flat, np.float32(low), np.float32(high), *_next_fill(stream))
+    else:
+        _fill_uniform64(flat, np.float64(low), np.float64(high), *_next_fill(stream))
+
+    return out
+
+
+def integers(out: np.ndarray, low: int, high: int, stream: Union[int, str] = 0) -> np.ndarray:
+    """
+    Fill `out` with uniform random integers in [low, high) in parallel.
+
+    Parameters:
+
+        out (np.ndarray): The (contiguous) integer array to fill.
+        low (int): The lower bound (inclusive).
+        high (int): The upper bound (exclusive).
+        stream (int | str, optional): The stream, see `key()`. Default is 0.
+
+    Returns:
+
+        np.ndarray: out
+
+    Raises:
+
+        TypeError: If out is not an integer array.
+        ValueError: If high <= low or [low, high) does not fit in the dtype of out.
+    """
+
+    flat = _flat(out, "iu", "Output array must be an integer array (got {})")
+    if high <= low:
+        raise ValueError(f"High ({high}) must be greater than low ({low}).")
+    info = np.iinfo(flat.dtype)
+    if low < info.min or high - 1 > info.max:
+        raise ValueError(f"Range [{low}, {high}) does not fit in the output dtype {flat.dtype} ([{info.min}, {info.max}]).")
+    _fill_integers(flat, np.int64(low), np.uint64(high - low), *_next_fill(stream))
+
+    return out
+
+
+def normal(out: np.ndarray, loc: float = 0.0, scale: float = 1.0, stream: Union[int, str] = 0) -> np.ndarray:
+    """
+    Fill `out` with normally distributed random values in parallel (Box-Muller transform).
+
+    Parameters:
+
+        out (np.ndarray): The (contiguous) float32 or float64 array to fill.
+        loc (float, optional): The mean. Default is 0.0.
+        scale (float, optional): The standard deviation. Default is 1.0.
+        stream (int | str, optional): The stream, see `key()`. Default is 0.
+
+    Returns:
+
+        np.ndarray: out
+
+    Raises:
+
+        TypeError: If out is not a float32 or float64 array.
+    """
+
+    flat = _flat(out, "f", "Output array must be float32 or float64 (got {})")
+    if flat.dtype == np.float32:
+        _fill_normal32(flat, np.float32(loc), np.float32(scale), *_next_fill(stream))
+    else:
+        _fill_normal64(flat, np.float64(loc), np.float64(scale), *_next_fill(stream))
+
+    return out
+
+
+@nb.njit(nogil=True, cache=True)
+def _uniform24(r):  # pragma: no cover
+    # 24 random bits to a float32 in [0, 1)
+    return np.float32(r >> np.uint32(8)) * np.float32(5.9604645e-08)
+
+
+@nb.njit(nogil=True, cache=True, parallel=True)
+def _fill_uniform64(out, low, high, key0, key1, fill):  # pragma: no cover
+    scale = high - low
+    for block in nb.prange((len(out) + 1) // 2):
+        b = np.uint64(block)
+        r0, r1, r2, r3 = philox4x32(b & _MASK32, b >> _SHIFT32, fill, _FILL, key0, key1)
+        i = 2 * block
+        out[i] = low + scale * _uniform53(r0, r1)
+        if i + 1 < len(out):
+            out[i + 1] = low + scale * _uniform53(r2, r3)
+
+    return
+
+
+@nb.njit(nogil=True, cache=True, parallel=True)
+def _fill_uniform32(out, low, high, key0, key1, fill):  # pragma: no cover
+    scale = high - low
+    for block in nb.prange((len(out) + 3) // 4):
+        b = np.uint64(block)
+        r = philox4x32(b & _MASK32, b >> _SHIFT32, fill, _FILL, key0, key1)
+        for j in range(min(4, len(out) - 4 * block)):
+            out[4 * block + j] = low + scale * _uniform24(r[j])
+
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _mulhi64(a, b):  # pragma: no cover
+    # high 64 bits of the 128-bit product of two uint64s
+    a_lo, a_hi = a & _MASK32, a >> _SHIFT32
+    b_lo, b_hi = b & _MASK32, b >> _SHIFT32
+    lo_lo = a_lo * b_lo
+    hi_lo = a_hi * b_lo
+    lo_hi = a_lo * b_hi
+    cross = (lo_lo >> _SHIFT32) + (hi_lo & _MASK32) + lo_hi
+
+    return a_hi * b_hi + (hi_lo >> _SHIFT32) + (cross >> _SHIFT32)
+
+
+@nb.njit(nogil=True, cache=True, parallel=True)
+def _fill_integers(out, low, span, key0, key1, fill):  # pragma: no cover
+    # low + floor(bits64 * span / 2**64), bias < span / 2**64
+    for block in nb.prange((len(out) + 1) // 2):
+        b = np.uint64(block)
+        r0, r1, r2, r3 = philox4x32(b & _MASK32, b >> _SHIFT32, fill, _FILL, key0, key1)
+        i = 2 * block
+        out[i] = low + np.int64(_mulhi64((np.uint64(r0) << _SHIFT32) | np.uint64(r1), span))
+        if i + 1 < len(out):
+            out[i + 1] = low + np.int64(_mulhi64((np.uint64(r2) << _SHIFT32) | np.uint64(r3), span))
+
+    return
+
+
+@nb.njit(nogil=True, cache=True, parallel=True)
+def _fill_normal64(out, loc, scale, key0, key1, fill):  # pragma: no cover
+    for block in nb.prange((len(out) + 1) // 2):
+        b = np.uint64(block)
+        r0, r1, r2, r3 = philox4x32(b & _MASK32, b >> _SHIFT32, fill, _FILL, key0, key1)
+        radius = scale * np.sqrt(-2.0 * np.log(1.0 - _uniform53(r0, r1)))
+        theta = 2.0 * np.pi * _uniform53(r2, r3)
+        i = 2 * block
+        out[i] = loc + radius * np.cos(theta)
+        if i + 1 < len(out):
+            out[i + 1] = loc + radius * np.sin(theta)
+
+    return
+
+
+@nb.njit(nogil=True, cache=True, parallel=True)
+def _fill_normal32(out, loc, scale, key0, key1, fill):  # pragma: no cover
+    for block in nb.prange((len(out) + 3) // 4):
+        b = np.uint64(block)
+        r = philox4x32(b & _MASK32, b >> _SHIFT32, fill, _FILL, key0, key1)
+        for pair in range(2):
+            i = 4 * block + 2 * pair
+            if i < len(out):
+                radius = scale * np.sqrt(np.float32(-2.0) * np.log(np.float32(1.0) - _uniform24(r[2 * pair])))
+                theta = np.float32(2.0 * np.pi) * _uniform24(r[2 * pair + 1])
+                out[i] = loc + radius * np.cos(theta)
+                if i + 1 < len(out):
+                    out[i + 1] = loc + radius * np.sin(theta)
+
+    return
+
+
+def bernoulli(p, out: np.ndarray = None, stream: Union[int, str] = 0) -> np.ndarray:
+    """
+    Flip a coin for each agent with probability p (or p[i]) of True, in parallel.
+
+    Parameters:
+
+        p (float | np.ndarray): The probability of True, scalar or one per agent.
+        out (np.ndarray, optional): The boolean (or integer) array to fill. Required if p is a scalar.
+                                    Default is None, i.e., allocate an array with the shape of p.
+        stream (int | str, optional): The stream, see `key()`. Default is 0.
+
+    Returns:
+
+        np.ndarray: out
+
+    Raises:
+
+        ValueError: If p is a scalar and out is not given.
+    """
+
+    p = np.asarray(p)
+    if out is None:
+        if p.ndim == 0:
+            raise ValueError("Output array is required if p is a scalar.")
+        out = np.empty(p.shape, dtype=np.bool_)
+    flat = _flat(out, "biu", "Output array must be a boolean or integer array (got {})")
+    _sample_bernoulli(flat, _per_element(p, flat), *_next_fill(stream))
+
+    return out
+
+
+def binomial(n, p, out: np.ndarray = None, stream: Union[int, str] = 0) -> np.ndarray:
+    """
+    Draw Binomial(n[i], p[i]) for each node (or agent), in parallel.
+
+    Small means use inversion and large means use Hormann's BTRD transformed rejection algorithm.
+
+    Parameters:
+
+        n (int | np.ndarray): The number of trials, scalar or one per node.
+        p (float | np.ndarray): The probability of success, scalar or one per node.
+        out (np.ndarray, optional): The integer array to fill. Default is None, i.e., allocate an int64 array
+                                    with the shape of n (or p).
+        stream (int | str, optional): The stream, see `key()`. Default is 0.
+
+    Returns:
+
+        np.ndarray: out
+    """
+
+    n, p = np.asarray(n), np.asarray(p)
+    if out is None:
+        out = np.empty(n.shape if n.ndim > 0 else p.shape, dtype=np.int64)
+    flat = _flat(out, "iu", "Output array must be an integer array (got {})")
+    _sample_binomial(flat, _per_element(n, flat), _per_element(p, flat), *_next_fill(stream))
+
+    return out
+
+
+def poisson(lam, out: np.ndarray = None, stream: Union[int, str] = 0) -> np.ndarray:
+    """
+    Draw Poisson(lam[i]) for each node (or agent), in parallel.
+
+    Small rates use the multiplication method and large rates use Hormann's PTRS transformed rejection algorithm.
+
+    Parameters:
+
+        lam (float | np.ndarray): The expected number of events, scalar or one per node.
+        out (np.ndarray, optional): The integer array to fill. Required if lam is a scalar.
+                                    Default is None, i.e., allocate an int64 array with the shape of lam.
+        stream (int | str, optional): The stream, see `key()`. Default is 0.
+
+    Returns:
+
+        np.ndarray: out
+
+    Raises:
+
+        ValueError: If lam is a scalar and out is not given.
+    """
+
+    lam = np.asarray(lam)
+    if out is None:
+        if lam.ndim == 0:
+            raise ValueError("Output array is required if lam is a scalar.")
+        out = np.empty(lam.shape, dtype=np.int64)
+    flat = _flat(out, "iu", "Output array must be an integer array (got {})")
+    _sample_poisson(flat, _per_element(lam, flat), *_next_fill(stream))
+
+    return out
+
+
+def multinomial(n, pvals: np.ndarray, out: np.ndarray = None, stream: Union[int, str] = 0) -> np.ndarray:
+    """
+    Draw Multinomial(n[i], pvals[i]) for each row, e.g., distributing each node's emigrants across destinations, in parallel.
+
+    Each row is drawn as a sequence of conditional binomials.
+
+    Parameters:
+
+        n (int | np.ndarray): The number of trials, scalar or one per row.
+        pvals (np.ndarray): The (rows, k) category probabilities (each row summing to 1) or a single row of k probabilities
+                            shared by all rows.
+        out (np.ndarray, optional): The (rows, k) integer array to fill. Default is None, i.e., allocate an int64 array.
+        stream (int | str, optional): The stream, see `key()`. Default is 0.
+
+    Returns:
+
+        np.ndarray: out
+
+    Raises:
+
+        ValueError: If pvals does not have 1 or rows rows of non-negative probabilities summing to 1 or out does not
+                    have shape (rows, k).
+    """
+
+    n, pvals = np.asarray(n), np.asarray(pvals, dtype=np.float64)
+    if pvals.ndim not in (1, 2):
+        raise ValueError(f"Probabilities must be a 1D or 2D array (got shape {pvals.shape}).")
+    rows = len(n) if n.ndim > 0 else (len(pvals) if pvals.ndim > 1 else 1)
+    pvals = pvals.reshape(-1, pvals.shape[-1])
+    if len(pvals) not in (1, rows):
+        raise ValueError(f"Probabilities must have 1 or {rows} rows (got {len(pvals)}).")
+    if np.any(pvals < 0) or np.any(np.abs(pvals.sum(axis=1) - 1.0) > 1e-6):
+        raise ValueError("Probabilities must be non-negative and each row must sum to 1.")
+    if out is None:
+        out = np.empty((rows, pvals.shape[-1]), dtype=np.int64)
+    if out.ndim != 2 or out.shape != (rows, pvals.shape[-1]):
+        raise ValueError(f"Output array must have shape {(rows, pvals.shape[-1])} (got {out.shape}).")
+    _flat(out, "iu", "Output array must be an integer array (got {})")
+    _sample_multinomial(out, _per_element(n, out[:, 0]), pvals, len(pvals) > 1, *_next_fill(stream))
+
+    return out
+
+
+def _per_element(values: np.ndarray, out: np.ndarray) -> np.ndarray:
+    # kernels index values[i] if len(values) > 1 else values[0]
+    values = np.ascontiguousarray(values).reshape(-1)
+    if len(values) not in (1, len(out)):
+        raise ValueError(f"Parameter array must have 1 or {len(out)} elements (got {len(values)}).")
+
+    return values
+
+
+@nb.njit(nogil=True, cache=True)
+def _draw(key0, key1, index, fill, draw):  # pragma: no cover
+    # uniform float64 in [0, 1) for the given element, fill number, and draw number
+    index = np.uint64(index)
+    r0, r1, _, _ = philox4x32(index & _MASK32, index >> _SHIFT32, fill, _DRAW | np.uint32(draw), key0, key1)
+
+    return _uniform53(r0, r1)
+
+
+@nb.njit(nogil=True, cache=True, parallel=True)
+def _sample_bernoulli(out, p, key0, key1, fill):  # pragma: no cover
+    for i in nb.prange(len(out)):
+        out[i] = _draw(key0, key1, i, fill, 0) < (p[i] if len(p) > 1 else p[0])
+
+    return
+
+
+# Stirling series correction terms log(k!) - log(sqrt(2 pi k) (k / e)^k) for k = 0..9
+_FC = np.array(
+    [
+        0.08106146679532726,
+        0.04134069595540929,
+        0.02767792568499834,
+        0.02079067210376509,
+        0.01664469118982119,
+        0.01387612882307075,
+        0.01189670994589177,
+        0.01041126526197209,
+        0.009255462182712733,
+        0.008330563433362871,
+    ]
+)
+
+
+@nb.njit(nogil=True, cache=True)
+def _fc(k):  # pragma: no cover
+    if k < 10:
+        return _FC[k]
+    k1 = k + 1.0
+    k1sq = k1 * k1
+
+    return (1.0 / 12 - (1.0 / 360 - 1.0 / 1260 / k1sq) / k1sq) / k1
+
+
+@nb.njit(nogil=True, cache=True)
+def _binomial(n, p, key0, key1, index, fill, draw):  # pragma: no cover
+    # Returns (sample, next draw number).
+    if n <= 0 or p <= 0.0:
+        return 0, draw
+    if p >= 1.0:
+        return n, draw
+    flip = p > 0.5
+    if flip:
+        p = 1.0 - p
+    q = 1.0 - p
+    k = 0
+
+    if n * p < 30.0:
+        # inversion (as in NumPy)
+        qn = np.exp(n * np.log(q))
+        bound = min(n, n * p + 10.0 * np.sqrt(n * p * q + 1))
+        px = qn
+        u = _draw(key0, key1, index, fill, draw)
+        draw += 1
+        while u > px:
+            k += 1
+            if k > bound:
+                k = 0
+                px = qn
+                u = _draw(key0, key1, index, fill, draw)
+                draw += 1
+            else:
+                u -= px
+                px = ((n - k + 1) * p * px) / (k * q)
+    else:
+        # BTRD (Hormann, "The generation of binomial random variates", 1993)
+        m = math.floor((n + 1) * p)
+        r = p / q
+        nr = (n + 1) * r
+        npq = n * p * q
+        sqrtnpq = np.sqrt(npq)
+        b = 1.15 + 2.53 * sqrtnpq
+        a = -0.0873 + 0.0248 * b + 0.01 * p
+        c = n * p + 0.5
+        alpha = (2.83 + 5.1 / b) * sqrtnpq
+        vr = 0.92 - 4.2 / b
+        urvr = 0.86 * vr
+        while True:
+            v = _draw(key0, key1, index, fill, draw)
+            draw += 1
+            if v <= urvr:
+                u = v / vr - 0.43
+                k = math.floor((2 * a / (0.5 - abs(u)) + b) * u + c)
+                break
+            if v >= vr:
+                u = _draw(key0, key1, index, fill, draw) - 0.5
+                draw += 1
+            else:
+                u = v / vr - 0.93
+                u = math.copysign(0.5, u) - u
+                v = _draw(key0, key1, index, fill, draw) * vr
+                draw += 1
+            us = 0.5 - abs(u)
+            k = math.floor((2 * a / us + b) * u + c)
+            if k < 0 or k > n:
+                continue
+            v = v * alpha / (a / (us * us) + b)
+            km = abs(k - m)
+            if km <= 15:
+                # recursive evaluation of f(k) = P(k) / P(m)
+                f = 1.0
+                if m < k:
+                    for i in range(m + 1, k + 1):
+                        f *= nr / i - r
+                elif m > k:
+                    for i in range(k + 1, m + 1):
+                        v *= nr / i - r
+                if v <= f:
+                    break
+                continue
+            # squeeze using upper and lower bounds on log(f(k))
+            v = np.log(v)
+            rho = (km / npq) * (((km / 3.0 + 0.625) * km + 1.0 / 6) / npq + 0.5)
+            t = -km * km / (2 * npq)
+            if v < t - rho:
+                break
+            if v > t + rho:
+                continue
+            nm = n - m + 1
+            h = (m + 0.5) * np.log((m + 1) / (r * nm)) + _fc(m) + _fc(n - m)
+            nk = n - k + 1
+            if v <= h + (n + 1) * np.log(nm / nk) + (k + 0.5) * np.log(nk * r / (k + 1)) - _fc(k) - _fc(n - k):
+                break
+
+    return (n - k if flip else k), draw
+
+
+@nb.njit(nogil=True, cache=True, parallel=True)
+def _sample_binomial(out, n, p, key0, key1, fill):  # pragma: no cover
+    for i in nb.prange(len(out)):
+        ni = n[i] if len(n) > 1 else n[0]
+        pi = p[i] if len(p) > 1 else p[0]
+        out[i], _ = _binomial(np.int64(ni), np.float64(pi), key0, key1, i, fill, 0)
+
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _poisson(lam, key0, key1, index, fill):  # pragma: no cover
+    draw = 0
+    if lam <= 0.0:
+        return 0
+    if lam < 10.0:
+        # multiplication method
+        limit = np.exp(-lam)
+        k = 0
+        product = _draw(key0, key1, index, fill, draw)
+        draw += 1
+        while product > limit:
+            k += 1
+            product *= _draw(key0, key1, index, fill, draw)
+            draw += 1
+        return k
+    # PTRS (Hormann, "The transformed rejection method for generating Poisson random variables", 1993)
+    slam = np.sqrt(lam)
+    loglam = np.log(lam)
+    b = 0.931 + 2.53 * slam
+    a = -0.059 + 0.02483 * b
+    invalpha = 1.1239 + 1.1328 / (b - 3.4)
+    vr = 0.9277 - 3.6224 / (b - 2)
+    while True:
+        u = _draw(key0, key1, index, fill, draw) - 0.5
+        v = _draw(key0, key1, index, fill, draw + 1)
+        draw += 2
+        us = 0.5 - abs(u)
+        k = math.floor((2 * a / us + b) * u + lam + 0.43)
+        if us >= 0.07 and v <= vr:
+            return k
+        if k < 0 or (us < 0.013 and v > us):
+            continue
+        if np.log(v) + np.log(invalpha) - np.log(a / (us * us) + b) <= -lam + k * loglam - math.lgamma(k + 1):
+            return k
+
+
+@nb.njit(nogil=True, cache=True, parallel=True)
+def _sample_poisson(out, lam, key0, key1, fill):  # pragma: no cover
+    for i in nb.prange(len(out)):
+        out[i] = _poisson(np.float64(lam[i] if len(lam) > 1 else lam[0]), key0, key1, i, fill)
+
+    return
+
+
+@nb.njit(nogil=True, cache=True, parallel=True)
+def _sample_multinomial(out, n, pvals, per_row, key0, key1, fill):  # pragma: no cover
+    ncategories = out.shape[1]
+    for i in nb.prange(out.shape[0]):
+        row = pvals[i] if per_row else pvals[0]
+        remaining = np.int64(n[i] if len(n) > 1 else n[0])
+        remainder = 1.0
+        draw = 0
+        for j in range(ncategories - 1):
+            if remaining > 0 and remainder > 0.0:
+                x, draw = _binomial(remaining, min(max(row[j] / remainder, 0.0), 1.0), key0, key1, i, fill, draw)
+            else:
+                x = 0
+            out[i, j] = x
+            remaining -= x
+            remainder -= row[j]
+        out[i, ncategories - 1] = remaining
+
+    return
+
+
+# RandomPool.state columns (one row of 8 int64s, i.e., one cache line, per thread)
+_CURSOR, _CONSUMED, _FILLED, _KEY, _LOG2 = 0, 1, 3, 5, 7
+
+
+class RandomPool:
+    """
+    Per-thread buffers of pre-generated uniform random numbers for Numba kernels, refilled in the background.
+
+    Each thread's buffer is split in two halves. Kernels take values from the calling thread's buffer with
+    `pool_uniform(*pool.buffers)`. When a half has been used, the background thread (see `start()`) or `refill()`
+    generates the next values for it while the kernel continues with the other half. If a kernel reaches a half which
+    has not been refilled yet, it computes the values itself so it never waits.
+
+    The n-th value taken by thread t is always the same (a Philox draw keyed on the stream and counted by t and n)
+    regardless of when, or whether, the background thread refilled the buffer. Which agent gets which value still
+    depends on how prange iterations are assigned to threads, use `philox_uniform()` where that matters.
+    """
+
+    def __init__(self, size: int = 1 << 16, stream: Union[int, str] = 0, nthreads: Union[int, None] = None):
+        """
+        Initialize a RandomPool object.
+
+        Parameters:
+
+            size (int, optional): The number of values in each thread's buffer, a power of 2 >= 2. Default is 65,536.
+            stream (int | str, optional): The stream, see `key()`. Default is 0.
+            nthreads (int, optional): The number of per-thread buffers. Default is None, which uses NUMBA_NUM_THREADS.
+
+        Raises:
+
+            ValueError: If size is not a power of 2 >= 2 or nthreads is not a positive integer.
+        """
+
+        nthreads = nb.config.NUMBA_NUM_THREADS if nthreads is None else nthreads
+        if not isinstance(size, int) or size < 2 or size & (size - 1) != 0:
+            raise ValueError(f"Pool size must be a power of 2 >= 2, got {size}.")
+        if not isinstance(nthreads, int) or nthreads <= 0:
+            raise ValueError(f"Number of threads must be a positive integer, got {nthreads}.")
+
+        self.values = np.zeros((nthreads, size), dtype=np.float64)
+        # per thread: cursor, halves consumed (x2), halves filled (x2), key (x2), log2(size)
+        self.state = np.zeros((nthreads, 8), dtype=np.int64)
+        self.state[:, _KEY : _KEY + 2] = key(stream)
+        self.state[:, _LOG2] = size.bit_length() - 1
+        self._thread = None
+        self._stop = threading.Event()
+        self.refill()
+
+        return
+
+    @property
+    def buffers(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the arrays to pass to Numba kernels calling `pool_uniform()`.
+
+        Returns:
+
+            tuple: (values, state)
+        """
+
+        return self.values, self.state
+
+    def refill(self) -> int:
+        """
+        Refill every half buffer which has been used since it was last filled.
+
+        Returns:
+
+            int: The number of half buffers refilled.
+        """
+
+        count = 0
+        for thread in range(len(self.state)):
+            for half in range(2):
+                # Only this method writes the filled counters and only kernels write the consumed counters.
+                # A half is refilled with the generation the kernels will use next (or are using now if they have
+                # outrun the refill); the counter is published after the values.
+                consumed = self.state[thread, _CONSUMED + half]
+                if self.state[thread, _FILLED + half] <= consumed:
+                    _pool_fill(self.values, self.state, thread, half, consumed)
+                    self.state[thread, _FILLED + half] = consumed + 1
+                    count += 1
+
+        return count
+
+    def start(self, interval: float = 0.001) -> None:
+        """
+        Start the background thread which refills used half buffers while kernels (and other code) run.
+
+        Parameters:
+
+            interval (float, optional): The time, in seconds, to sleep when there is nothing to refill. Default is 0.001.
+        """
+
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+            self._thread.start()
+
+        return
+
+    def stop(self) -> None:
+        """
+        Stop the background thread.
+        """
+
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+        return
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.is_set():
+            if self.refill() == 0:
+                self._stop.wait(interval)
+
+        return
+
+
+@nb.njit(nogil=True, cache=True)
+def _pool_value(values, state, thread, position):  # pragma: no cover
+    # The value at the given position in the thread's sequence, computed directly.
+    log2 = state[thread, _LOG2]
+    generation = position >> log2
+    half = (position >> (log2 - 1)) & 1
+    offset = position & ((1 << (log2 - 1)) - 1)
+    r = philox4x32(offset >> 1, generation, thread, _POOL | np.uint32(half), state[thread, _KEY], state[thread, _KEY + 1])
+    if offset & 1 == 0:
+        return _uniform53(r[0], r[1])
+
+    return _uniform53(r[2], r[3])
+
+
+@nb.njit(nogil=True, cache=True)
+def _pool_fill(values, state, thread, half, generation):  # pragma: no cover
+    half_size = values.shape[1] // 2
+    start = generation * values.shape[1] + half * half_size
+    for i in range(half_size):
+        values[thread, half * half_size + i] = _pool_value(values, state, thread, start + i)
+
+    return
+
+
+# Not cache=True, nb.get_thread_id() ties cached code to the threading layer it was compiled under, see laser_core.jit.
+@nb.njit(nogil=True)
+def pool_uniform(values, state):  # pragma: no cover
+    """
+    Take the next uniform random float64 in [0, 1) from the calling thread's buffer of a RandomPool. For use in Numba kernels.
+
+    Parameters:
+
+        values, state: The arrays returned by `RandomPool.buffers`.
+
+    Returns:
+
+        float64: A uniform random value in [0, 1).
+    """
+
+    thread = nb.get_thread_id()
+    position = state[thread, _CURSOR]
+    log2 = state[thread, _LOG2]
+    generation = position >> log2
+    half = (position >> (log2 - 1)) & 1
+    if state[thread, _FILLED + half] == generation + 1:
+        value = values[thread, position & ((1 << log2) - 1)]
+    else:
+        value = _pool_value(values, state, thread, position)  # not refilled yet, don't wait
+    position += 1
+    state[thread, _CURSOR] = position
+    if position & ((1 << (log2 - 1)) - 1) == 0:
+        state[thread, _CONSUMED + half] = generation + 1
+
+    return value
+
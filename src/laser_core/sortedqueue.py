@@ -1,6 +1,7 @@
 """SortedQueue implementation using NumPy and Numba."""
 
 from functools import lru_cache
+from pathlib import Path
 from typing import Any
 
 import numba as nb
@@ -23,7 +24,7 @@ class SortedQueue:
     # https://github.com/python/cpython/blob/5592399313c963c110280a7c98de974889e1d353/Modules/_heapqmodule.c
     # https://github.com/python/cpython/blob/5592399313c963c110280a7c98de974889e1d353/Lib/heapq.py
 
-    def __init__(self, capacity: int, values: np.ndarray):
+    def __init__(self, capacity: int, values: np.ndarray, track_positions: bool = False, index_dtype=np.uint32, arity: int = 2):
         """
         Initializes a new instance of the class with a specified capacity and reference to existing, sortable values.
 
@@ -38,16 +39,230 @@ class SortedQueue:
 
             capacity (int): The maximum number of elements the queue can hold.
             values (np.ndarray): A reference to an array of values to be accessed by the queue.
+            track_positions (bool, optional): If True, maintain a map from index to heap position (len(values) indices)
+                                              to support `remove()` and `update()`. Default is False.
+            index_dtype (data-type, optional): The data type of the indices, np.uint32 or np.uint64 (for more than 2^32 - 1 values).
+                                               Default is np.uint32.
+            arity (int, optional): The number of children per heap node, 2, 4, or 8. Default is 2 (binary heap).
+                                   Wider heaps are shallower and the children of a node share cache lines which
+                                   can speed up pops for very large queues.
+
+        Raises:
+
+            TypeError: If index_dtype is not np.uint32 or np.uint64.
+            ValueError: If arity is not 2, 4, or 8.
         """
 
-        self.indices = np.zeros(capacity, dtype=np.uint32)
+        index_dtype = np.dtype(index_dtype)
+        if index_dtype not in (np.dtype(np.uint32), np.dtype(np.uint64)):
+            raise TypeError(f"Index dtype must be np.uint32 or np.uint64 (got {index_dtype})")
+        if arity not in (2, 4, 8):
+            raise ValueError(f"Arity must be 2, 4, or 8 (got {arity})")
+
+        self.indices = np.zeros(capacity, dtype=index_dtype)
         self.values = values
-        self.size = np.uint32(0)
+        self.arity = int(arity)
+        self._size = np.zeros(1, dtype=index_dtype)  # an array so Numba functions can update the size in place
+        # positions[i] is the heap position of index i (all 1s if not in the queue), empty if not tracking positions
+        self.positions = np.full(len(values) if track_positions else 0, _not_queued(index_dtype), dtype=index_dtype)
 
-        self._siftforward, self._siftbackward = _make_sifts(values.dtype)
+        self._shift = self.arity.bit_length() - 1  # log2(arity)
 
         return
 
+    @property
+    def size(self) -> np.unsignedinteger:
+        """
+        Returns the number of elements in the sorted queue.
+
+        Returns:
+
+            np.uint32 | np.uint64: The number of elements in the sorted queue.
+        """
+
+        return self._size[0]
+
+    @size.setter
+    def size(self, value) -> None:
+        self._size[0] = value
+
+    @property
+    def state(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the arrays holding the state of the sorted queue for use with `njit_functions` in Numba code.
+
+        Returns:
+
+            tuple: (indices, values, positions, size) where size is a single element array of the index dtype.
+        """
+
+        return self.indices, self.values, self.positions, self._size
+
+    @property
+    def njit_functions(self) -> tuple:
+        """
+        Returns Numba functions (push, popi, peeki) operating on `state` which can be called from njit compiled code.
+
+        The functions are not thread-safe, i.e., a queue must not be updated from more than one thread at a time.
+
+        .. code-block:: python
+
+            push, popi, peeki = queue.njit_functions
+
+            @nb.njit
+            def schedule(recovered, tick, indices, values, positions, size):
+                for i in range(len(recovered)):
+                    push(indices, values, positions, size, recovered[i])
+                while size[0] > 0 and values[peeki(indices, values, positions, size)] <= tick:
+                    index = popi(indices, values, positions, size)
+                    ...
+
+            schedule(recovered, tick, *queue.state)
+
+        Returns:
+
+            tuple: Numba functions push(indices, values, positions, size, index), popi(indices, values, positions, size) -> index, and peeki(indices, values, positions, size) -> index.
+        """
+
+        return _make_njit(self._shift)
+
+    @classmethod
+    def from_indices(
+        cls,
+        values: np.ndarray,
+        indices: np.ndarray,
+        capacity: int = None,
+        track_positions: bool = False,
+        index_dtype=np.uint32,
+        arity: int = 2,
+    ) -> "SortedQueue":
+        """
+        Create a new sorted queue holding the given indices into values.
+
+        The heap is built with a single bottom-up (Floyd) heapify in O(n) rather than n individual pushes.
+
+        Parameters:
+
+            values (np.ndarray): A reference to an array of values to be accessed by the queue.
+            indices (np.ndarray): The indices into values to place in the queue.
+            capacity (int, optional): The maximum number of elements the queue can hold. Default is None, i.e., len(indices).
+            track_positions (bool, optional): If True, support `remove()` and `update()`. Default is False.
+            index_dtype (data-type, optional): The data type of the indices, np.uint32 or np.uint64. Default is np.uint32.
+            arity (int, optional): The number of children per heap node, 2, 4, or 8. Default is 2.
+
+        Raises:
+
+            IndexError: If there are more indices than the capacity of the queue.
+
+        Returns:
+
+            SortedQueue: The new sorted queue.
+        """
+
+        indices = np.asarray(indices)
+        queue = cls(len(indices) if capacity is None else capacity, values, track_positions, index_dtype, arity)
+        if len(indices) > len(queue.indices):
+            raise IndexError("Sorted queue is full")
+        queue.indices[: len(indices)] = indices
+        queue.size = len(indices)
+        _heapify(queue.indices, queue.values, queue.positions, len(queue), queue._shift)
+
+        return queue
+
+    def save(self, filename) -> None:
+        """
+        Save the sorted queue, e.g., for a checkpoint, to a NumPy .npz file.
+
+        The file holds `indices[:size]` in heap order plus the capacity, value and index dtypes, arity, and
+        whether positions are tracked. The values themselves are _not_ saved, save the LaserFrame property separately.
+
+        Parameters:
+
+            filename (str | Path): The path to the file where the sorted queue will be saved.
+
+        Returns:
+
+            None
+        """
+
+        with Path(filename).open("wb") as file:
+            np.savez(
+                file,
+                indices=self.indices[: len(self)],
+                capacity=len(self.indices),
+                value_dtype=self.values.dtype.str,
+                arity=self.arity,
+                track_positions=len(self.positions) > 0,
+            )
+
+        return
+
+    @classmethod
+    def load(cls, filename, values: np.ndarray) -> "SortedQueue":
+        """
+        Load a sorted queue saved with `save()` and attach it to the given values, e.g., the restored LaserFrame property.
+
+        The saved heap order is kept as-is so restoring is a copy (plus an O(n) scatter if positions are tracked)
+        rather than n pushes. The values must be the same as when the queue was saved.
+
+        Parameters:
+
+            filename (str | Path): The path to the file where the sorted queue is saved.
+            values (np.ndarray): A reference to the array of values to be accessed by the queue.
+
+        Raises:
+
+            TypeError: If the dtype of values does not match the saved value dtype.
+            ValueError: If a saved index is out of range for values.
+
+        Returns:
+
+            SortedQueue: The restored sorted queue.
+        """
+
+        with np.load(filename) as data:
+            indices = data["indices"]
+            if values.dtype != np.dtype(str(data["value_dtype"])):
+                raise TypeError(f"Sorted queue values must be {np.dtype(str(data['value_dtype']))} (got {values.dtype})")
+            if len(indices) > 0 and indices.max() >= len(values):
+                raise ValueError(f"Sorted queue index {indices.max()} is out of range for {len(values)} values.")
+            queue = cls(int(data["capacity"]), values, bool(data["track_positions"]), indices.dtype, int(data["arity"]))
+
+        queue.indices[: len(indices)] = indices
+        queue.size = len(indices)
+        if len(queue.positions) > 0:
+            queue.positions[indices] = np.arange(len(indices), dtype=queue.positions.dtype)
+
+        return queue
+
+    def push_many(self, indices: np.ndarray) -> None:
+        """
+        Insert multiple elements into the sorted queue with a single call into Numba.
+
+        If the number of new elements exceeds the current size of the queue, the heap is rebuilt with
+        a bottom-up (Floyd) heapify in O(n), otherwise each new element is sifted forward in O(log n).
+
+        Parameters:
+
+            indices (np.ndarray): The indices of the elements to be added to the sorted queue.
+
+        Raises:
+
+            IndexError: If the sorted queue does not have room for all the elements.
+        """
+
+        indices = np.asarray(indices)
+        size, count = len(self), len(indices)
+        if size + count > len(self.indices):
+            raise IndexError("Sorted queue is full")
+        self.indices[size : size + count] = indices
+        if count > size:
+            _heapify(self.indices, self.values, self.positions, size + count, self._shift)
+        else:
+            _pushmany(self.indices, self.values, self.positions, size, count, self._shift)
+        self.size += count
+        return
+
     def push(self, index) -> None:
         """
         Insert an element into the sorted queue.
@@ -68,8 +283,8 @@ class SortedQueue:
         if self.size >= len(self.indices):
             raise IndexError("Sorted queue is full")
         self.indices[self.size] = index
-        self._siftforward(self.indices, self.values, np.uint32(0), self.size)
-        self.size += np.uint32(1)
+        _siftforward(self.indices, self.values, self.positions, 0, len(self), self._shift)
+        self.size += 1
         return
 
     def peeki(self) -> np.uint32:
@@ -174,6 +389,39 @@ class SortedQueue:
 
         return ivtuple
 
+    def pop_until(self, value, out: np.ndarray = None) -> np.ndarray:
+        """
+        Removes and returns the indices of all elements with `values[index] <= value`, in sorted order.
+
+        All the due elements are drained inside a single call into Numba, e.g., all the deaths for the current tick.
+
+        Parameters:
+
+            value (Any): The (inclusive) threshold value.
+            out (np.ndarray, optional): An array of the index dtype to fill with the indices. If given, at most len(out)
+                                        elements are removed. Default is None, i.e., allocate as needed.
+
+        Returns:
+
+            np.ndarray: The removed indices (a view into `out` if given).
+        """
+
+        value = self.values.dtype.type(value)
+        if out is not None:
+            count, self.size = _popuntil(self.indices, self.values, self.positions, len(self), value, out, self._shift)
+            return out[:count]
+
+        out = np.empty(min(int(self.size), 1024), dtype=self.indices.dtype)
+        count = 0
+        while True:
+            n, self.size = _popuntil(self.indices, self.values, self.positions, len(self), value, out[count:], self._shift)
+            count += n
+            if count < len(out) or self.size == 0:
+                break
+            out = np.resize(out, min(2 * len(out), count + int(self.size)))
+
+        return out[:count]
+
     def __pop(self) -> None:
         """
         Removes the smallest value element from the sorted queue.
@@ -191,11 +439,64 @@ class SortedQueue:
 
         if self.size == 0:
             raise IndexError("Priority queue is empty")
-        self.size -= np.uint32(1)
-        self.indices[0] = self.indices[self.size]
-        self._siftbackward(self.indices, self.values, np.uint32(0), self.size)
+        _remove(self.indices, self.values, self.positions, len(self), 0, self._shift)
+        self.size -= 1
         return
 
+    def remove(self, index) -> None:
+        """
+        Removes the given index from the sorted queue, e.g., to cancel a pending event. Requires `track_positions=True`.
+
+        Parameters:
+
+            index (int): The index of the element to be removed.
+
+        Raises:
+
+            IndexError: If the sorted queue is not tracking positions or the index is not in the sorted queue.
+        """
+
+        _remove(self.indices, self.values, self.positions, len(self), int(self.__position(index)), self._shift)
+        self.size -= 1
+        return
+
+    def update(self, index) -> None:
+        """
+        Restores the heap property after `values[index]` has been changed, e.g., to re-key a pending event. Requires `track_positions=True`.
+
+        Parameters:
+
+            index (int): The index of the element whose value has changed.
+
+        Raises:
+
+            IndexError: If the sorted queue is not tracking positions or the index is not in the sorted queue.
+        """
+
+        _update(self.indices, self.values, self.positions, len(self), int(self.__position(index)), self._shift)
+        return
+
+    def __contains__(self, index) -> bool:
+        """
+        Return whether the given index is in the sorted queue. Requires `track_positions=True`.
+
+        Returns:
+
+            bool: True if the index is in the sorted queue.
+        """
+
+        if len(self.positions) == 0:
+            raise IndexError("Sorted queue is not tracking positions")
+        return bool(self.positions[index] != _not_queued(self.positions.dtype))
+
+    def __position(self, index) -> np.unsignedinteger:
+        if len(self.positions) == 0:
+            raise IndexError("Sorted queue is not tracking positions")
+        position = self.positions[index]
+        if position == _not_queued(self.positions.dtype):
+            raise IndexError(f"Index {index} is not in the sorted queue")
+        return position
+
     def __len__(self) -> int:
         """
         Return the number of elements in the sorted queue.
@@ -208,61 +509,351 @@ class SortedQueue:
         return int(self.size)
 
 
-@lru_cache(maxsize=10)  # 4 signed ints, 4 unsigned ints, 2 floats
-def _make_sifts(npdtype):
-    np_nb_map = {
-        np.float32(42).dtype: nb.float32[:],
-        np.float64(42).dtype: nb.float64[:],
-        np.uint8(42).dtype: nb.uint8[:],
-        np.uint16(42).dtype: nb.uint16[:],
-        np.uint32(42).dtype: nb.uint32[:],
-        np.uint64(42).dtype: nb.uint64[:],
-        np.int8(42).dtype: nb.int8[:],
-        np.int16(42).dtype: nb.int16[:],
-        np.int32(42).dtype: nb.int32[:],
-        np.int64(42).dtype: nb.int64[:],
-    }
-
-    nbdtype = np_nb_map[npdtype]
-
-    @nb.njit((nb.uint32[:], nbdtype, nb.uint32, nb.uint32), nogil=True)
-    def _siftforward(indices, values, startpos, pos):  # pragma: no cover
-        inewitem = indices[pos]
-        vnewitem = values[inewitem]
-        # Follow the path to the root, moving parents backward until finding a place newitem fits.
-        while pos > startpos:
-            parentpos = (pos - 1) >> 1
-            iparent = indices[parentpos]
-            vparent = values[iparent]
-            if vnewitem < vparent:
-                indices[pos] = iparent
-                pos = parentpos
-                continue
-            break
-        indices[pos] = inewitem
+class PartitionedSortedQueue:
+    """
+    A set of per-node sorted (priority) queues sharing one preallocated index arena, e.g., per-node event queues in a spatial model.
+
+    The heap for node n occupies `indices[offsets[n]:offsets[n + 1]]` and holds `sizes[n]` entries so thousands of nodes
+    cost two small offset/size tables rather than thousands of SortedQueue objects.
+
+    __init__ with per-node capacities and an existing array of sorting values
+
+    __push_many__ with node ids and indices into sorting values
+
+    __pop_until__ returns the due indices of all (or the given) nodes, draining the nodes in parallel
+    """
+
+    def __init__(self, capacities: np.ndarray, values: np.ndarray, index_dtype=np.uint32, arity: int = 2):
+        """
+        Initializes a new instance of the class with the specified per-node capacities and reference to existing, sortable values.
+
+        Parameters:
+
+            capacities (np.ndarray): The maximum number of elements each node's queue can hold.
+            values (np.ndarray): A reference to an array of values to be accessed by the queues.
+            index_dtype (data-type, optional): The data type of the indices, np.uint32 or np.uint64. Default is np.uint32.
+            arity (int, optional): The number of children per heap node, 2, 4, or 8. Default is 2.
+
+        Raises:
+
+            TypeError: If index_dtype is not np.uint32 or np.uint64.
+            ValueError: If capacities is not a 1-D array of non-negative integers or arity is not 2, 4, or 8.
+        """
+
+        index_dtype = np.dtype(index_dtype)
+        if index_dtype not in (np.dtype(np.uint32), np.dtype(np.uint64)):
+            raise TypeError(f"Index dtype must be np.uint32 or np.uint64 (got {index_dtype})")
+        if arity not in (2, 4, 8):
+            raise ValueError(f"Arity must be 2, 4, or 8 (got {arity})")
+        capacities = np.asarray(capacities)
+        if capacities.ndim != 1 or not np.issubdtype(capacities.dtype, np.integer) or np.any(capacities < 0):
+            raise ValueError("Capacities must be a 1-D array of non-negative integers.")
+
+        self.offsets = np.zeros(len(capacities) + 1, dtype=np.int64)  # node n's heap is indices[offsets[n]:offsets[n + 1]]
+        np.cumsum(capacities, out=self.offsets[1:])
+        self.indices = np.zeros(self.offsets[-1], dtype=index_dtype)
+        self.sizes = np.zeros(len(capacities), dtype=np.int64)
+        self.values = values
+        self.arity = int(arity)
+
+        self._shift = self.arity.bit_length() - 1  # log2(arity)
+
+        return
+
+    @property
+    def nnodes(self) -> int:
+        """
+        Returns the number of nodes (per-node queues).
+
+        Returns:
+
+            int: The number of nodes.
+        """
+
+        return len(self.sizes)
+
+    def push(self, node: int, index) -> None:
+        """
+        Insert an element into the given node's queue.
+
+        Parameters:
+
+            node (int): The node.
+            index (int): The index of the element to be added to the node's queue.
+
+        Raises:
+
+            IndexError: If the node's queue is full.
+        """
+
+        self.push_many(np.array([node], dtype=np.int64), np.array([index], dtype=self.indices.dtype))
+
+        return
+
+    def push_many(self, nodes: np.ndarray, indices: np.ndarray) -> None:
+        """
+        Insert multiple elements into their nodes' queues with a single call into Numba.
+
+        Parameters:
+
+            nodes (np.ndarray): The node of each element (broadcast against indices, so a scalar node is allowed).
+            indices (np.ndarray): The indices of the elements to be added.
+
+        Raises:
+
+            IndexError: If any node's queue does not have room for its new elements (no elements are added).
+        """
+
+        nodes, indices = np.broadcast_arrays(np.asarray(nodes, dtype=np.int64), np.asarray(indices, dtype=self.indices.dtype))
+        nodes, indices = np.ascontiguousarray(nodes), np.ascontiguousarray(indices)
+        if len(nodes) > 0 and (nodes.min() < 0 or nodes.max() >= self.nnodes):
+            raise IndexError(f"Node out of range [0, {self.nnodes})")
+        if np.any(self.sizes + np.bincount(nodes, minlength=self.nnodes) > np.diff(self.offsets)):
+            raise IndexError("Sorted queue is full")
+        _partitioned_pushmany(self.indices, self.values, self.offsets, self.sizes, nodes, indices, self._shift)
 
         return
 
-    @nb.njit((nb.uint32[:], nbdtype, nb.uint32, nb.uint32), nogil=True)
-    def _siftbackward(indices, values, pos, size):  # pragma: no cover
-        endpos = size
-        startpos = pos
-        inewitem = indices[pos]
-        # Bubble up the smaller child until hitting a leaf.
-        childpos = 2 * pos + 1  # leftmost child position
-        while childpos < endpos:
-            # Set childpos to index of smaller child.
-            rightpos = childpos + 1
-            if rightpos < endpos and not values[indices[childpos]] < values[indices[rightpos]]:
-                childpos = rightpos
-            # Move the smaller child up.
-            indices[pos] = indices[childpos]
-            pos = childpos
-            childpos = 2 * pos + 1
-        # The leaf at pos is empty now.  Put newitem there, and bubble it up
-        # to its final resting place (by sifting its parents forward).
-        indices[pos] = inewitem
-        _siftforward(indices, values, startpos, pos)
+    def pop_until(self, value, nodes: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Removes and returns the indices of all elements with `values[index] <= value` from all (or the given) nodes' queues.
+
+        Each node is drained independently, in parallel, and its due indices are returned in sorted order.
+        For staggered schedules pass the nodes being updated and, optionally, a per-node threshold.
+
+        Parameters:
+
+            value (Any | np.ndarray): The (inclusive) threshold value, scalar or one per node drained.
+            nodes (np.ndarray, optional): The (unique) nodes to drain. Default is None, i.e., all nodes.
+
+        Returns:
+
+            tuple: (indices, counts) where indices holds the removed indices grouped by node in the order of `nodes`
+                   and counts holds the number of indices removed from each node.
+
+        Raises:
+
+            ValueError: If nodes is not unique.
+        """
+
+        if nodes is None:
+            nodes = np.arange(self.nnodes, dtype=np.int64)
+        else:
+            nodes = np.ascontiguousarray(nodes, dtype=np.int64)
+            if len(np.unique(nodes)) != len(nodes):
+                raise ValueError("Nodes to drain must be unique.")
+        limits = np.broadcast_to(np.asarray(value, dtype=self.values.dtype), nodes.shape).copy()
+
+        return _partitioned_popuntil(self.indices, self.values, self.offsets, self.sizes, nodes, limits, self._shift)
+
+    def __len__(self) -> int:
+        """
+        Return the total number of elements in all nodes' queues.
+
+        Returns:
+
+            int: The number of elements in the queues.
+        """
+
+        return int(self.sizes.sum())
+
+
+# The value dtypes supported by SortedQueue (4 signed ints, 4 unsigned ints, 2 floats) and the index dtypes.
+_VALUE_DTYPES = tuple(
+    np.dtype(t) for t in (np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64, np.float32, np.float64)
+)
+_INDEX_DTYPES = (np.dtype(np.uint32), np.dtype(np.uint64))
+
+
+def _not_queued(idxdtype):
+    # SortedQueue.positions value for indices which are not in the queue
+    return idxdtype.type(np.iinfo(idxdtype).max)
+
+
+# The kernels below are module level functions, generic over the value and index dtypes, so that Numba can cache
+# the compiled code on disk (closures over other dispatchers are not cacheable). Heap positions and sizes are int64
+# and the heap arity is passed as shift = log2(arity). positions is empty if the queue is not tracking heap positions,
+# storing -1 in positions sets all bits, i.e., _not_queued().
+
+
+@nb.njit(nogil=True, cache=True)
+def _siftforward(indices, values, positions, startpos, pos, shift):  # pragma: no cover
+    tracking = len(positions) > 0
+    inewitem = indices[pos]
+    vnewitem = values[inewitem]
+    # Follow the path to the root, moving parents backward until finding a place newitem fits.
+    while pos > startpos:
+        parentpos = (pos - 1) >> shift
+        iparent = indices[parentpos]
+        vparent = values[iparent]
+        if vnewitem < vparent:
+            indices[pos] = iparent
+            if tracking:
+                positions[iparent] = pos
+            pos = parentpos
+            continue
+        break
+    indices[pos] = inewitem
+    if tracking:
+        positions[inewitem] = pos
+
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _siftbackward(indices, values, positions, pos, size, shift):  # pragma: no cover
+    tracking = len(positions) > 0
+    endpos = size
+    startpos = pos
+    inewitem = indices[pos]
+    # Bubble up the smallest child until hitting a leaf.
+    childpos = (pos << shift) + 1  # leftmost child position
+    while childpos < endpos:
+        # Set childpos to index of smallest child (the rightmost of equal children, as in heapq).
+        lastpos = min(childpos + (1 << shift), endpos)
+        for otherpos in range(childpos + 1, lastpos):
+            if not values[indices[childpos]] < values[indices[otherpos]]:
+                childpos = otherpos
+        # Move the smallest child up.
+        indices[pos] = indices[childpos]
+        if tracking:
+            positions[indices[pos]] = pos
+        pos = childpos
+        childpos = (pos << shift) + 1
+    # The leaf at pos is empty now.  Put newitem there, and bubble it up
+    # to its final resting place (by sifting its parents forward).
+    indices[pos] = inewitem
+    _siftforward(indices, values, positions, startpos, pos, shift)
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _heapify(indices, values, positions, size, shift):  # pragma: no cover
+    if len(positions) > 0:
+        for pos in range(size):
+            positions[indices[pos]] = pos
+    # Floyd's bottom-up heap construction: sift each parent down, last parent first.
+    pos = (size + (1 << shift) - 2) >> shift  # number of parents
+    while pos > 0:
+        pos -= 1
+        _siftbackward(indices, values, positions, pos, size, shift)
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _pushmany(indices, values, positions, size, count, shift):  # pragma: no cover
+    for pos in range(size, size + count):
+        _siftforward(indices, values, positions, 0, pos, shift)
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _update(indices, values, positions, size, pos, shift):  # pragma: no cover
+    # The element at pos may belong closer to the root _or_ closer to the leaves.
+    item = indices[pos]
+    _siftforward(indices, values, positions, 0, pos, shift)
+    if indices[pos] == item:
+        _siftbackward(indices, values, positions, pos, size, shift)
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _remove(indices, values, positions, size, pos, shift):  # pragma: no cover
+    # Replace the element at pos with the last element and restore the heap property (size is the size _before_ removal).
+    if len(positions) > 0:
+        positions[indices[pos]] = -1
+    size -= 1
+    if pos < size:
+        indices[pos] = indices[size]
+        _update(indices, values, positions, size, pos, shift)
+    return
+
+
+@nb.njit(nogil=True, cache=True)
+def _popuntil(indices, values, positions, size, value, out, shift):  # pragma: no cover
+    count = 0
+    while size > 0 and count < len(out) and values[indices[0]] <= value:
+        out[count] = indices[0]
+        count += 1
+        if len(positions) > 0:
+            positions[indices[0]] = -1
+        size -= 1
+        if size > 0:
+            indices[0] = indices[size]
+            _siftbackward(indices, values, positions, 0, size, shift)
+    return count, size
+
+
+@lru_cache(maxsize=3)  # (2, 4, 8) arity
+def _make_njit(shift):
+    # Closures over an int (but not over other dispatchers) are still cacheable.
+
+    @nb.njit(nogil=True, cache=True)
+    def push(indices, values, positions, size, index):  # pragma: no cover
+        if size[0] >= len(indices):
+            raise IndexError("Sorted queue is full")
+        indices[size[0]] = index
+        _siftforward(indices, values, positions, 0, np.int64(size[0]), shift)
+        size[0] += 1
         return
 
-    return _siftforward, _siftbackward
+    @nb.njit(nogil=True, cache=True)
+    def popi(indices, values, positions, size):  # pragma: no cover
+        if size[0] == 0:
+            raise IndexError("Sorted queue is empty")
+        index = indices[0]
+        _remove(indices, values, positions, np.int64(size[0]), 0, shift)
+        size[0] -= 1
+        return index
+
+    @nb.njit(nogil=True, cache=True)
+    def peeki(indices, values, positions, size):  # pragma: no cover
+        if size[0] == 0:
+            raise IndexError("Sorted queue is empty")
+        return indices[0]
+
+    return push, popi, peeki
+
+
+@nb.njit(nogil=True, cache=True)
+def _partitioned_pushmany(indices, values, offsets, sizes, nodes, pushed, shift):  # pragma: no cover
+    nopositions = np.zeros(0, dtype=indices.dtype)  # per-node heaps don't track positions
+    for i in range(len(nodes)):
+        node = nodes[i]
+        heap = indices[offsets[node] : offsets[node + 1]]
+        pos = sizes[node]
+        heap[pos] = pushed[i]
+        _siftforward(heap, values, nopositions, 0, pos, shift)
+        sizes[node] += 1
+    return
+
+
+@nb.njit(nogil=True, cache=True, parallel=True)
+def _partitioned_popuntil(indices, values, offsets, sizes, nodes, limits, shift):  # pragma: no cover
+    # Pass 1: drain each node in parallel, parking each popped index in the slot just freed at the end of its heap.
+    nopositions = np.zeros(0, dtype=indices.dtype)
+    counts = np.zeros(len(nodes), dtype=np.int64)
+    for k in nb.prange(len(nodes)):
+        node = nodes[k]
+        heap = indices[offsets[node] : offsets[node + 1]]
+        size = sizes[node]
+        limit = limits[k]
+        while size > 0 and values[heap[0]] <= limit:
+            index = heap[0]
+            size -= 1
+            heap[0] = heap[size]
+            heap[size] = index
+            if size > 0:
+                _siftbackward(heap, values, nopositions, 0, size, shift)
+        counts[k] = sizes[node] - size
+        sizes[node] = size
+    # Pass 2: gather the parked indices (in reverse, i.e., sorted, order) into one output array.
+    starts = np.zeros(len(nodes) + 1, dtype=np.int64)
+    starts[1:] = np.cumsum(counts)
+    out = np.empty(starts[-1], dtype=indices.dtype)
+    for k in nb.prange(len(nodes)):
+        node = nodes[k]
+        last = offsets[node] + sizes[node] + counts[k] - 1
+        for j in range(counts[k]):
+            out[starts[k] + j] = indices[last - j]
+    return out, counts
@@ -13,7 +13,7 @@ Functions:
 import click
 import numpy as np
 
-from laser_core.migration import distance
+from laser_core.migration import distance_matrix
 
 
 def __deprecated(msg):
@@ -51,10 +51,7 @@ def calc_distances(latitudes: np.ndarray, longitudes: np.ndarray, verbose: bool
 
     assert latitudes.ndim == 1, "Latitude array must be one-dimensional"
     assert longitudes.shape == latitudes.shape, "Latitude and longitude arrays must have the same shape"
-    npatches = len(latitudes)
-    distances = np.zeros((npatches, npatches), dtype=np.float32)
-    for i, (lat, long) in enumerate(zip(latitudes, longitudes)):
-        distances[i, :] = distance(lat, long, latitudes, longitudes)
+    distances = distance_matrix(latitudes, longitudes, dtype=np.float32)
 
     if verbose:
         click.echo(f"Upper left corner of distance matrix:\n{distances[0:4, 0:4]}")
@@ -0,0 +1,156 @@
+"""Tests for the CalendarQueue class."""
+
+import unittest
+from typing import ClassVar
+
+import numpy as np
+import pytest
+
+from laser_core import CalendarQueue
+
+
+class TestCalendarQueue(unittest.TestCase):
+    """Tests for the CalendarQueue class."""
+
+    messages: ClassVar = []
+
+    # Called once after all tests
+    @classmethod
+    def tearDownClass(cls):
+        print()
+        for message in cls.messages:
+            print(message)
+
+    def test_push_pop_until(self):
+        """Test that pop_until() returns exactly the entries due each tick."""
+        values = np.random.randint(0, 100, 4096, dtype=np.int32)
+        cq = CalendarQueue(len(values), values, horizon=16, chunk_size=8)
+        for i in range(len(values)):
+            cq.push(i)
+        assert len(cq) == len(values)
+        for tick in range(100):
+            due = cq.pop_until(tick)
+            assert np.all(np.sort(due) == np.nonzero(values == tick)[0])
+            assert cq.tick == tick + 1
+        assert len(cq) == 0
+
+    def test_push_many_types(self):
+        """Test push_many() with all the integer value types and far future (overflow) entries."""
+        values = np.random.randint(0, 120, 2048, dtype=np.int64)
+        for dtype in [np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64]:
+            cq = CalendarQueue(len(values), values.astype(dtype), horizon=10, chunk_size=4)
+            cq.push_many(np.arange(len(values)))
+            assert len(cq.overflow) == np.sum(values >= 10)
+            for tick in range(120):
+                due = cq.pop_until(tick)
+                assert np.all(np.sort(due) == np.nonzero(values == tick)[0])
+
+    def test_index_dtype(self):
+        """Test a calendar queue with 64-bit indices."""
+        values = np.random.randint(0, 50, 1024, dtype=np.int32)
+        cq = CalendarQueue(len(values), values, horizon=8, index_dtype=np.uint64)
+        cq.push_many(np.arange(len(values)))
+        for tick in range(50):
+            due = cq.pop_until(tick)
+            assert due.dtype == np.uint64
+            assert np.all(np.sort(due) == np.nonzero(values == tick)[0])
+
+    def test_skip_ticks(self):
+        """Test popping several (and more than horizon) ticks at once."""
+        values = np.random.randint(0, 1000, 4096, dtype=np.int32)
+        cq = CalendarQueue(len(values), values, horizon=30)
+        cq.push_many(np.arange(len(values)))
+        due = cq.pop_until(99)
+        assert np.all(values[due] <= 99)
+        assert np.all(np.diff(values[due]) >= 0)
+        assert len(due) == np.sum(values <= 99)
+        due = cq.pop_until(899)
+        assert len(due) == np.sum((values > 99) & (values <= 899))
+        assert np.all(np.diff(values[due]) >= 0)
+        due = cq.pop_until(2000)
+        assert len(due) == np.sum(values > 899)
+        assert len(cq) == 0
+
+    def test_overdue(self):
+        """Test that entries pushed for past ticks are returned by the next pop_until()."""
+        values = np.array([5, 1, 2, 3], dtype=np.int32)
+        cq = CalendarQueue(len(values), values, horizon=4)
+        cq.push(0)
+        assert len(cq.pop_until(3)) == 0
+        cq.push(1)  # tick 1 is in the past
+        assert list(cq.pop_until(4)) == [1]
+        assert list(cq.pop_until(5)) == [0]
+
+    def test_pop_until_allocation(self):
+        """Test that pop_until() without out doesn't allocate for every queued element and grows as needed."""
+        values = np.full(100_000, 10, dtype=np.int32)
+        values[:3] = 0
+        cq = CalendarQueue(len(values), values, horizon=16)
+        cq.push_many(np.arange(len(values)))
+        due = cq.pop_until(0)
+        assert list(np.sort(due)) == [0, 1, 2]
+        assert due.base is None or due.base.size <= 1024
+        due = cq.pop_until(10)
+        assert np.all(np.sort(due) == np.arange(3, len(values)))
+        assert cq.tick == 11
+        assert len(cq) == 0
+
+    def test_out(self):
+        """Test draining into a caller provided (small) output array."""
+        values = np.zeros(100, dtype=np.int32)
+        values[50:] = 1
+        cq = CalendarQueue(len(values), values, horizon=4, chunk_size=16)
+        cq.push_many(np.arange(len(values)))
+        out = np.zeros(40, dtype=np.uint32)
+        drained = []
+        while len(cq):
+            due = cq.pop_until(1, out=out)
+            assert np.shares_memory(due, out)
+            drained.extend(due)
+        assert sorted(drained) == list(range(100))
+        assert cq.tick == 2
+
+    def test_reuse_chunks(self):
+        """Test that consumed chunks are returned to the pool for reuse."""
+        values = np.zeros(64, dtype=np.int32)
+        cq = CalendarQueue(len(values), values, horizon=2, chunk_size=4)
+        for tick in range(1000):
+            values[:] = tick + 1
+            cq.push_many(np.arange(len(values)))
+            assert len(cq.pop_until(tick + 1)) == len(values)
+
+    def test_full(self):
+        """Test pushing to a full calendar queue. Should raise an IndexError."""
+        values = np.zeros(8, dtype=np.int32)
+        cq = CalendarQueue(4, values)
+        cq.push_many(np.arange(4))
+        with pytest.raises(IndexError):
+            cq.push(4)
+
+    def test_bad_values(self):
+        """Test that non-integer values raise a TypeError."""
+        with pytest.raises(TypeError):
+            _ = CalendarQueue(4, np.zeros(4, dtype=np.float32))
+        with pytest.raises(ValueError):
+            _ = CalendarQueue(4, np.zeros(4, dtype=np.int32), horizon=0)
+
+    def test_timing(self):
+        """Test the timing of push_many() and pop_until()."""
+        import timeit
+
+        np.random.seed(20240701)
+        count = 1 << 20
+        values = np.random.randint(0, 100, count, dtype=np.int32)
+        cq = CalendarQueue(len(values), values, horizon=128)
+        elapsed = timeit.timeit("cq.push_many(np.arange(count))", globals={"cq": cq, "np": np, "count": count}, number=1)
+        self.messages.append(
+            f"CalendarQueue.push_many() timing: {elapsed:0.4f} seconds for {count:9,} elements = {int(round(count / elapsed)):11,} elements/second"
+        )
+        elapsed = timeit.timeit("for tick in range(100): cq.pop_until(tick)", globals={"cq": cq}, number=1)
+        self.messages.append(
+            f"CalendarQueue.pop_until() timing: {elapsed:0.4f} seconds for {count:9,} elements = {int(round(count / elapsed)):11,} elements/second"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main(exit=False)
@@ -0,0 +1,154 @@
+"""Tests for the EventLog class."""
+
+import re
+import unittest
+
+import numba as nb
+import numpy as np
+import pytest
+
+from laser_core import EventLog
+from laser_core import LaserFrame
+from laser_core.eventlog import EVENT_DTYPE
+from laser_core.eventlog import NO_SOURCE
+from laser_core.eventlog import log_event
+
+INFECTION = 1
+RECOVERY = 2
+
+
+@nb.njit(parallel=True)
+def infect(count, tick, ticks, agents, sources, types, counts):  # pragma: no cover
+    for i in nb.prange(count):
+        log_event(ticks, agents, sources, types, counts, tick, i, (i + 1) % count, INFECTION)
+
+    return
+
+
+@nb.njit
+def infect_serial(count, tick, ticks, agents, sources, types, counts):  # pragma: no cover
+    # all events go to the calling thread's chunk regardless of the number of Numba threads
+    for i in range(count):
+        log_event(ticks, agents, sources, types, counts, tick, i, (i + 1) % count, INFECTION)
+
+    return
+
+
+class TestEventLog(unittest.TestCase):
+    def test_kernel_append(self):
+        """Test appending events from a Numba kernel and flushing them to disk."""
+        log = EventLog(chunk_size=1024)
+        for tick in range(4):
+            infect(100, tick, *log.buffers)
+            assert len(log) == 100 * (tick + 1)
+            log.flush()
+        events = log.events()
+        assert events.dtype == EVENT_DTYPE
+        assert len(events) == 400
+        assert np.all(np.bincount(events["tick"]) == 100)
+        assert np.all(events["type"] == INFECTION)
+        for tick in range(4):
+            assert np.all(np.sort(events["agent"][events["tick"] == tick]) == np.arange(100))
+
+    def test_python_append(self):
+        """Test appending (broadcast) events from Python and querying them."""
+        log = EventLog(chunk_size=16)
+        log.append(3, np.arange(10), source=np.arange(10) + 100, type=INFECTION)
+        log.append(5, np.arange(5), type=RECOVERY)
+        assert len(log) == 15
+        events = log.query(type=RECOVERY)
+        assert len(events) == 5
+        assert np.all(events["tick"] == 5)
+        assert np.all(events["source"] == NO_SOURCE)
+        events = log.query(tick=3, agent=[2, 4, 6])
+        assert np.all(events["agent"] == [2, 4, 6])
+        assert np.all(events["source"] == [102, 104, 106])
+        assert len(log.query(tick=range(4, 100))) == 5
+
+    def test_empty(self):
+        """Test querying an empty log."""
+        log = EventLog()
+        assert len(log) == 0
+        assert len(log.events()) == 0
+        assert len(log.query(tick=0)) == 0
+
+    def test_overflow(self):
+        """Test that events dropped because all of a thread's chunks are full are reported on flush."""
+        log = EventLog(chunk_size=16, nchunks=4)
+        infect_serial(100, 0, *log.buffers)
+        with pytest.raises(
+            ValueError,
+            match=re.escape("EventLog dropped 36 events (nchunks=4 x chunk_size=16 per thread is too small"),
+        ):
+            log.flush()
+        assert len(log) == 64  # recorded events are kept
+        log.flush()  # dropped count is reset
+
+    def test_chunk_ring(self):
+        """Test that a thread moves on to its next chunk when one fills and every chunk is spilled in order."""
+        log = EventLog(chunk_size=4, nchunks=4)
+        infect_serial(10, 0, *log.buffers)
+        assert len(log) == 10
+        log.flush()
+        infect_serial(10, 1, *log.buffers)
+        log.append(2, np.arange(5))  # pending events are spilled first and nothing is dropped
+        events = log.events()
+        assert np.all(events["tick"] == [0] * 10 + [1] * 10 + [2] * 5)
+        assert np.all(events["agent"][:10] == np.arange(10))
+        assert np.all(events["agent"][10:20] == np.arange(10))
+
+    def test_append_after_overflow(self):
+        """Test that append() keeps its records when pending kernel events had been dropped."""
+        log = EventLog(chunk_size=4, nchunks=1)
+        infect_serial(10, 0, *log.buffers)
+        with pytest.raises(ValueError, match="dropped 6 events"):
+            log.append(1, np.arange(3))
+        assert np.all(log.events()["tick"] == [0] * 4 + [1] * 3)
+
+    def test_background_spill(self):
+        """Test that the background thread spills completed chunks so their ring slots can be reused."""
+        import time
+
+        log = EventLog(chunk_size=4, nchunks=4)
+        log.start()
+        for tick in range(8):
+            infect_serial(12, tick, *log.buffers)  # completes two chunks, fits the ring only if they are spilled
+            deadline = time.monotonic() + 10.0
+            while log.counts[0, 3] < log.counts[0, 2] and time.monotonic() < deadline:
+                time.sleep(0.001)
+        log.stop()
+        log.flush()
+        events = log.events()
+        assert len(events) == 96
+        assert np.all(events["tick"] == np.repeat(np.arange(8), 12))
+
+    def test_path(self):
+        """Test spilling events to a given file."""
+        import tempfile
+        from pathlib import Path
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "events.bin"
+            log = EventLog(path=path)
+            log.append(1, np.arange(8))
+            assert path.stat().st_size == 8 * EVENT_DTYPE.itemsize
+            assert np.all(np.fromfile(path, dtype=EVENT_DTYPE)["agent"] == np.arange(8))
+
+    def test_bad_chunk_size(self):
+        """Test that an invalid chunk size raises a ValueError."""
+        with pytest.raises(ValueError, match=re.escape("Chunk size must be a positive integer, got 0.")):
+            _ = EventLog(chunk_size=0)
+
+    def test_laserframe_event_log(self):
+        """Test attaching an event log to a LaserFrame."""
+        pop = LaserFrame(1024, initial_count=100)
+        log = pop.add_event_log("transmissions", chunk_size=128)
+        assert pop.transmissions is log
+        infect(pop.count, 7, *pop.transmissions.buffers)
+        assert len(pop.transmissions.query(tick=7)) == 100
+        pop.sort(np.arange(pop.count)[::-1].copy())  # event logs aren't columns
+        assert pop.transmissions is log
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""Tests for the warmup() function."""
+
+import unittest
+
+import numpy as np
+from numba.core.caching import NullCache
+
+import laser_core
+from laser_core.calendarqueue import _drain
+from laser_core.eventlog import log_event
+from laser_core.random import pool_uniform
+from laser_core.sortedqueue import _partitioned_popuntil
+from laser_core.sortedqueue import _popuntil
+from laser_core.sortedqueue import _siftforward
+
+
+class TestWarmup(unittest.TestCase):
+    def test_warmup(self):
+        """Test that warmup() compiles the queue kernels for the requested dtypes."""
+        elapsed = laser_core.warmup(value_dtypes=[np.int16, np.float32], index_dtypes=[np.uint64], arities=(2, 4))
+        assert elapsed > 0
+        for kernel in [_siftforward, _popuntil, _partitioned_popuntil]:
+            compiled = [(signature[0].dtype, signature[1].dtype) for signature in kernel.signatures]
+            for dtype in [np.int16, np.float32]:
+                assert (np.dtype(np.uint64), np.dtype(dtype)) in [(np.dtype(str(i)), np.dtype(str(v))) for i, v in compiled]
+        assert any(str(signature[0].dtype) == "int16" for signature in _drain.signatures)  # integer ticks only
+        assert not any(str(signature[0].dtype) == "float32" for signature in _drain.signatures)
+
+    def test_cached(self):
+        """Test that the kernels are cached on disk."""
+        for kernel in [_siftforward, _popuntil, _partitioned_popuntil, _drain]:
+            assert kernel._cache.cache_path is not None
+
+    def test_thread_id_not_cached(self):
+        """Test that kernels calling nb.get_thread_id() are not cached (the cache is tied to the threading layer)."""
+        for kernel in [log_event, pool_uniform]:
+            assert isinstance(kernel._cache, NullCache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -31,6 +31,15 @@ Test Methods:
     - test_sort: Tests the sorting of agents based on a scalar property.
     - test_squash: Tests the squashing (filtering) of agents based on a
       condition.
+    - test_add_group_property: Tests the addition of an interleaved group of
+      properties stored in a single record array.
+    - test_add_group_property_partial_default: Tests that fields missing from
+      a dictionary of defaults default to 0.
+    - test_add_property_name_collision: Tests that adding a property with a name
+      already in use raises a ValueError.
+    - test_sort_group / test_squash_group: Tests that grouped properties are
+      sorted and squashed as one unit.
+    - test_preborns: Tests scheduling and activating preborn agents.
 
 Usage:
     Run this module with a Python interpreter to execute the unit tests.
@@ -216,6 +225,149 @@ class TestLaserFrame(unittest.TestCase):
         with pytest.raises(TypeError, match=re.escape("Indices must be a boolean array (got float32)")):
             pop.squash(keep.astype(np.float32), verbose=1)
 
+    def test_add_group_property(self):
+        pop = LaserFrame(1024)
+        pop.add_group_property("contact", {"node": np.uint16, "state": np.uint8, "itimer": np.float32}, default={"node": 7, "state": 1, "itimer": 0.5})
+        assert pop.contact.shape == (1024,)
+        assert pop.contact.dtype.itemsize == 7  # packed, no padding
+        assert np.all(pop.node == 7) and pop.node.dtype == np.uint16
+        assert np.all(pop.state == 1) and pop.state.dtype == np.uint8
+        assert np.all(pop.itimer == np.float32(0.5)) and pop.itimer.dtype == np.float32
+        pop.state[42] = 3  # field properties are views into the record array
+        assert pop.contact[42]["state"] == 3
+
+    def test_add_group_property_partial_default(self):
+        pop = LaserFrame(1024)
+        pop.add_group_property("contact", {"node": np.uint16, "state": np.uint8}, default={"state": 2})
+        assert np.all(pop.node == 0)
+        assert np.all(pop.state == 2)
+        with pytest.raises(ValueError, match=re.escape("Group property other has no field(s) ['age'] for the default values.")):
+            pop.add_group_property("other", {"timer": np.uint16}, default={"age": 1})
+
+    def test_add_group_property_bad_fields(self):
+        pop = LaserFrame(1024)
+        pop.add_scalar_property("age")
+        with pytest.raises(ValueError, match=re.escape("Group property field age conflicts with an existing attribute.")):
+            pop.add_group_property("group", [("node", np.uint16), ("age", np.uint16)])
+        with pytest.raises(ValueError, match=re.escape("Group property empty must have at least one field.")):
+            pop.add_group_property("empty", {})
+
+    def test_add_property_name_collision(self):
+        pop = LaserFrame(1024)
+        pop.add_scalar_property("age")
+        pop.add_group_property("contact", {"node": np.uint16, "state": np.uint8})
+        for name in ["age", "contact", "sort", "count"]:
+            with pytest.raises(ValueError, match=re.escape(f"Property {name} conflicts with an existing attribute.")):
+                pop.add_group_property(name, {"other": np.uint8})
+        for name in ["age", "contact", "node"]:
+            with pytest.raises(ValueError, match=re.escape(f"Property {name} conflicts with an existing attribute.")):
+                pop.add_scalar_property(name)
+            with pytest.raises(ValueError, match=re.escape(f"Property {name} conflicts with an existing attribute.")):
+                pop.add_vector_property(name, length=4)
+            with pytest.raises(ValueError, match=re.escape(f"Property {name} conflicts with an existing attribute.")):
+                pop.add_array_property(name, shape=(4, 4))
+        assert pop.node.base is not None  # group fields are still views into the record array
+
+    def test_sort_group(self):
+        pop = LaserFrame(1024, initial_count=100)
+        pop.add_scalar_property("age", default=0)
+        pop.add_group_property("contact", [("node", np.uint16), ("state", np.uint8)])
+        pop.age[: pop.count] = np.random.default_rng().integers(0, 100, 100)
+        pop.node[: pop.count] = np.arange(100)
+        pop.state[: pop.count] = np.arange(100) % 3
+        original_node = np.array(pop.node[: pop.count])
+        original_state = np.array(pop.state[: pop.count])
+        indices = np.argsort(pop.age[: pop.count])
+        pop.sort(indices, verbose=True)
+        assert np.all(pop.node[: pop.count] == original_node[indices])
+        assert np.all(pop.state[: pop.count] == original_state[indices])
+        assert np.shares_memory(pop.node, pop.contact)
+        assert np.shares_memory(pop.state, pop.contact)
+
+    def test_squash_group(self):
+        pop = LaserFrame(1024, initial_count=100)
+        pop.add_scalar_property("age", default=0)
+        pop.add_group_property("contact", [("node", np.uint16), ("state", np.uint8)])
+        pop.age[: pop.count] = np.random.default_rng().integers(0, 100, 100)
+        pop.node[: pop.count] = np.arange(100)
+        pop.state[: pop.count] = np.arange(100) % 3
+        original_node = np.array(pop.node[: pop.count])
+        original_state = np.array(pop.state[: pop.count])
+        keep = pop.age[: pop.count] >= 40
+        pop.squash(keep, verbose=True)
+        assert pop.count == keep.sum()
+        assert np.all(pop.node[: pop.count] == original_node[keep])
+        assert np.all(pop.state[: pop.count] == original_state[keep])
+
+    def test_preborns(self):
+        pop = LaserFrame(1024, initial_count=100)
+        pop.add_scalar_property("dob", dtype=np.int32, default=-1)
+        dobs = np.random.default_rng().integers(1, 365, pop.capacity - pop.count)
+        pop.dob[pop.count :] = dobs
+        pop.schedule_preborns(dobs)
+        assert pop.count == 100
+        assert np.all(np.diff(pop.dob[pop.count :]) >= 0)
+        for tick in range(365):
+            istart, iend = pop.activate(tick)
+            assert istart == 100 + np.sum(dobs < tick)
+            assert iend == 100 + np.sum(dobs <= tick)
+            assert np.all(pop.dob[istart:iend] == tick)
+        assert pop.count == pop.capacity
+
+    def test_preborns_vector_property(self):
+        pop = LaserFrame(6, initial_count=1)
+        pop.add_scalar_property("dob", dtype=np.int32)
+        pop.add_vector_property("v", length=2, dtype=np.int32)
+        dobs = np.array([4, 3, 2, 1, 0])
+        pop.dob[1:] = dobs
+        pop.v[0, 1:] = dobs
+        pop.v[1, 1:] = 10 * dobs
+        pop.schedule_preborns(dobs)
+        assert np.all(pop.dob == [0, 0, 1, 2, 3, 4])
+        assert np.all(pop.v[0] == pop.dob)  # vector properties stay aligned with the scalar properties
+        assert np.all(pop.v[1] == 10 * pop.dob)
+
+    def test_preborns_skipped_ticks(self):
+        pop = LaserFrame(1024, initial_count=0)
+        pop.add_scalar_property("dob", dtype=np.int32)
+        dobs = np.arange(pop.capacity)[::-1] // 4
+        pop.dob[:] = dobs
+        pop.schedule_preborns(dobs)
+        assert pop.activate(9) == (0, 40)  # activates everything due on or before tick 9
+        assert pop.activate(9) == (40, 40)
+        assert pop.activate(5000) == (40, 1024)
+
+    def test_preborns_squash_sort(self):
+        pop = LaserFrame(1024, initial_count=100)
+        pop.add_scalar_property("dob", dtype=np.int32)
+        pop.add_scalar_property("age", dtype=np.int32)
+        pop.age[: pop.count] = np.arange(pop.count)
+        dobs = np.random.default_rng().integers(1, 100, pop.capacity - pop.count)
+        pop.dob[pop.count :] = dobs
+        pop.schedule_preborns(dobs)
+        pop.activate(10)
+        pop.sort(np.arange(pop.count)[::-1].copy())
+        assert np.all(np.diff(pop.dob[pop.count :]) >= 0)  # sort() keeps the preborns
+        keep = np.zeros(pop.count, dtype=np.bool_)
+        keep[::2] = True
+        pop.squash(keep)
+        assert pop.count == keep.sum()
+        for tick in range(11, 100):
+            istart, iend = pop.activate(tick)
+            assert np.all(pop.dob[istart:iend] == tick)
+            assert iend - istart == np.sum(dobs == tick)
+
+    def test_preborns_sanity_checks(self):
+        pop = LaserFrame(1024, initial_count=100)
+        with pytest.raises(ValueError, match=re.escape("frame.activate() requires scheduled preborns (see schedule_preborns()).")):
+            pop.activate(0)
+        with pytest.raises(TypeError, match=re.escape("Activation ticks must have the same length as the inactive element count (924)")):
+            pop.schedule_preborns(np.zeros(1024, dtype=np.int32))
+        with pytest.raises(TypeError, match=re.escape("Activation ticks must be an integer array (got float32)")):
+            pop.schedule_preborns(np.zeros(924, dtype=np.float32))
+        with pytest.raises(ValueError, match=re.escape("Activation ticks must be non-negative.")):
+            pop.schedule_preborns(np.full(924, -1, dtype=np.int32))
+
     def test_init_bad_capacity1(self):
         capacity = "5150"
         with pytest.raises(ValueError, match=re.escape(f"Capacity must be a positive integer, got {capacity}.")):
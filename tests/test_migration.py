@@ -9,9 +9,14 @@ import pytest
 
 from laser_core.migration import competing_destinations
 from laser_core.migration import distance
+from laser_core.migration import distance_matrix
 from laser_core.migration import gravity
+from laser_core.migration import SpatialIndex
 from laser_core.migration import radiation
 from laser_core.migration import row_normalizer
+from laser_core.migration import sparse_gravity
+from laser_core.migration import sparse_matvec
+from laser_core.migration import sparse_row_normalizer
 from laser_core.migration import stouffer
 
 City = namedtuple("City", ["name", "pop", "lat", "long"])
@@ -99,6 +104,31 @@ class TestMigrationFunctions(unittest.TestCase):
 
         return
 
+    def test_gravity_model_out(self):
+        """Test the gravity model migration function with float32 and in-place output."""
+        (k, a, b, c) = (0.1, 0.5, 1.0, 2.0)
+        expected = gravity(self.pops, self.distances, k=k, a=a, b=b, c=c)
+        assert expected.dtype == np.float64
+
+        out = np.empty(self.distances.shape, dtype=np.float32)
+        assert gravity(self.pops, self.distances, k=k, a=a, b=b, c=c, out=out) is out
+        assert np.allclose(out, expected, rtol=1e-6)
+        network = gravity(self.pops, self.distances.astype(np.float32), k=k, a=a, b=b, c=c)
+        assert network.dtype == np.float64  # float32 distances (e.g., from calc_distances()) still give a float64 network
+        assert np.allclose(network, expected, rtol=1e-6)
+
+        distances = self.distances.copy()
+        network = gravity(self.pops, distances, k=k, a=a, b=b, c=c, out=distances)
+        assert network is distances
+        assert np.array_equal(network, expected)
+
+        with pytest.raises(TypeError, match="out must be a float32 or float64 array"):
+            gravity(self.pops, self.distances, k=k, a=a, b=b, c=c, out=np.empty(self.distances.shape, dtype=np.int64))
+        with pytest.raises(TypeError, match="out must have the same shape as distances"):
+            gravity(self.pops, self.distances, k=k, a=a, b=b, c=c, out=np.empty((3, 3)))
+
+        return
+
     def test_row_normalizer(self):
         """Test that the row normalizer function works"""
 
@@ -130,6 +160,21 @@ class TestMigrationFunctions(unittest.TestCase):
                 else:
                     assert network[i, j] == 0, f"network[{i}, {j}] = {network[i, j]}, expected 0"
 
+    def test_competing_destinations_out(self):
+        """Test the competing destinations migration function with float32 and in-place output."""
+        (k, a, b, c, delta) = (1.0, 0.5, 1.0, 1.5, -0.5)
+        expected = competing_destinations(self.pops, self.distances, k=k, a=a, b=b, c=c, delta=delta)
+        out = np.empty(self.distances.shape, dtype=np.float32)
+        assert competing_destinations(self.pops, self.distances, k=k, a=a, b=b, c=c, delta=delta, out=out) is out
+        assert np.allclose(out, expected, rtol=1e-6)
+        network = competing_destinations(self.pops, self.distances.astype(np.float32), k=k, a=a, b=b, c=c, delta=delta)
+        assert network.dtype == np.float64
+        assert np.allclose(network, expected, rtol=1e-5)
+        distances = self.distances.copy()
+        assert np.array_equal(competing_destinations(self.pops, distances, k=k, a=a, b=b, c=c, delta=delta, out=distances), expected)
+
+        return
+
     def test_stouffer_exclude_home(self):
         """Test the Stouffer migration function, excluding home."""
         (k, a, b, include_home) = (0.1, 0.5, 1.0, False)
@@ -236,6 +281,26 @@ class TestMigrationFunctions(unittest.TestCase):
                 else:
                     assert network[i, j] == 0, f"network[{i}, {j}] = {network[i, j]}, expected 0"
 
+    def test_intervening_opportunities_ties(self):
+        """Test the Stouffer and radiation models with many equidistant destinations against a direct calculation."""
+        rng = np.random.default_rng(20241009)
+        pops = rng.integers(1_000, 100_000, 40)
+        distances = np.triu(rng.integers(1, 5, (40, 40)), 1).astype(np.float64)
+        distances += distances.T
+        for include_home in (False, True):
+            stouffers = stouffer(pops, distances, k=0.1, a=0.5, b=1.5, include_home=include_home)
+            radiations = radiation(pops, distances, k=0.1, include_home=include_home)
+            for i in range(len(pops)):
+                for j in range(len(pops)):
+                    if i != j:
+                        closer = pops[(distances[i] <= distances[i, j]) & (include_home | (np.arange(len(pops)) != i))].sum()
+                        assert np.isclose(stouffers[i, j], 0.1 * pops[i] ** 0.5 * (pops[j] / closer) ** 1.5)
+                        expected = 0.1 * pops[i] * pops[j] / ((pops[i] + closer) * (pops[i] + pops[j] + closer))
+                        assert np.isclose(radiations[i, j], expected)
+            assert np.all(stouffers.diagonal() == 0) and np.all(radiations.diagonal() == 0)
+
+        return
+
     def test_distance_one_degree_longitude(self):
         """Test the distance function for one degree of longitude."""
         assert np.isclose(
@@ -737,5 +802,202 @@ class TestMigrationFunctionSanityChecks(unittest.TestCase):
         return
 
 
+class TestSparseMigration(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        rng = np.random.default_rng(20241009)
+        cls.pops = rng.integers(1_000, 1_000_000, 200)
+        cls.lats = rng.uniform(-60, 60, 200)
+        cls.lons = rng.uniform(-180, 180, 200)
+        cls.distances = distance(cls.lats, cls.lons, cls.lats, cls.lons)
+        cls.distances = (cls.distances + cls.distances.T) / 2  # exactly symmetric for gravity()
+
+        return
+
+    @staticmethod
+    def densify(indptr, indices, data):
+        network = np.zeros((len(indptr) - 1, len(indptr) - 1))
+        for i in range(len(indptr) - 1):
+            assert np.all(np.diff(indices[indptr[i] : indptr[i + 1]]) > 0), f"row {i} indices are not sorted"
+            network[i, indices[indptr[i] : indptr[i + 1]]] = data[indptr[i] : indptr[i + 1]]
+
+        return network
+
+    def test_sparse_gravity_cutoff(self):
+        """Test that the sparse gravity model matches the dense gravity model within the distance cutoff."""
+        (k, a, b, c) = (0.1, 0.5, 1.0, 2.0)
+        expected = gravity(self.pops, self.distances, k=k, a=a, b=b, c=c)
+        network = self.densify(*sparse_gravity(self.pops, self.lats, self.lons, k=k, a=a, b=b, c=c, max_distance=2_000.0))
+        keep = (self.distances <= 2_000.0) & ~np.eye(len(self.pops), dtype=bool)
+        assert 0 < keep.sum() < keep.size // 4
+        assert np.allclose(network[keep], expected[keep])
+        assert np.all(network[~keep] == 0)
+
+        return
+
+    def test_sparse_gravity_top_k(self):
+        """Test that the sparse gravity model keeps the top_k nearest destinations (within the cutoff, if given)."""
+        (k, a, b, c) = (0.1, 0.5, 1.0, 2.0)
+        expected = gravity(self.pops, self.distances, k=k, a=a, b=b, c=c)
+        indptr, indices, data = sparse_gravity(self.pops, self.lats, self.lons, k=k, a=a, b=b, c=c, top_k=8)
+        assert np.all(np.diff(indptr) == 8)
+        network = self.densify(indptr, indices, data)
+        for i in range(len(self.pops)):
+            others = self.distances[i].copy()
+            others[i] = np.inf
+            nearest = np.argsort(others, kind="stable")[:8]
+            assert np.allclose(network[i, nearest], expected[i, nearest])
+            assert np.count_nonzero(network[i]) == 8
+
+        indptr, indices, data = sparse_gravity(self.pops, self.lats, self.lons, k=k, a=a, b=b, c=c, max_distance=1_000.0, top_k=8)
+        network = self.densify(indptr, indices, data)
+        for i in range(len(self.pops)):
+            within = np.count_nonzero((self.distances[i] <= 1_000.0) & (np.arange(len(self.pops)) != i))
+            assert indptr[i + 1] - indptr[i] == min(within, 8)
+            assert np.all(self.distances[i, indices[indptr[i] : indptr[i + 1]]] <= 1_000.0)
+
+        return
+
+    def test_sparse_row_normalizer_matvec(self):
+        """Test the sparse row normalizer and matrix-vector product against their dense equivalents."""
+        csr = sparse_gravity(self.pops, self.lats, self.lons, k=1e-9, a=1.0, b=1.0, c=2.0, max_distance=3_000.0)
+        network = self.densify(*csr)
+        indptr, indices, data = csr
+        sparse_row_normalizer(indptr, data, 0.1)
+        expected = row_normalizer(network, 0.1)
+        assert np.allclose(self.densify(indptr, indices, data), expected)
+        x = np.random.default_rng(42).random(len(self.pops))
+        assert np.allclose(sparse_matvec(indptr, indices, data, x), expected @ x)
+        out = np.empty(len(self.pops), dtype=np.float32)
+        assert sparse_matvec(indptr, indices, data, x, out=out) is out
+
+        with pytest.raises(ValueError, match="indices must be valid indices into x"):
+            sparse_matvec(indptr, indices, data, x[:-1])
+        with pytest.raises(ValueError, match="indptr must start at 0 and be non-decreasing"):
+            sparse_matvec(indptr[::-1].copy(), indices, data, x)
+        with pytest.raises(TypeError, match="data must be a floating point array"):
+            sparse_row_normalizer(indptr, np.ones(len(data), dtype=np.int64), 0.1)
+
+        return
+
+    def test_distance_matrix(self):
+        """Test the symmetric, condensed, float32, and rectangular distance matrices against distance()."""
+        expected = distance(self.lats, self.lons, self.lats, self.lons)
+        distances = distance_matrix(self.lats, self.lons)
+        assert distances.dtype == np.float64
+        assert np.allclose(distances, expected, rtol=0, atol=1e-6)
+        assert np.array_equal(distances, distances.T)
+        assert np.all(distances.diagonal() == 0)
+
+        assert np.allclose(distance_matrix(self.lats, self.lons, dtype=np.float32), expected, rtol=1e-6)
+        condensed = distance_matrix(self.lats, self.lons, condensed=True)
+        n = len(self.lats)
+        assert condensed.shape == (n * (n - 1) // 2,)
+        assert np.array_equal(condensed, distances[np.triu_indices(n, 1)])
+        i, j = 17, 123
+        assert condensed[n * i - i * (i + 1) // 2 + j - i - 1] == distances[i, j]
+
+        assert np.allclose(distance_matrix(self.lats, self.lons, self.lats[:7], self.lons[:7]), expected[:, :7], rtol=0, atol=1e-6)
+
+        with pytest.raises(ValueError, match="condensed distances require a single set of points"):
+            distance_matrix(self.lats, self.lons, self.lats, self.lons, condensed=True)
+        with pytest.raises(TypeError, match="dtype must be np.float32 or np.float64"):
+            distance_matrix(self.lats, self.lons, dtype=np.int32)
+
+        return
+
+    def test_sparse_gravity_sanity(self):
+        """Test the sparse gravity model argument checks."""
+        with pytest.raises(ValueError, match="one of max_distance or top_k is required"):
+            sparse_gravity(self.pops, self.lats, self.lons, k=1.0, a=1.0, b=1.0, c=1.0)
+        with pytest.raises(ValueError, match="top_k must be a positive integer"):
+            sparse_gravity(self.pops, self.lats, self.lons, k=1.0, a=1.0, b=1.0, c=1.0, top_k=0)
+        with pytest.raises(TypeError, match="latitudes must have shape"):
+            sparse_gravity(self.pops, self.lats[:-1], self.lons, k=1.0, a=1.0, b=1.0, c=1.0, top_k=1)
+        with pytest.raises(ValueError, match=re.escape("longitudes must be in the range [-180, 180]")):
+            sparse_gravity(self.pops, self.lats, self.lons + 360, k=1.0, a=1.0, b=1.0, c=1.0, top_k=1)
+
+        return
+
+
+class TestSpatialIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        rng = np.random.default_rng(20241009)
+        cls.lats = rng.uniform(-90, 90, 1_000)
+        cls.lons = rng.uniform(-180, 180, 1_000)
+        cls.lats[:300] = np.round(cls.lats[:300] / 10) * 10  # duplicate locations, equidistant points
+        cls.lons[:300] = np.round(cls.lons[:300] / 10) * 10
+        cls.lats[:2] = (90, -90)  # poles
+        cls.lons[2:4] = (180, -180)  # antimeridian
+        cls.index = SpatialIndex(cls.lats, cls.lons, leaf_size=8)
+        cls.query_lats = np.concatenate((rng.uniform(-90, 90, 100), cls.lats[:20]))
+        cls.query_lons = np.concatenate((rng.uniform(-180, 180, 100), cls.lons[:20]))
+        cls.distances = distance_matrix(cls.query_lats, cls.query_lons, cls.lats, cls.lons)
+
+        return
+
+    def test_query_radius(self):
+        """Test radius queries against all pairwise distances."""
+        for radius in (0.0, 500.0, 3_000.0):
+            indptr, indices, distances = self.index.query_radius(self.query_lats, self.query_lons, radius)
+            assert len(indptr) == len(self.query_lats) + 1
+            for q in range(len(self.query_lats)):
+                expected = np.nonzero(self.distances[q] <= radius)[0]
+                assert np.array_equal(indices[indptr[q] : indptr[q + 1]], expected), f"{radius=}, {q=}"
+                assert np.array_equal(distances[indptr[q] : indptr[q + 1]], self.distances[q, expected])
+
+        return
+
+    def test_query_nearest(self):
+        """Test k-nearest neighbor queries against all pairwise distances, nearest first with ties to the lower index."""
+        for k in (1, 7, 50):
+            indptr, indices, distances = self.index.query_nearest(self.query_lats, self.query_lons, k)
+            assert np.all(np.diff(indptr) == k)
+            for q in range(len(self.query_lats)):
+                expected = np.lexsort((np.arange(len(self.lats)), self.distances[q]))[:k]
+                assert np.array_equal(indices[indptr[q] : indptr[q + 1]], expected), f"{k=}, {q=}"
+                assert np.array_equal(distances[indptr[q] : indptr[q + 1]], self.distances[q, expected])
+
+        return
+
+    def test_exclude(self):
+        """Test querying the indexed points without themselves."""
+        exclude = np.arange(len(self.lats))
+        indptr, indices, _ = self.index.query_nearest(self.lats, self.lons, 3, exclude=exclude)
+        assert np.all(indices[indptr[:-1]] != exclude)
+        indptr, indices, _ = self.index.query_radius(self.lats, self.lons, 0.0, exclude=exclude)
+        assert np.all(np.repeat(exclude, np.diff(indptr)) != indices)
+        assert indptr[-1] > 0  # duplicate locations
+
+        return
+
+    def test_small(self):
+        """Test indices with fewer points than a leaf and than k."""
+        index = SpatialIndex(np.array([10.0]), np.array([20.0]))
+        assert len(index) == 1
+        indptr, indices, distances = index.query_nearest(np.array([0.0, 10.0]), np.array([0.0, 20.0]), 5)
+        assert np.array_equal(indptr, [0, 1, 2]) and np.array_equal(indices, [0, 0]) and distances[1] == 0
+        indptr, indices, _ = index.query_nearest(np.array([10.0]), np.array([20.0]), 5, exclude=np.array([0]))
+        assert np.array_equal(indptr, [0, 0]) and len(indices) == 0
+
+        return
+
+    def test_sanity(self):
+        """Test the spatial index argument checks."""
+        with pytest.raises(ValueError, match="latitudes and longitudes must not be empty"):
+            SpatialIndex(np.array([]), np.array([]))
+        with pytest.raises(ValueError, match="leaf_size must be a positive integer"):
+            SpatialIndex(self.lats, self.lons, leaf_size=0)
+        with pytest.raises(ValueError, match="k must be a positive integer"):
+            self.index.query_nearest(self.lats, self.lons, 0)
+        with pytest.raises(ValueError, match="radius must be a non-negative value"):
+            self.index.query_radius(self.lats, self.lons, -1.0)
+        with pytest.raises(TypeError, match="exclude must have one element per query point"):
+            self.index.query_radius(self.lats, self.lons, 1.0, exclude=np.arange(3))
+
+        return
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,414 @@
+"""Tests for the counter-based and parallel random number functions in laser_core.random."""
+
+import unittest
+from typing import ClassVar
+
+import numba as nb
+import numpy as np
+import pytest
+
+import laser_core.random as random
+from laser_core.random import philox4x32
+from laser_core.random import philox_uniform
+from laser_core.random import pool_uniform
+
+
+@nb.njit(parallel=True)
+def parallel_uniforms(key0, key1, tick, out):  # pragma: no cover
+    for i in nb.prange(len(out)):
+        out[i] = philox_uniform(key0, key1, i, tick, 0)
+
+    return
+
+
+@nb.njit(parallel=True)
+def numba_draws(out):  # pragma: no cover
+    for i in nb.prange(len(out)):
+        out[i] = np.random.random()
+
+    return
+
+
+@nb.njit
+def pool_draws(values, state, out):  # pragma: no cover
+    for i in range(len(out)):
+        out[i] = pool_uniform(values, state)
+
+    return
+
+
+@nb.njit(parallel=True)
+def parallel_pool_draws(values, state, out):  # pragma: no cover
+    for i in nb.prange(len(out)):
+        out[i] = pool_uniform(values, state)
+
+    return
+
+
+@nb.njit
+def serial_uniforms(key0, key1, tick, out):  # pragma: no cover
+    for i in range(len(out) - 1, -1, -1):
+        out[i] = philox_uniform(key0, key1, i, tick, 0)
+
+    return
+
+
+class TestPhilox(unittest.TestCase):
+    def test_known_answers(self):
+        """Test Philox4x32-10 against the Random123 known answer vectors."""
+        assert philox4x32(0, 0, 0, 0, 0, 0) == (0x6627E8D5, 0xE169C58D, 0xBC57AC4C, 0x9B00DBD8)
+        ones = 0xFFFFFFFF
+        assert philox4x32(ones, ones, ones, ones, ones, ones) == (0x408F276D, 0x41C83B0E, 0xA20BC7C6, 0x6D5451FD)
+        assert philox4x32(0x243F6A88, 0x85A308D3, 0x13198A2E, 0x03707344, 0xA4093822, 0x299F31D0) == (
+            0xD16CFE09,
+            0x94FDCCEB,
+            0x5001E420,
+            0x24126EA1,
+        )
+
+    def test_key(self):
+        """Test that key() combines the seed and the stream."""
+        random.seed(20241009)
+        assert random.key() == (20241009, 0)
+        assert random.key(stream=42) == (20241009, 42)
+
+    def test_thread_independent(self):
+        """Test that parallel draws match serial draws made in a different order."""
+        random.seed(20241009)
+        key0, key1 = random.key(stream=1)
+        parallel = np.empty(1 << 16, dtype=np.float64)
+        serial = np.empty_like(parallel)
+        parallel_uniforms(key0, key1, 7, parallel)
+        serial_uniforms(key0, key1, 7, serial)
+        assert np.array_equal(parallel, serial)
+        assert np.all((parallel >= 0.0) & (parallel < 1.0))
+        assert abs(parallel.mean() - 0.5) < 0.01
+
+        other = np.empty_like(parallel)
+        parallel_uniforms(key0, key1, 8, other)  # different tick
+        assert not np.any(other == parallel)
+        parallel_uniforms(key0, np.uint32(2), 7, other)  # different stream
+        assert not np.any(other == parallel)
+
+
+class TestStreams(unittest.TestCase):
+    def test_stream(self):
+        """Test that named streams are unaffected by draws from the global prng or other streams."""
+        random.seed(20241009)
+        infections = random.stream("infections").random(16)
+        random.seed(20241009)
+        _ = random.prng().random(100)  # e.g., a new draw in another component
+        _ = random.stream("births").random(100)
+        assert random.stream("infections") is random.stream("infections")
+        assert np.array_equal(random.stream("infections").random(16), infections)
+        assert not np.array_equal(random.stream("births").random(16), infections)
+        random.seed(20241010)
+        assert not np.array_equal(random.stream("infections").random(16), infections)
+
+    def test_named_key(self):
+        """Test that named Numba keys depend on the seed and name only."""
+        random.seed(20241009)
+        key = random.key("infections")
+        assert all(isinstance(k, np.uint32) for k in key)
+        _ = random.stream("infections").random(100)
+        assert random.key("infections") == key
+        assert random.key("births") != key
+        random.seed(20241010)
+        assert random.key("infections") != key
+
+
+class TestFill(unittest.TestCase):
+    messages: ClassVar = []
+
+    # Called once after all tests
+    @classmethod
+    def tearDownClass(cls):
+        print()
+        for message in cls.messages:
+            print(message)
+
+    def test_uniform(self):
+        """Test parallel uniform fills for float32 and float64 arrays."""
+        for dtype in [np.float32, np.float64]:
+            random.seed(20241009)
+            first = random.uniform(np.empty(100_001, dtype=dtype), 2.0, 5.0)
+            second = random.uniform(np.empty(100_001, dtype=dtype), 2.0, 5.0)
+            assert np.all((first >= 2.0) & (first <= 5.0))
+            assert abs(first.mean() - 3.5) < 0.02
+            assert not np.array_equal(first, second)  # successive fills use new counters
+            random.seed(20241009)
+            assert np.array_equal(random.uniform(np.empty(100_001, dtype=dtype), 2.0, 5.0), first)
+            assert not np.array_equal(random.uniform(np.empty(100_001, dtype=dtype), 2.0, 5.0, stream="other"), second)
+
+    def test_integers(self):
+        """Test parallel integer fills."""
+        random.seed(20241009)
+        for dtype in [np.uint8, np.int32, np.int64, np.uint64]:
+            out = random.integers(np.empty((100, 1000), dtype=dtype), 1, 11)
+            assert out.shape == (100, 1000)
+            counts = np.bincount(out.ravel().astype(np.int64), minlength=11)
+            assert counts[0] == 0
+            assert np.all(np.abs(counts[1:] - 10_000) < 500)
+
+        with pytest.raises(ValueError):
+            random.integers(np.empty(10, dtype=np.int32), 5, 5)
+        with pytest.raises(ValueError, match="does not fit in the output dtype uint8"):
+            random.integers(np.empty(5, dtype=np.uint8), 0, 1000)
+        with pytest.raises(ValueError, match="does not fit in the output dtype uint32"):
+            random.integers(np.empty(5, dtype=np.uint32), -1, 10)
+        assert np.all(random.integers(np.empty(1000, dtype=np.uint8), 0, 256) <= 255)  # high is exclusive
+        with pytest.raises(TypeError):
+            random.integers(np.empty(10, dtype=np.float32), 0, 5)
+
+    def test_normal(self):
+        """Test parallel normal fills for float32 and float64 arrays."""
+        random.seed(20241009)
+        for dtype in [np.float32, np.float64]:
+            out = random.normal(np.empty(1_000_001, dtype=dtype), 1.0, 2.0)
+            assert np.all(np.isfinite(out))
+            assert abs(out.mean() - 1.0) < 0.01
+            assert abs(out.std() - 2.0) < 0.01
+
+        with pytest.raises(TypeError):
+            random.normal(np.empty(10, dtype=np.int32))
+        with pytest.raises(ValueError):
+            random.normal(np.empty((10, 10))[:, ::2])
+
+    def test_uniform_timing(self):
+        """Compare the timing of parallel uniform fills with prng().random()."""
+        import timeit
+
+        random.seed(20241009)
+        count = 1 << 24
+        for dtype in [np.float32, np.float64]:
+            out = np.empty(count, dtype=dtype)
+            elapsed = timeit.timeit("random.uniform(out)", globals={"random": random, "out": out}, number=1)
+            self.messages.append(
+                f"random.uniform({np.dtype(dtype).name}) timing: {elapsed:0.4f} seconds for {count:11,} values = {int(round(count / elapsed)):13,} values/second"
+            )
+        elapsed = timeit.timeit("prng.random(out=out)", globals={"prng": random.prng(), "out": out}, number=1)
+        self.messages.append(
+            f"prng().random() timing:       {elapsed:0.4f} seconds for {count:11,} values = {int(round(count / elapsed)):13,} values/second"
+        )
+
+
+class TestSamplers(unittest.TestCase):
+    def test_bernoulli(self):
+        """Test per-agent Bernoulli draws into a preallocated mask."""
+        random.seed(20241009)
+        p = np.linspace(0.0, 1.0, 100_000, dtype=np.float32)
+        mask = np.empty(len(p), dtype=np.bool_)
+        assert random.bernoulli(p, out=mask) is mask
+        assert not mask[0]
+        assert mask[-1]
+        assert abs(mask.mean() - 0.5) < 0.01
+        assert abs(mask[p < 0.2].mean() - 0.1) < 0.01
+        assert abs(random.bernoulli(0.25, out=np.empty(100_000, dtype=np.uint8)).mean() - 0.25) < 0.01
+        random.seed(20241009)
+        assert np.array_equal(random.bernoulli(p), mask)
+
+    def test_binomial(self):
+        """Test per-node binomial draws for small (inversion) and large (BTRD) means."""
+        random.seed(20241009)
+        for n, p in [(20, 0.1), (50, 0.5), (1000, 0.3), (1000, 0.9), (1_000_000, 0.01)]:
+            draws = random.binomial(np.full(100_000, n, dtype=np.uint32), p)
+            assert draws.dtype == np.int64
+            assert np.all((draws >= 0) & (draws <= n))
+            assert abs(draws.mean() - n * p) < 0.02 * n * p
+            assert abs(draws.var() - n * p * (1 - p)) < 0.05 * n * p * (1 - p)
+        nodes = np.array([0, 10, 100, 1000])
+        out = np.empty(4, dtype=np.int32)
+        random.binomial(nodes, np.array([0.5, 0.0, 1.0, 0.5]), out=out)
+        assert out[0] == 0
+        assert out[1] == 0
+        assert out[2] == 100
+        assert 400 < out[3] < 600
+
+    def test_poisson(self):
+        """Test per-node Poisson draws for small (multiplication) and large (PTRS) rates."""
+        random.seed(20241009)
+        for lam in [0.5, 3.0, 9.9, 10.0, 50.0, 1000.0]:
+            draws = random.poisson(np.full(100_000, lam))
+            assert abs(draws.mean() - lam) < 0.02 * lam
+            assert abs(draws.var() - lam) < 0.05 * lam
+        assert np.all(random.poisson(0.0, out=np.empty(10, dtype=np.uint16)) == 0)
+
+    def test_multinomial(self):
+        """Test row-wise multinomial draws."""
+        random.seed(20241009)
+        pvals = np.array([0.2, 0.3, 0.0, 0.5])
+        out = random.multinomial(np.full(100_000, 100), pvals)
+        assert out.shape == (100_000, 4)
+        assert np.all(out.sum(axis=1) == 100)
+        assert np.all(out[:, 2] == 0)
+        assert np.allclose(out.mean(axis=0), 100 * pvals, rtol=0.01)
+        pvals = np.random.dirichlet(np.ones(5), 8)
+        n = np.array([0, 1, 10, 100, 1000, 10_000, 100_000, 1_000_000])
+        out = np.empty((8, 5), dtype=np.uint32)
+        random.multinomial(n, pvals, out=out)
+        assert np.all(out.sum(axis=1) == n)
+
+        with pytest.raises(ValueError):
+            random.multinomial(n, pvals, out=np.empty((8, 4), dtype=np.int64))
+        with pytest.raises(ValueError, match="Probabilities must have 1 or 5 rows"):
+            random.multinomial(np.arange(5), np.full((2, 2), 0.5))
+        with pytest.raises(ValueError, match="non-negative"):
+            random.multinomial(10, np.array([1.2, -0.2]), out=np.empty((1, 2), dtype=np.int64))
+        with pytest.raises(ValueError, match="sum to 1"):
+            random.multinomial(10, np.array([0.2, 0.3]), out=np.empty((1, 2), dtype=np.int64))
+
+    def test_parameter_length(self):
+        """Test that parameter arrays must be scalar or one per element."""
+        with pytest.raises(ValueError):
+            random.bernoulli(np.full(10, 0.5), out=np.empty(20, dtype=np.bool_))
+        with pytest.raises(ValueError, match="Output array is required"):
+            random.bernoulli(0.5)
+        with pytest.raises(ValueError, match="Output array is required"):
+            random.poisson(2.0)
+
+
+class TestPool(unittest.TestCase):
+    messages: ClassVar = []
+
+    @classmethod
+    def tearDownClass(cls):
+        print()
+        for message in cls.messages:
+            print(message)
+
+    def test_pool_uniform(self):
+        """Test that pool values are the same whether they come from the buffer or are computed when the buffer is not yet refilled."""
+        random.seed(20241009)
+        pool = random.RandomPool(size=1024, nthreads=1)
+        expected = np.empty(10_000)
+        pool_draws(*pool.buffers, expected)  # one initial fill, computes the rest
+        assert 0.0 <= expected.min() and expected.max() < 1.0
+        assert abs(expected.mean() - 0.5) < 0.01
+        assert len(np.unique(expected)) == len(expected)
+
+        random.seed(20241009)
+        pool = random.RandomPool(size=1024, nthreads=1)
+        actual = np.empty(10_000)
+        for start in range(0, len(actual), 100):
+            pool_draws(*pool.buffers, actual[start : start + 100])
+            pool.refill()
+        assert np.array_equal(actual, expected)
+
+        random.seed(20241009)
+        pool = random.RandomPool(size=1024, nthreads=1)
+        pool.start()
+        for start in range(0, len(actual), 100):
+            pool_draws(*pool.buffers, actual[start : start + 100])
+        pool.stop()
+        assert np.array_equal(actual, expected)
+
+    def test_refill(self):
+        """Test that refill() only refills exhausted halves."""
+        pool = random.RandomPool(size=8, nthreads=2)
+        assert pool.refill() == 0
+        pool_draws(*pool.buffers, np.empty(5))  # main thread uses buffer 0
+        assert pool.refill() == 1
+        pool_draws(*pool.buffers, np.empty(3))
+        assert pool.refill() == 1
+        assert pool.refill() == 0
+
+    def test_refill_outrun(self):
+        """Test that halves used (and computed) before being refilled are refilled with the values the kernel uses next."""
+        pool = random.RandomPool(size=8, nthreads=1)
+        expected = np.empty(64)
+        pool_draws(*random.RandomPool(size=8, nthreads=1).buffers, expected)  # no refills, computes all but the first 8
+        actual = np.empty(64)
+        pool_draws(*pool.buffers, actual[:16])  # outruns the refill by a generation
+        assert pool.refill() == 2
+        for start in range(16, len(actual), 4):
+            pool_draws(*pool.buffers, actual[start : start + 4])
+            assert pool.refill() == 1  # keeps refilling each half as it is used
+        assert np.array_equal(actual, expected)
+
+    def test_pool_size(self):
+        """Test that the pool size must be a power of 2."""
+        with pytest.raises(ValueError):
+            random.RandomPool(size=1000)
+        with pytest.raises(ValueError):
+            random.RandomPool(size=1)
+        with pytest.raises(ValueError):
+            random.RandomPool(nthreads=0)
+
+    def test_pool_timing(self):
+        """Time drawing from a RandomPool vs. Numba's np.random.random()."""
+        import time
+
+        out = np.empty(1 << 22)
+        pool = random.RandomPool(size=1 << 16)
+        pool.start()
+        parallel_pool_draws(*pool.buffers, out[:16])
+        numba_draws(out[:16])
+        start = time.perf_counter()
+        parallel_pool_draws(*pool.buffers, out)
+        elapsed = time.perf_counter() - start
+        pool.stop()
+        self.messages.append(f"RandomPool: {len(out):,} values in {elapsed:0.3f} seconds ({len(out) / elapsed:,.0f} values/second)")
+        start = time.perf_counter()
+        numba_draws(out)
+        elapsed = time.perf_counter() - start
+        self.messages.append(f"np.random.random() in Numba: {len(out):,} values in {elapsed:0.3f} seconds ({len(out) / elapsed:,.0f} values/second)")
+
+
+class TestState(unittest.TestCase):
+    def draws(self):
+        numba = np.empty(1024, dtype=np.float64)
+        numba_draws(numba)
+        return (
+            random.prng().random(8),
+            np.random.random(8),
+            random.stream("infections").integers(0, 100, 8),
+            random.uniform(np.empty(8)),
+            numba,
+            np.array([np.random.randint(0, 1000) for _ in range(8)]),
+        )
+
+    def test_get_set_state(self):
+        """Test that restoring a saved state continues every random stream bit-for-bit."""
+        import pickle
+
+        random.seed(20241009)
+        _ = self.draws()
+        state = pickle.loads(pickle.dumps(random.get_state()))  # e.g., via a checkpoint file
+        expected = self.draws()
+        random.seed(20241010)
+        _ = self.draws()
+        random.set_state(state)
+        assert random.get_seed() == 20241009
+        for actual, draws in zip(self.draws(), expected):
+            assert np.array_equal(actual, draws)
+
+    def test_set_state_threads(self):
+        """Test that restoring a state saved with a different number of Numba threads raises a ValueError."""
+        state = random.get_state()
+        state["numba"]["threads"] = np.zeros((len(state["numba"]["threads"]) + 1, 8), dtype=np.uint8)
+        with pytest.raises(ValueError):
+            random.set_state(state)
+
+    def test_state_layout(self):
+        """Test that an unexpected Numba random state layout fails in get_state()/set_state() (not on import)."""
+        from unittest import mock
+
+        state = random.get_state()
+        with mock.patch.object(random, "_NB_STATE_SIZE", 2512):
+            with pytest.raises(RuntimeError, match="not supported with Numba"):
+                random.get_state()
+            with pytest.raises(RuntimeError, match="not supported with Numba"):
+                random.set_state(state)
+            assert 0.0 <= random.prng().random() < 1.0  # the rest of the module still works
+
+    def test_set_state_captured(self):
+        """Test that every Numba thread state is captured and that a state missing one raises a RuntimeError."""
+        state = random.get_state()
+        assert np.all(state["numba"]["captured"])
+        state["numba"]["captured"][-1] = False
+        with pytest.raises(RuntimeError):
+            random.set_state(state)
+
+
+if __name__ == "__main__":
+    unittest.main()
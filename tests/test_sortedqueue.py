@@ -3,9 +3,11 @@
 import unittest
 from typing import ClassVar
 
+import numba as nb
 import numpy as np
 import pytest
 
+from laser_core import PartitionedSortedQueue
 from laser_core import SortedQueue
 
 
@@ -131,6 +133,281 @@ class TestSortedQueue(unittest.TestCase):
             f"SortedQueue.popv() timing: {elapsed:0.4f} seconds for {count:9,} elements = {int(round(count / elapsed)):11,} elements/second"
         )
 
+    def test_push_many(self):
+        """Test pushing multiple elements at once, both into an empty and a non-empty sorted queue."""
+        values = np.random.randint(0, 100, 1024, dtype=np.int32)
+        self.sq = SortedQueue(len(values), values)
+        self.sq.push_many(np.arange(100))  # heapify
+        self.sq.push(100)
+        self.sq.push_many(np.arange(101, 150))  # sift forward
+        self.sq.push_many(np.arange(150, len(values)))  # heapify
+        assert len(self.sq) == len(values)
+        popped = np.array([self.sq.popv() for _ in range(len(values))])
+        assert np.all(popped == np.sort(values))
+
+    def test_push_many_full(self):
+        """Test pushing more elements than the sorted queue can hold. Should raise an IndexError."""
+        with pytest.raises(IndexError):
+            self.sq.push_many(np.arange(8))
+
+    def test_from_indices(self):
+        """Test creating a sorted queue from existing indices."""
+        values = np.random.randint(0, 100, 1024, dtype=np.int32)
+        indices = np.random.permutation(len(values))[:512]
+        self.sq = SortedQueue.from_indices(values, indices, capacity=len(values))
+        assert len(self.sq) == 512
+        assert len(self.sq.indices) == len(values)
+        popped = np.array([self.sq.popv() for _ in range(512)])
+        assert np.all(popped == np.sort(values[indices]))
+
+        with pytest.raises(IndexError):
+            SortedQueue.from_indices(values, indices, capacity=256)
+
+    def test_from_indices_timing(self):
+        """Test the timing of from_indices() (O(n) heapify)."""
+        import timeit
+
+        np.random.seed(20240701)
+        count = 1 << 20
+        values = np.random.randint(0, 100, count, dtype=np.int32)
+        indices = np.arange(count, dtype=np.uint32)
+        SortedQueue.from_indices(values, indices[:8])  # compile
+        elapsed = timeit.timeit("SortedQueue.from_indices(values, indices)", globals={"SortedQueue": SortedQueue, "values": values, "indices": indices}, number=1)
+        self.messages.append(
+            f"SortedQueue.from_indices() timing: {elapsed:0.4f} seconds for {count:9,} elements = {int(round(count / elapsed)):11,} elements/second"
+        )
+
+    def test_pop_until(self):
+        """Test draining all elements with values <= a threshold."""
+        values = np.random.randint(0, 100, 4096, dtype=np.int32)
+        self.sq = SortedQueue.from_indices(values, np.arange(len(values)))
+        for tick in range(100):
+            due = self.sq.pop_until(tick)
+            assert due.dtype == np.uint32
+            assert np.all(values[due] == tick)
+            assert np.all(np.sort(due) == np.nonzero(values == tick)[0])
+        assert len(self.sq) == 0
+        assert len(self.sq.pop_until(100)) == 0
+
+    def test_pop_until_out(self):
+        """Test draining into a caller provided output array."""
+        self.sq.push_many(np.arange(7))
+        out = np.zeros(3, dtype=np.uint32)
+        due = self.sq.pop_until(53, out=out)
+        assert np.shares_memory(due, out)
+        assert np.all(due == [3, 0, 1])  # 26, 31, 41 - limited to len(out)
+        due = self.sq.pop_until(53, out=out)
+        assert np.all(due == [4])
+        assert len(self.sq) == 3
+        assert self.sq.peekv() == 58
+
+    def test_pop_until_timing(self):
+        """Test the timing of the pop_until method."""
+        import timeit
+
+        np.random.seed(20240701)
+        count = 1 << 20
+        values = np.random.randint(0, 100, count, dtype=np.int32)
+        self.sq = SortedQueue.from_indices(values, np.arange(count))
+        elapsed = timeit.timeit("for tick in range(100): self.sq.pop_until(tick)", globals={"self": self}, number=1)
+        self.messages.append(
+            f"SortedQueue.pop_until() timing: {elapsed:0.4f} seconds for {count:9,} elements = {int(round(count / elapsed)):11,} elements/second"
+        )
+
+    def test_remove(self):
+        """Test removing arbitrary elements from a sorted queue tracking positions."""
+        values = np.random.randint(0, 100, 1024, dtype=np.int32)
+        self.sq = SortedQueue.from_indices(values, np.arange(len(values)), track_positions=True)
+        removed = np.random.choice(len(values), 256, replace=False)
+        for index in removed:
+            assert index in self.sq
+            self.sq.remove(index)
+            assert index not in self.sq
+        assert len(self.sq) == len(values) - len(removed)
+        remaining = np.setdiff1d(np.arange(len(values)), removed)
+        popped = np.array([self.sq.popi() for _ in range(len(remaining))])
+        assert np.all(np.sort(popped) == remaining)
+        assert np.all(np.diff(values[popped]) >= 0)
+        assert np.all(self.sq.positions == 0xFFFFFFFF)
+
+        with pytest.raises(IndexError):
+            self.sq.remove(0)  # not in the queue
+
+    def test_update(self):
+        """Test re-keying arbitrary elements of a sorted queue tracking positions."""
+        values = np.random.randint(0, 100, 1024, dtype=np.int32)
+        self.sq = SortedQueue(len(values), values, track_positions=True)
+        self.sq.push_many(np.arange(512))
+        for i in range(512, len(values)):
+            self.sq.push(i)
+        for index in np.random.choice(len(values), 256, replace=False):
+            values[index] = np.random.randint(-100, 200)
+            self.sq.update(index)
+        _ = self.sq.pop_until(50)
+        for index in self.sq.indices[: len(self.sq)]:
+            assert self.sq.positions[index] < len(self.sq)
+            assert self.sq.indices[self.sq.positions[index]] == index
+        popped = np.array([self.sq.popv() for _ in range(len(self.sq) // 2)])
+        assert np.all(np.diff(popped) >= 0)
+        _ = self.sq.pop_until(1000)
+        assert len(self.sq) == 0
+        assert np.all(self.sq.positions == 0xFFFFFFFF)
+
+    def test_remove_not_tracking(self):
+        """Test remove()/update() on a sorted queue not tracking positions. Should raise an IndexError."""
+        self.sq.push(0)
+        assert len(self.sq.positions) == 0
+        with pytest.raises(IndexError):
+            self.sq.remove(0)
+        with pytest.raises(IndexError):
+            self.sq.update(0)
+
+    def test_njit_functions(self):
+        """Test pushing to and popping from a sorted queue in Numba compiled code."""
+        values = np.random.randint(0, 100, 1024, dtype=np.int32)
+        self.sq = SortedQueue(len(values), values, track_positions=True)
+        push, popi, peeki = self.sq.njit_functions
+
+        @nb.njit
+        def schedule(count, indices, values, positions, size):  # pragma: no cover
+            for i in range(count):
+                push(indices, values, positions, size, i)
+            return
+
+        @nb.njit
+        def drain(tick, out, indices, values, positions, size):  # pragma: no cover
+            n = 0
+            while size[0] > 0 and values[peeki(indices, values, positions, size)] <= tick:
+                out[n] = popi(indices, values, positions, size)
+                n += 1
+            return n
+
+        schedule(512, *self.sq.state)
+        assert len(self.sq) == 512
+        self.sq.push_many(np.arange(512, len(values)))  # mix with Python calls
+        out = np.zeros(len(values), dtype=np.uint32)
+        for tick in range(100):
+            n = drain(tick, out, *self.sq.state)
+            assert np.all(np.sort(out[:n]) == np.nonzero(values == tick)[0])
+        assert len(self.sq) == 0
+        assert np.all(self.sq.positions == 0xFFFFFFFF)
+
+        with pytest.raises(IndexError):
+            popi(*self.sq.state)
+
+    def test_index_dtype(self):
+        """Test sorted queues with 64-bit indices."""
+        values = np.random.randint(0, 100, 1024, dtype=np.int32)
+        for dtype in [np.int32, np.float64, np.uint16]:
+            self.sq = SortedQueue(len(values), values.astype(dtype), track_positions=True, index_dtype=np.uint64)
+            assert self.sq.indices.dtype == np.uint64
+            assert self.sq.positions.dtype == np.uint64
+            for i in range(256):
+                self.sq.push(i)
+            self.sq.push_many(np.arange(256, len(values)))
+            self.sq.remove(7)
+            self.sq.update(11)
+            assert self.sq.popv() == np.delete(values, 7).min()
+            due = self.sq.pop_until(49)
+            assert due.dtype == np.uint64
+            assert np.all(values[due] <= 49)
+            popped = np.array([self.sq.popv() for _ in range(len(self.sq))])
+            assert np.all(np.diff(popped) >= 0)
+            assert np.all(self.sq.positions == np.iinfo(np.uint64).max)
+
+        queue = SortedQueue.from_indices(values, np.arange(len(values)), index_dtype=np.uint64)
+        push, popi, peeki = queue.njit_functions
+        assert values[popi(*queue.state)] == values.min()
+
+        with pytest.raises(TypeError):
+            _ = SortedQueue(len(values), values, index_dtype=np.int64)
+
+    def test_save_load(self):
+        """Test saving and restoring a sorted queue without rebuilding the heap."""
+        import tempfile
+        from pathlib import Path
+
+        values = np.random.randint(0, 100, 1024).astype(np.float32)
+        self.sq = SortedQueue(len(values), values, track_positions=True, index_dtype=np.uint64, arity=4)
+        self.sq.push_many(np.arange(600))
+        self.sq.remove(3)
+        _ = self.sq.pop_until(20)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "queue.npz"
+            self.sq.save(path)
+            restored = SortedQueue.load(path, values)
+            assert len(restored) == len(self.sq)
+            assert len(restored.indices) == len(self.sq.indices)
+            assert restored.arity == 4
+            assert restored.indices.dtype == np.uint64
+            assert np.all(restored.indices[: len(restored)] == self.sq.indices[: len(self.sq)])
+            assert np.all(restored.positions == self.sq.positions)
+            restored.remove(5)
+            assert np.all(np.diff(values[restored.pop_until(100)]) >= 0)
+
+            with pytest.raises(TypeError):
+                _ = SortedQueue.load(path, values.astype(np.float64))
+            with pytest.raises(ValueError):
+                _ = SortedQueue.load(path, values[:100])
+
+    def test_save_load_timing(self):
+        """Test the timing of restoring a saved sorted queue vs. rebuilding it with push()."""
+        import tempfile
+        import timeit
+        from pathlib import Path
+
+        np.random.seed(20240701)
+        count = 1 << 20
+        values = np.random.randint(0, 100, count, dtype=np.int32)
+        self.sq = SortedQueue.from_indices(values, np.arange(count))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "queue.npz"
+            self.sq.save(path)
+            elapsed = timeit.timeit("SortedQueue.load(path, values)", globals={"SortedQueue": SortedQueue, "path": path, "values": values}, number=1)
+        self.messages.append(
+            f"SortedQueue.load() timing: {elapsed:0.4f} seconds for {count:9,} elements = {int(round(count / elapsed)):11,} elements/second"
+        )
+
+    def test_arity(self):
+        """Test 4-ary and 8-ary sorted queues."""
+        values = np.random.randint(0, 100, 1027, dtype=np.int32)
+        for arity in [4, 8]:
+            self.sq = SortedQueue(len(values), values, track_positions=True, arity=arity)
+            for i in range(256):
+                self.sq.push(i)
+            self.sq.push_many(np.arange(256, len(values)))
+            self.sq.remove(7)
+            self.sq.update(11)
+            assert self.sq.popv() == np.delete(values, 7).min()
+            due = self.sq.pop_until(49)
+            assert np.all(values[due] <= 49)
+            popped = np.array([self.sq.popv() for _ in range(len(self.sq))])
+            assert np.all(popped > 49)
+            assert np.all(np.diff(popped) >= 0)
+            assert len(due) + len(popped) == len(values) - 2
+            assert np.all(self.sq.positions == 0xFFFFFFFF)
+
+            for size in [1, 2, arity, arity + 1, 1027]:
+                queue = SortedQueue.from_indices(values, np.arange(size), arity=arity)
+                assert np.all(np.diff(values[queue.pop_until(100)]) >= 0)
+
+        with pytest.raises(ValueError):
+            _ = SortedQueue(len(values), values, arity=3)
+
+    def test_arity_timing(self):
+        """Compare the pop throughput of binary, 4-ary, and 8-ary sorted queues."""
+        import timeit
+
+        np.random.seed(20240701)
+        count = 1 << 20
+        values = np.random.randint(0, count, count, dtype=np.int32)
+        for arity in [2, 4, 8]:
+            self.sq = SortedQueue.from_indices(values, np.arange(count), arity=arity)
+            elapsed = timeit.timeit("self.sq.pop_until(count)", globals={"self": self, "count": count}, number=1)
+            self.messages.append(
+                f"SortedQueue(arity={arity}) pop timing: {elapsed:0.4f} seconds for {count:9,} elements = {int(round(count / elapsed)):11,} elements/second"
+            )
+
     # Test for peeki()
     def test_peeki(self):
         """Test peeking at the top index of the sorted queue."""
@@ -195,5 +472,82 @@ class TestSortedQueue(unittest.TestCase):
                 minimum = value
 
 
+class TestPartitionedSortedQueue(unittest.TestCase):
+    """Tests for the PartitionedSortedQueue class."""
+
+    messages: ClassVar = []
+
+    # Called once after all tests
+    @classmethod
+    def tearDownClass(cls):
+        print()
+        for message in cls.messages:
+            print(message)
+
+    def setUp(self):
+        self.capacities = np.random.randint(0, 128, 100)
+        self.capacities[17] = 0  # an empty node
+        self.values = np.random.randint(0, 100, self.capacities.sum(), dtype=np.int32)
+        self.nodes = np.random.permutation(np.repeat(np.arange(len(self.capacities)), self.capacities))
+        self.pq = PartitionedSortedQueue(self.capacities, self.values)
+        self.pq.push_many(self.nodes, np.arange(len(self.values)))
+
+    def test_pop_until(self):
+        """Test draining all nodes."""
+        assert len(self.pq) == len(self.values)
+        for tick in range(100):
+            due, counts = self.pq.pop_until(tick)
+            assert len(counts) == len(self.capacities)
+            assert np.all(self.values[due] == tick)
+            starts = np.concatenate(([0], np.cumsum(counts)))
+            for node in range(len(counts)):
+                expected = np.nonzero((self.nodes == node) & (self.values == tick))[0]
+                assert np.all(np.sort(due[starts[node] : starts[node + 1]]) == expected)
+        assert len(self.pq) == 0
+
+    def test_pop_until_nodes(self):
+        """Test draining a subset of nodes with per-node thresholds."""
+        nodes = np.array([3, 1, 4, 59, 26])
+        due, counts = self.pq.pop_until(np.array([10, 20, 30, 40, 50], dtype=np.int32), nodes=nodes)
+        starts = np.concatenate(([0], np.cumsum(counts)))
+        for k, (node, limit) in enumerate(zip(nodes, [10, 20, 30, 40, 50])):
+            expected = np.nonzero((self.nodes == node) & (self.values <= limit))[0]
+            popped = due[starts[k] : starts[k + 1]]
+            assert np.all(np.sort(popped) == expected)
+            assert np.all(np.diff(self.values[popped]) >= 0)
+        assert len(self.pq) == len(self.values) - len(due)
+        remaining = len(self.pq)
+        due, counts = self.pq.pop_until(100)
+        assert len(due) == counts.sum() == remaining
+        assert len(self.pq) == 0
+
+        with pytest.raises(ValueError):
+            self.pq.pop_until(0, nodes=[1, 2, 1])
+
+    def test_full_push(self):
+        """Test pushing to a full node. Should raise an IndexError and add nothing."""
+        node = int(np.argmax(self.capacities))
+        with pytest.raises(IndexError):
+            self.pq.push_many(np.array([0, node]), np.array([0, 1]))
+        assert len(self.pq) == len(self.values)
+        with pytest.raises(IndexError):
+            self.pq.push(len(self.capacities), 0)
+
+    def test_pop_until_timing(self):
+        """Test the timing of draining 1,024 nodes in parallel."""
+        import timeit
+
+        np.random.seed(20240701)
+        count = 1 << 20
+        values = np.random.randint(0, 100, count, dtype=np.int32)
+        nodes = np.random.randint(0, 1024, count)
+        pq = PartitionedSortedQueue(np.bincount(nodes, minlength=1024), values)
+        pq.push_many(nodes, np.arange(count))
+        elapsed = timeit.timeit("for tick in range(100): pq.pop_until(tick)", globals={"pq": pq}, number=1)
+        self.messages.append(
+            f"PartitionedSortedQueue.pop_until() timing: {elapsed:0.4f} seconds for {count:9,} elements = {int(round(count / elapsed)):11,} elements/second"
+        )
+
+
 if __name__ == "__main__":
     unittest.main(exit=False)